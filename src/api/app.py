@@ -1,54 +1,418 @@
-from flask import Flask, request, jsonify
+import os
+from functools import wraps
+from flask import Flask, request, jsonify, Response
 import pandas as pd
-from data_aggregator import aggregate_data, convert_to_datetime
-from time_series_engineering import process_time_series
-from forecasting_model import train_and_forecast
+from data_aggregator import aggregate_data, aggregate_data_streaming, convert_to_datetime
+from time_series_engineering import process_time_series, extend_with_future_dates, AUTOCORRELATION_OUTPUTS
+from incremental_feature_engineering import run_incremental_feature_engineering
+from training_executor import TrainingExecutor
+from job_queue import JobQueue, QueueFullError
+from result_cache import ResultCache, code_version, local_modules
+from feature_store import FeatureStore, frame_digest
+from lazy_features import LazyFeatures
+from model_registry import ModelRegistry, MODEL_NAMES, model_id
+from forecasting_model import model_columns, predict_rows, stage_timer
+from backtesting import backtest_cutoffs, backtest_folds, run_backtest
+from hyperparameter_search import HyperparameterSearch
+from telemetry import configure_logging, log_event
+from transport import read_frame, write_frame, write_multipart, negotiate, sniff_format, CSV_MIMETYPE, JSON_MIMETYPE
 
 app = Flask(__name__)
 
+# Structured summary logs, written by a background thread
+configure_logging(os.environ.get('RAE_LOG_LEVEL', 'INFO'))
+
+API_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Directory holding the persisted incremental feature state and feature table
+FEATURE_STATE_DIR = os.environ.get('RAE_FEATURE_STATE_DIR', 'cache/features')
+
+# Partitioned store of the engineered feature tables, versioned by the feature engineering source
+feature_store = FeatureStore(
+    os.environ.get('RAE_FEATURE_STORE_DIR', 'cache/feature_store'),
+    code_version([os.path.join(API_DIRECTORY, name) for name in ['time_series_engineering.py', 'feature_plan.py']])[:16],
+)
+
+# Boosters of every forecast, so new rows can be scored without retraining
+registry = ModelRegistry(
+    os.environ.get('RAE_MODEL_DIR', 'cache/models'),
+    max_loaded=int(os.environ.get('RAE_LOADED_MODELS', 8)),
+)
+
+# Shared pool for model training, so concurrent requests do not oversubscribe the cores
+executor = TrainingExecutor(
+    max_workers=int(os.environ['RAE_TRAINING_WORKERS']) if 'RAE_TRAINING_WORKERS' in os.environ else None,
+    num_threads=int(os.environ['RAE_TRAINING_THREADS']) if 'RAE_TRAINING_THREADS' in os.environ else None,
+    dataset_dir=os.environ.get('RAE_DATASET_DIR', 'cache/datasets'),
+    valid_only_metrics=os.environ.get('RAE_VALID_ONLY_METRICS', 'false').lower() == 'true',
+)
+
+# Hyperparameter searches and their leaderboards, run on the training pool
+searches = HyperparameterSearch(os.environ.get('RAE_SEARCH_DIR', 'cache/searches'), executor)
+
+
+def feature_table(columns=None):
+    """
+    Read the feature table of a request: the uploaded file or, without a file, the `extended_result` of the
+    feature store partition named by the `frequency` and `slice` form fields, loading only `columns` if given.
+    """
+    file = request.files.get('file')
+    if file:
+        return read_frame(file, index_col=0, parse_dates=True)
+    if request.form.get('frequency'):
+        return feature_store.read(request.form['frequency'], request.form.get('slice', 'all'), 'extended_result', columns=columns)
+    return None
+
+
+def registered_forecasts(df, jobs, retrain=False):
+    """
+    Answer forecast jobs from the model registry, training and registering only the models that are not
+    registered yet for this feature table (or every model, with `retrain`).
+    """
+    input_hash = frame_digest(df)
+    responses = [None] * len(jobs)
+    missing = []
+    for i, job in enumerate(jobs):
+        job['model_id'] = model_id(job['target_column'], job['last_index'].strftime('%Y-%m-%d'), job['validity_offset_days'], feature_store.version, input_hash)
+        metadata = None if retrain else registry.metadata(job['model_id'])
+        if metadata is None:
+            missing.append(i)
+        else:
+            response = dict(metadata['response'], model_id=job['model_id'], registered=True)
+            for name in MODEL_NAMES:
+                response[name] = dict(response[name], model=registry.model_string(job['model_id'], name))
+            responses[i] = response
+
+    # A single training runs on the shared pool, several share their prepared splits
+    if len(missing) == 1:
+        job = jobs[missing[0]]
+        results = [executor.submit(df, job['target_column'], job['last_index'], job['validity_offset_days']).result()]
+    else:
+        results = executor.map(df, [jobs[i] for i in missing]) if missing else []
+
+    for i, result in zip(missing, results):
+        job = jobs[i]
+        response = forecast_response(*result)
+        log_event(
+            'forecast_trained', model_id=job['model_id'], target_column=job['target_column'],
+            last_index=job['last_index'].strftime('%Y-%m-%d'), validity_offset_days=job['validity_offset_days'],
+            **{name: {key: response[name][key] for key in ['rmse', 'mape']} for name in MODEL_NAMES},
+            best_iteration={name: response[name]['telemetry']['best_iteration'] for name in MODEL_NAMES},
+            wall=response['timings']['total']['wall'],
+        )
+        models = {name: response[name]['model'] for name in MODEL_NAMES}
+        registry.register({
+            'model_id': job['model_id'],
+            'target_column': job['target_column'],
+            'last_index': job['last_index'].strftime('%Y-%m-%d'),
+            'validity_offset_days': job['validity_offset_days'],
+            'feature_version': feature_store.version,
+            'input_hash': input_hash,
+            'features': {name: model_columns(model_string, df.columns) for name, model_string in models.items()},
+            'response': dict(response, **{name: {key: value for key, value in response[name].items() if key != 'model'} for name in MODEL_NAMES}),
+        }, models)
+        responses[i] = dict(response, model_id=job['model_id'], registered=False)
+    return responses
+
+
+def run_forecast_job(params, input_path):
+    df = read_frame(input_path, index_col=0, parse_dates=True)
+    job = {'target_column': params['target_column'], 'last_index': pd.to_datetime(params['last_index']), 'validity_offset_days': params['validity_offset_days']}
+    return registered_forecasts(df, [job], params.get('retrain', False))[0]
+
+
+# Background jobs for long-running forecasts, persisted under RAE_JOB_DIR
+jobs = JobQueue(
+    os.environ.get('RAE_JOB_DIR', 'cache/jobs'),
+    run_forecast_job,
+    max_workers=executor.max_workers,
+    max_queued=int(os.environ.get('RAE_MAX_QUEUED_JOBS', 16)),
+)
+
+
+# Cache of endpoint responses; the key includes a hash of this module and of every module it imports
+cache = ResultCache(
+    os.environ.get('RAE_CACHE_DIR', 'cache/results'),
+    code_version(local_modules([os.path.abspath(__file__)])),
+    max_memory_items=int(os.environ.get('RAE_CACHE_MEMORY_ITEMS', 32)),
+    max_disk_bytes=int(os.environ.get('RAE_CACHE_DISK_MB', 512)) * 1024 * 1024,
+)
+
+
+def cached(view):
+    """
+    Serve repeated requests from the result cache, keyed by the uploaded file, the form, the Accept header and the code version.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        file = request.files.get('file')
+        # Incremental runs update server-side state, so they are never served from the cache
+        if not file or request.form.get('incremental', 'false').lower() == 'true':
+            return view(*args, **kwargs)
+
+        form = request.form.to_dict(flat=False)
+        # A retrain is never answered from the cache, but its result replaces the entry of the same request without it
+        retrain = form.pop('retrain', ['false'])[-1].lower() == 'true'
+        params = dict(form, Accept=request.headers.get('Accept', ''))
+        # The upload is hashed block by block, so large registry files are not loaded whole
+        key = cache.key(request.endpoint, file.stream, params)
+        file.stream.seek(0)
+        entry = None if retrain else cache.get(key)
+        if entry is not None:
+            body, content_type = entry
+            response = Response(body, content_type=content_type)
+            response.headers['X-Cache'] = 'HIT'
+            response.vary.add('Accept')
+            return response
+
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            cache.set(key, (response.get_data(), response.content_type))
+        response.headers['X-Cache'] = 'MISS'
+        response.vary.add('Accept')
+        return response
+    return wrapper
+
 
 # curl -X POST -F 'file=@all_ape_data_nodup_rsi.csv' -F 'frequency=M' -F 'current_date=2023-05-01' -F 'forecast_horizon=12' http://127.0.0.1:5000/aggregate > agg_res.csv
+# curl -X POST -H 'Accept: application/vnd.apache.arrow.stream' -F 'file=@all_ape_data_nodup_rsi.csv' -F 'frequency=M' -F 'current_date=2023-05-01' -F 'forecast_horizon=12' http://127.0.0.1:5000/aggregate > agg_res.arrow
+# curl -X POST -F 'file=@all_ape_data_nodup_rsi.csv' -F 'frequency=M' -F 'current_date=2023-05-01' -F 'forecast_horizon=12' -F 'streaming=true' http://127.0.0.1:5000/aggregate > agg_res.csv
 @app.route('/aggregate', methods=['POST'])
+@cached
 def aggregate():
     file = request.files['file']
     frequency = request.form.get('frequency')
     current_date = request.form.get('current_date')
     forecast_horizon = int(request.form.get('forecast_horizon', 48))  # Default to 48 if not provided
+    streaming = request.form.get('streaming', 'false').lower() == 'true'
 
     if not file or not frequency or not current_date:
         return jsonify({'error': 'File, frequency, and current_date are required.'}), 400
 
-    df = pd.read_csv(file)
-    result = aggregate_data(df, frequency, current_date, forecast_horizon)
-    result_csv = result.to_csv(index=True)
-    
-    return result_csv
+    head = file.stream.read(8)
+    file.stream.seek(0)
+    # Only CSV uploads are streamed; Arrow and Parquet bodies are read whole
+    date_report = {}
+    if streaming and sniff_format(head) == CSV_MIMETYPE:
+        result = aggregate_data_streaming(file.stream, frequency, current_date, forecast_horizon, report=date_report)
+    else:
+        df = read_frame(file)
+        result = aggregate_data(df, frequency, current_date, forecast_horizon, report=date_report)
+    log_event('dates_parsed', formats=date_report)
+
+    mimetype = negotiate(request.accept_mimetypes, CSV_MIMETYPE)
+    if mimetype == CSV_MIMETYPE:
+        # Kept as before for existing clients
+        return result.to_csv(index=True)
+    return Response(write_frame(result, mimetype), mimetype=mimetype)
 
 # curl -X POST -F 'file=@agg_res.csv' -F 'current_date=2023-05-01' -F 'forecast_horizon=48' http://127.0.0.1:5000/process-time-series | jq -r '.result' > result.csv
 # curl -X POST -F 'file=@agg_res.csv' -F 'current_date=2023-05-01' -F 'forecast_horizon=48' http://127.0.0.1:5000/process-time-series | jq -r '.extended_result' > extended_result.csv
+# curl -X POST -F 'file=@new_months.csv' -F 'current_date=2024-05-01' -F 'forecast_horizon=48' -F 'incremental=true' http://127.0.0.1:5000/process-time-series
+# curl -X POST -H 'Accept: application/vnd.apache.arrow.stream' -F 'file=@agg_res.arrow' -F 'current_date=2023-05-01' -F 'forecast_horizon=48' http://127.0.0.1:5000/process-time-series > features.multipart
+# curl -X POST -F 'file=@agg_res.csv' -F 'current_date=2023-05-01' -F 'forecast_horizon=48' -F 'autocorrelation=table' http://127.0.0.1:5000/process-time-series | jq -r '.autocorrelation' > autocorrelation.csv
+# curl -X POST -F 'file=@agg_res.csv' -F 'current_date=2023-05-01' -F 'forecast_horizon=48' -F 'decomposition_periods=3,6,12' http://127.0.0.1:5000/process-time-series
 @app.route('/process-time-series', methods=['POST'])
+@cached
 def process_time_series_route():
     file = request.files['file']
     current_date = request.form.get('current_date')
     forecast_horizon = int(request.form.get('forecast_horizon', 48))  # Default to 48 if not provided
+    incremental = request.form.get('incremental', 'false').lower() == 'true'
+    autocorrelation = request.form.get('autocorrelation', 'constant')
+    try:
+        decomposition_periods = [int(period) for period in request.form.get('decomposition_periods', '').split(',') if period.strip()]
+    except ValueError:
+        return jsonify({'error': 'decomposition_periods must be a comma-separated list of integers.'}), 400
 
     if not file or not current_date:
         return jsonify({'error': 'File and current_date are required.'}), 400
+    if autocorrelation not in AUTOCORRELATION_OUTPUTS:
+        return jsonify({'error': f"autocorrelation must be one of {', '.join(AUTOCORRELATION_OUTPUTS)}."}), 400
+    if any(period < 1 for period in decomposition_periods):
+        return jsonify({'error': 'decomposition_periods must be positive.'}), 400
+    if incremental and (autocorrelation != 'constant' or decomposition_periods):
+        return jsonify({'error': 'Incremental mode only computes the constant autocorrelation, without decomposition_periods.'}), 400
 
-    df = pd.read_csv(file, parse_dates=True, index_col=0)
-    result, extended_result = process_time_series(df, current_date, forecast_horizon)
-    result_csv = result.to_csv(index=True)
-    extended_result_csv = extended_result.to_csv(index=True)
-    
-    return jsonify({
-        'result': result_csv,
-        'extended_result': extended_result_csv
-    })
+    df = read_frame(file, parse_dates=True, index_col=0)
+    if incremental:
+        os.makedirs(FEATURE_STATE_DIR, exist_ok=True)
+        try:
+            result, extended_result = run_incremental_feature_engineering(
+                df,
+                os.path.join(FEATURE_STATE_DIR, 'feature_state.pkl'),
+                os.path.join(FEATURE_STATE_DIR, 'extended_result.csv'),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result = extend_with_future_dates(result, current_date, forecast_horizon)
+    else:
+        tables = {}
+        result, extended_result = process_time_series(
+            df, current_date, forecast_horizon,
+            store=feature_store, frequency=request.form.get('frequency', 'M'), slice_name=request.form.get('slice', 'all'),
+            autocorrelation=autocorrelation, autocorrelation_table=tables, decomposition_periods=decomposition_periods or None,
+        )
+
+    frames = {'result': result, 'extended_result': extended_result}
+    if autocorrelation == 'table':
+        frames['autocorrelation'] = tables['table']
+
+    mimetype = negotiate(request.accept_mimetypes, JSON_MIMETYPE)
+    if mimetype != JSON_MIMETYPE:
+        # All frames in one multipart/mixed body, one part per frame
+        body, content_type = write_multipart(frames, mimetype)
+        return Response(body, content_type=content_type)
+
+    return jsonify({name: frame.to_csv(index=True) for name, frame in frames.items()})
 
 
 # curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'validity_offset_days=720' http://127.0.0.1:5000/forecast
+# curl -X POST -F 'frequency=M' -F 'slice=all' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'validity_offset_days=720' http://127.0.0.1:5000/forecast
+# curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'validity_offset_days=720' -F 'retrain=true' http://127.0.0.1:5000/forecast
 @app.route('/forecast', methods=['POST'])
+@cached
 def forecast():
+    target_column = request.form.get('target_column')
+    last_index = request.form.get('last_index')
+    validity_offset_days = int(request.form.get('validity_offset_days', 30*24))  # Default to 30 days
+    retrain = request.form.get('retrain', 'false').lower() == 'true'
+
+    df = feature_table()
+    if df is None or not target_column or not last_index:
+        return jsonify({'error': 'File (or a stored frequency and slice), target_column, and last_index are required.'}), 400
+
+    job = {'target_column': target_column, 'last_index': pd.to_datetime(last_index), 'validity_offset_days': validity_offset_days}
+
+    return jsonify(registered_forecasts(df, [job], retrain)[0])
+
+
+# curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'target_column=ΙΣΧΥΣ (MW)_count' -F 'last_index=2022-11-01' -F 'last_index=2023-03-01' -F 'validity_offset_days=720' http://127.0.0.1:5000/forecast-batch
+@app.route('/forecast-batch', methods=['POST'])
+@cached
+def forecast_batch():
+    target_columns = request.form.getlist('target_column')
+    last_indexes = request.form.getlist('last_index')
+    validity_offsets = [int(days) for days in request.form.getlist('validity_offset_days')] or [30*24]
+    retrain = request.form.get('retrain', 'false').lower() == 'true'
+
+    if not target_columns or not last_indexes:
+        return jsonify({'error': 'File (or a stored frequency and slice), target_column, and last_index are required.'}), 400
+    # A single validity_offset_days applies to every last_index, otherwise they are paired in order
+    if len(validity_offsets) == 1:
+        validity_offsets = validity_offsets * len(last_indexes)
+    if len(validity_offsets) != len(last_indexes):
+        return jsonify({'error': 'Provide one validity_offset_days, or one per last_index.'}), 400
+
+    # Parse the feature table once for every target and split
+    df = feature_table()
+    if df is None:
+        return jsonify({'error': 'File (or a stored frequency and slice), target_column, and last_index are required.'}), 400
+
+    jobs = [
+        {'target_column': target_column, 'last_index': pd.to_datetime(last_index), 'validity_offset_days': validity_offset_days}
+        for last_index, validity_offset_days in zip(last_indexes, validity_offsets)
+        for target_column in target_columns
+    ]
+    responses = registered_forecasts(df, jobs, retrain)
+
+    return jsonify({
+        'results': [
+            dict(
+                response,
+                target_column=job['target_column'],
+                last_index=job['last_index'].strftime('%Y-%m-%d'),
+                validity_offset_days=job['validity_offset_days'],
+            )
+            for job, response in zip(jobs, responses)
+        ]
+    })
+
+
+# curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'n_folds=4' -F 'step=6' -F 'validity_offset_days=180' http://127.0.0.1:5000/backtest
+# curl -X POST -F 'frequency=M' -F 'slice=all' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'cutoff=2022-03-01' -F 'cutoff=2023-03-01' -F 'window=sliding' -F 'train_days=1825' -F 'warm_start=true' http://127.0.0.1:5000/backtest
+@app.route('/backtest', methods=['POST'])
+@cached
+def backtest():
+    target_column = request.form.get('target_column')
+    cutoffs = [pd.to_datetime(cutoff) for cutoff in request.form.getlist('cutoff')]
+    last_index = request.form.get('last_index')
+    n_folds = int(request.form.get('n_folds', 5))
+    step = int(request.form.get('step', 1))
+    validity_offset_days = int(request.form.get('validity_offset_days', 30*24))  # Default to 30 days
+    window = request.form.get('window', 'expanding')
+    train_days = int(request.form['train_days']) if request.form.get('train_days') else None
+    warm_start = request.form.get('warm_start', 'false').lower() == 'true'
+
+    df = feature_table()
+    if df is None or not target_column or not (cutoffs or last_index):
+        return jsonify({'error': 'File (or a stored frequency and slice), target_column, and last_index (or cutoff dates) are required.'}), 400
+
+    try:
+        # Explicit cutoff dates, otherwise n_folds dates every step rows up to last_index
+        if not cutoffs:
+            cutoffs = backtest_cutoffs(pd.to_datetime(df.index), pd.to_datetime(last_index), n_folds, step)
+        folds = backtest_folds(cutoffs, validity_offset_days, window, train_days)
+        result = run_backtest(df, target_column, folds, executor, warm_start=warm_start)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    log_event(
+        'backtest_done', target_column=target_column, folds=len(folds), window=window, warm_start=warm_start,
+        rmse={name: result['summary'][name]['rmse']['mean'] for name in result['summary']},
+        wall=result['timings']['total']['wall'],
+    )
+    return jsonify(dict(result, window=window, validity_offset_days=validity_offset_days, train_days=train_days))
+
+
+# curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'validity_offset_days=360' -F 'n_trials=30' -F 'metric=rmse' http://127.0.0.1:5000/search
+@app.route('/search', methods=['POST'])
+def search():
+    target_column = request.form.get('target_column')
+    last_index = request.form.get('last_index')
+    validity_offset_days = int(request.form.get('validity_offset_days', 30*24))  # Default to 30 days
+
+    df = feature_table()
+    if df is None or not target_column or not last_index:
+        return jsonify({'error': 'File (or a stored frequency and slice), target_column, and last_index are required.'}), 400
+
+    try:
+        leaderboard = searches.run(
+            df, target_column, pd.to_datetime(last_index), validity_offset_days,
+            n_trials=int(request.form.get('n_trials', 20)),
+            metric=request.form.get('metric', 'rmse'),
+            min_rounds=int(request.form.get('min_rounds', 50)),
+            eta=int(request.form.get('eta', 3)),
+            seed=int(request.form.get('seed', 0)),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    log_event(
+        'search_done', search_id=leaderboard['search_id'], target_column=target_column, metric=leaderboard['metric'],
+        trials=leaderboard['n_trials'], best=leaderboard['best'], wall=leaderboard['timings'].get('search', {}).get('wall'),
+    )
+    return jsonify(leaderboard)
+
+
+# curl http://127.0.0.1:5000/searches
+@app.route('/searches', methods=['GET'])
+def search_entries():
+    return jsonify(searches.entries())
+
+
+# curl http://127.0.0.1:5000/searches/<search_id>
+@app.route('/searches/<search_id>', methods=['GET'])
+def search_leaderboard(search_id):
+    leaderboard = searches.leaderboard(search_id)
+    if leaderboard is None:
+        return jsonify({'error': f'Search {search_id} not found.'}), 404
+    return jsonify(leaderboard)
+
+
+# curl -X POST -F 'file=@extended_result.csv' -F 'target_column=ΙΣΧΥΣ (MW)_sum' -F 'last_index=2023-03-01' -F 'validity_offset_days=720' http://127.0.0.1:5000/jobs/forecast
+@app.route('/jobs/forecast', methods=['POST'])
+def submit_forecast_job():
     file = request.files['file']
     target_column = request.form.get('target_column')
     last_index = request.form.get('last_index')
@@ -57,19 +421,143 @@ def forecast():
     if not file or not target_column or not last_index:
         return jsonify({'error': 'File, target_column, and last_index are required.'}), 400
 
-    df = pd.read_csv(file, index_col=0, parse_dates=True)
+    params = {
+        'target_column': target_column, 'last_index': last_index, 'validity_offset_days': validity_offset_days,
+        'retrain': request.form.get('retrain', 'false').lower() == 'true',
+    }
+    try:
+        job_id = jobs.submit(params, file.read())
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
 
-    last_index = pd.to_datetime(last_index)
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
 
-    result_model1, result_model2, forecast_dates = train_and_forecast(df, target_column, last_index, validity_offset_days)
-    
-    return jsonify({
+
+# curl http://127.0.0.1:5000/jobs/<job_id>
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found.'}), 404
+    return jsonify(job)
+
+
+# curl http://127.0.0.1:5000/jobs/<job_id>/result
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found.'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Job {job_id} is {job['status']}.", 'status': job['status']}), 409
+    return jsonify(jobs.result(job_id))
+
+
+# curl -X DELETE http://127.0.0.1:5000/jobs/<job_id>
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not jobs.cancel(job_id):
+        return jsonify({'error': f'Job {job_id} cannot be cancelled.'}), 409
+    return jsonify(jobs.status(job_id))
+
+
+# curl -X POST -F 'model_id=<model_id>' -F 'file=@extended_result.csv' -F 'start_date=2023-04-01' http://127.0.0.1:5000/predict
+# curl -X POST -F 'model_id=<model_id>' -F 'model=model2' -F 'frequency=M' -F 'slice=all' http://127.0.0.1:5000/predict
+# curl -X POST -F 'model_id=<model_id>' -F 'model=model2' -F 'file=@agg_res.csv' -F 'aggregation=true' -F 'start_date=2023-04-01' http://127.0.0.1:5000/predict
+@app.route('/predict', methods=['POST'])
+def predict():
+    requested_id = request.form.get('model_id')
+    name = request.form.get('model', 'model1')
+    start_date = request.form.get('start_date')
+    aggregation = request.form.get('aggregation', 'false').lower() == 'true'
+
+    metadata = registry.metadata(requested_id) if requested_id else None
+    if metadata is None:
+        return jsonify({'error': f'Model {requested_id} not found.'}), 404
+    if name not in MODEL_NAMES:
+        return jsonify({'error': f"model must be one of {', '.join(MODEL_NAMES)}."}), 400
+
+    timings = {}
+    features = None
+    if aggregation:
+        file = request.files.get('file')
+        if not file:
+            return jsonify({'error': 'File is required with aggregation=true.'}), 400
+        with stage_timer(timings, 'load'):
+            booster = registry.load(requested_id, name)
+            df = read_frame(file, parse_dates=True, index_col=0)
+        # Only the computations of the model's features are run, on the rows they need
+        with stage_timer(timings, 'features'):
+            try:
+                lazy = LazyFeatures(booster.feature_name(), df.columns, request.form.get('autocorrelation', 'constant'))
+                df = lazy.compute(df, start_date=start_date)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        columns = lazy.features
+        features = {'nodes': len(lazy.plan.nodes), 'history': lazy.history}
+    else:
+        with stage_timer(timings, 'load'):
+            booster = registry.load(requested_id, name)
+            # Only the model's features are read from the feature store
+            columns = metadata['features'][name]
+            df = feature_table(columns=columns)
+        if df is None:
+            return jsonify({'error': 'File (or a stored frequency and slice) is required.'}), 400
+        missing_columns = [column for column in columns if column not in df.columns]
+        if missing_columns:
+            return jsonify({'error': f'Missing feature columns: {missing_columns[:10]}'}), 400
+
+        if start_date:
+            df = df[df.index >= pd.to_datetime(start_date)]
+    with stage_timer(timings, 'predict'):
+        predictions = predict_rows(booster, df, columns)
+
+    response = {
+        'model_id': requested_id,
+        'model': name,
+        'target_column': metadata['target_column'],
+        'predictions': predictions.tolist(),
+        'dates': df.index.strftime('%Y-%m-%d').tolist(),
+        'timings': timings,
+    }
+    if features is not None:
+        response['features'] = features
+    return jsonify(response)
+
+
+# curl http://127.0.0.1:5000/models
+@app.route('/models', methods=['GET'])
+def registered_models():
+    models = []
+    for entry in registry.entries():
+        summary = {key: value for key, value in entry.items() if key not in ('features', 'response')}
+        # The metrics of each booster, without its forecast and per-round telemetry
+        summary['metrics'] = {name: {key: value for key, value in entry['response'][name].items() if key not in ('forecast', 'telemetry')} for name in MODEL_NAMES}
+        models.append(summary)
+    return jsonify(models)
+
+
+# curl http://127.0.0.1:5000/features
+@app.route('/features', methods=['GET'])
+def feature_partitions():
+    return jsonify(feature_store.entries())
+
+
+# curl http://127.0.0.1:5000/cache/stats
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(cache.summary())
+
+
+def forecast_response(result_model1, result_model2, forecast_dates, timings):
+    return {
         'model1': {
             'forecast': result_model1[1].tolist(),
             'rmse': result_model1[2],
             'mape': result_model1[3],
             'mape_sum': result_model1[4],
             'smape_sum': result_model1[5],
+            'telemetry': result_model1[6],
             'model': result_model1[0]
         },
         'model2': {
@@ -78,10 +566,12 @@ def forecast():
             'mape': result_model2[3],
             'mape_sum': result_model2[4],
             'smape_sum': result_model2[5],
-            'model': result_model1[0]
+            'telemetry': result_model2[6],
+            'model': result_model2[0]
         },
-        'forecast_dates': forecast_dates.tolist()
-    })
+        'forecast_dates': forecast_dates.tolist(),
+        'timings': timings
+    }
 
 if __name__ == '__main__':
     app.run(debug=True)
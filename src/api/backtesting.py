@@ -0,0 +1,185 @@
+# backtesting.py
+import time
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+
+from forecasting_model import prepare_feature_base, prepare_split, train_and_forecast
+from training_executor import shared_input
+
+WINDOWS = ['expanding', 'sliding']
+
+# The validation metrics returned by `evaluate_model`, in order
+METRICS = ['rmse', 'mape', 'mape_sum', 'smape_sum']
+
+def backtest_cutoffs(index, last_index, n_folds, step=1):
+    """
+    Pick the cutoff dates of a rolling-origin backtest: the last date of the table up to `last_index`, and
+    every `step`-th date before it.
+
+    Parameters:
+    - index (pd.DatetimeIndex): The dates of the feature table.
+    - last_index (pd.Timestamp): The latest cutoff.
+    - n_folds (int): Number of cutoffs.
+    - step (int): Number of table rows (e.g. months) between consecutive cutoffs.
+
+    Returns:
+    - list: The cutoff dates, oldest first.
+    """
+    dates = index[index <= last_index].sort_values()
+    if len(dates) == 0:
+        raise ValueError(f'No dates up to {last_index:%Y-%m-%d}.')
+    return list(dates[::-1][::step][:n_folds][::-1])
+
+
+def backtest_folds(cutoffs, validity_offset_days=30*24, window='expanding', train_days=None):
+    """
+    Describe the folds of a backtest: each cutoff is the last date of a validation window of
+    `validity_offset_days`, trained on every earlier row (expanding) or on the `train_days` before it (sliding).
+
+    Parameters:
+    - cutoffs (list): The cutoff dates.
+    - validity_offset_days (int): The length of the validation windows in days.
+    - window (str): 'expanding' or 'sliding'.
+    - train_days (int): The length of the sliding training windows in days.
+
+    Returns:
+    - list: One dict per fold with its `last_index`, `validity_offset_days` and `train_days`.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(WINDOWS)}.")
+    if window == 'sliding' and not train_days:
+        raise ValueError('A sliding window requires train_days.')
+    return [
+        {'last_index': pd.Timestamp(cutoff), 'validity_offset_days': validity_offset_days,
+         'train_days': train_days if window == 'sliding' else None}
+        for cutoff in sorted(cutoffs)
+    ]
+
+
+def _run_fold(base, target_column, fold, top_k, num_threads, dataset_dir=None, init_model=None):
+    """
+    Fill a copy of the feature base for the fold's split, train on it and summarize the fold.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    prepared = prepare_split(base, fold['last_index'], fold['validity_offset_days'], fold['train_days'])
+    index, rows = prepared['index'], prepared['rows']
+    train_dates, valid_dates = index[rows['train']], index[rows['valid']]
+    if len(train_dates) == 0 or len(valid_dates) == 0:
+        raise ValueError(f"The fold ending {fold['last_index']:%Y-%m-%d} has no training or validation rows.")
+
+    try:
+        result_model1, result_model2, _, timings = train_and_forecast(
+            None, target_column, fold['last_index'], fold['validity_offset_days'], top_k,
+            num_threads=num_threads, prepared=prepared, init_model=init_model, dataset_dir=dataset_dir,
+        )
+    except lgb.basic.LightGBMError as e:
+        # e.g. a window too short for any feature to be used, leaving no features for the second model
+        raise ValueError(f"Training failed for the fold ending {fold['last_index']:%Y-%m-%d}: {e}") from e
+    timings['total'] = {
+        'wall': time.perf_counter() - wall_start,
+        'cpu': time.process_time() - cpu_start,
+    }
+
+    summary = {
+        'cutoff': fold['last_index'].strftime('%Y-%m-%d'),
+        'train_start': train_dates.min().strftime('%Y-%m-%d'),
+        'train_end': train_dates.max().strftime('%Y-%m-%d'),
+        'train_rows': len(train_dates),
+        'valid_rows': len(valid_dates),
+        'valid_dates': valid_dates.strftime('%Y-%m-%d').tolist(),
+        'warm_start': init_model is not None,
+        'timings': timings,
+    }
+    for name, result in [('model1', result_model1), ('model2', result_model2)]:
+        summary[name] = dict(zip(METRICS, (float(value) for value in result[2:6])), best_iteration=result[6]['best_iteration'])
+        # The forecast of the validation window only
+        summary[name]['forecast'] = result[1][:len(valid_dates)].tolist()
+    return summary, result_model1[0]
+
+
+def _run_fold_chain(base_path, target_column, folds, top_k, num_threads, dataset_dir=None):
+    """
+    Run folds in order, each warm-starting the first model from the previous fold's.
+    """
+    base = shared_input(base_path)
+    summaries, init_model = [], None
+    for fold in folds:
+        summary, init_model = _run_fold(base, target_column, fold, top_k, num_threads, dataset_dir, init_model)
+        summaries.append(summary)
+    return summaries
+
+
+def _run_single_fold(base_path, target_column, fold, top_k, num_threads, dataset_dir=None):
+    return _run_fold(shared_input(base_path), target_column, fold, top_k, num_threads, dataset_dir)[0]
+
+
+def aggregate_folds(folds):
+    """
+    Summarize the validation metrics of every model across folds.
+
+    Parameters:
+    - folds (list): The fold summaries returned by `run_backtest`.
+
+    Returns:
+    - dict: For each model and metric, its mean, standard deviation, minimum and maximum.
+    """
+    summary = {}
+    for name in ['model1', 'model2']:
+        summary[name] = {}
+        for metric in METRICS:
+            values = np.array([fold[name][metric] for fold in folds], dtype=np.float64)
+            summary[name][metric] = {
+                'mean': float(values.mean()),
+                'std': float(values.std()),
+                'min': float(values.min()),
+                'max': float(values.max()),
+            }
+    return summary
+
+
+def run_backtest(df, target_column, folds, executor, top_k=20, warm_start=False):
+    """
+    Evaluate `train_and_forecast` over the folds of a rolling-origin backtest.
+
+    The features are copied once into a float32 base, which is read once by each worker; every fold only
+    fills its own copy of it. Folds run concurrently on the executor's shared pool, with its LightGBM
+    threads per worker and Dataset cache, unless `warm_start` is set: the first model of each fold then
+    continues boosting from the previous fold's, so the folds run in order in one worker. The second model
+    is always trained from scratch, since its top features change between folds.
+
+    Parameters:
+    - df (pd.DataFrame): The feature table.
+    - target_column (str): The name of the target column.
+    - folds (list): The folds, as returned by `backtest_folds`.
+    - executor (TrainingExecutor): The shared training pool.
+    - top_k (int): Number of features kept for the second model.
+    - warm_start (bool): Warm-start each fold's first model from the previous fold's.
+
+    Returns:
+    - dict: The per-fold metrics, validation forecasts and timings (`folds`) and their aggregate (`summary`).
+    """
+    if target_column not in df.columns:
+        raise ValueError(f'Unknown target_column {target_column}.')
+    if not folds:
+        raise ValueError('A backtest requires at least one fold.')
+
+    wall_start = time.perf_counter()
+    base = prepare_feature_base(df)
+    # The workers only need the target column of the table
+    base['df'] = df[[target_column]]
+
+    options = (top_k, executor.num_threads, executor.dataset_dir)
+    with executor.shared(base) as base_path:
+        if warm_start:
+            results = executor.schedule(_run_fold_chain, base_path, target_column, folds, *options).result()
+        else:
+            futures = [executor.schedule(_run_single_fold, base_path, target_column, fold, *options) for fold in folds]
+            results = executor.results(futures)
+
+    return {
+        'target_column': target_column,
+        'folds': results,
+        'summary': aggregate_folds(results),
+        'timings': {'total': {'wall': time.perf_counter() - wall_start}},
+    }
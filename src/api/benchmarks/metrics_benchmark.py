@@ -0,0 +1,70 @@
+# metrics_benchmark.py
+import os
+import sys
+import time
+import lightgbm as lgb
+import numpy as np
+
+# The API modules are imported by name, as when running from src/api
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import BufferedFeval
+from forecasting_model import lgbm_smape
+
+
+def benchmark(n_rows: int = 200, n_features: int = 50, rounds: int = 1000, seed: int = 0) -> dict:
+    """
+    Measure the per-round cost of the custom evaluation, against the previous `lgbm_smape` and against a
+    LightGBM training of `rounds` rounds, on random data of the size of a monthly feature table.
+
+    Parameters:
+    - n_rows (int): Number of training (and validation) rows.
+    - n_features (int): Number of features of the training.
+    - rounds (int): Number of boosting rounds.
+    - seed (int): Seed of the random data.
+
+    Returns:
+    - dict: Microseconds per round of each feval (training and validation sets), the seconds of each
+      training, and the share of a training without feval that the fevals add over `rounds` rounds.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2 * n_rows, n_features))
+    y = X[:, 0] * 1000 + rng.normal(scale=100, size=2 * n_rows) + 2000
+    train_data = lgb.Dataset(X[:n_rows], label=y[:n_rows], params={'verbose': -1}).construct()
+    valid_data = lgb.Dataset(X[n_rows:], label=y[n_rows:], reference=train_data).construct()
+    preds = y[n_rows:] + rng.normal(scale=100, size=n_rows)
+
+    # (feval, evaluated Datasets)
+    fevals = {
+        'lgbm_smape': (lgbm_smape, [valid_data, train_data]),
+        'buffered_smape': (BufferedFeval(('smape',)), [valid_data, train_data]),
+        'buffered_smape_mape_rmse': (BufferedFeval(('smape', 'mape', 'rmse')), [valid_data, train_data]),
+        'buffered_smape_valid_only': (BufferedFeval(('smape',)), [valid_data]),
+    }
+    result = {'feval_us_per_round': {}, 'train_seconds': {}}
+    for name, (feval, datasets) in fevals.items():
+        feval(preds, valid_data)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for dataset in datasets:
+                feval(preds, dataset)
+        result['feval_us_per_round'][name] = (time.perf_counter() - start) / rounds * 1e6
+
+    params = {'objective': 'regression', 'metric': 'mape', 'verbose': -1, 'force_col_wise': True, 'num_threads': 1}
+    for name, (feval, datasets) in [('no_feval', (None, [valid_data, train_data]))] + list(fevals.items()):
+        start = time.perf_counter()
+        lgb.train(params, train_data, num_boost_round=rounds, valid_sets=datasets, feval=feval)
+        result['train_seconds'][name] = time.perf_counter() - start
+    result['feval_share_of_training'] = {
+        name: us * rounds / 1e6 / result['train_seconds']['no_feval'] for name, us in result['feval_us_per_round'].items()
+    }
+    return result
+
+
+if __name__ == '__main__':
+    # python benchmarks/metrics_benchmark.py
+    for n_rows in [200, 20000]:
+        print(f'{n_rows} rows')
+        for section, values in benchmark(n_rows=n_rows).items():
+            print(f'  {section}')
+            for name, value in values.items():
+                print(f'    {name}: {value:.4f}')
@@ -1,6 +1,9 @@
+import logging
 import pandas as pd
+from date_parser import parse_dates
+from telemetry import log_event
 
-def convert_to_datetime(df, columns=None):
+def convert_to_datetime(df, columns=None, report=None):
     """
     Convert date-like columns in a DataFrame to datetime type.
 
@@ -8,6 +11,8 @@ def convert_to_datetime(df, columns=None):
     df (DataFrame): Input DataFrame.
     columns (list of str, optional): List of columns to convert. 
                                      If None, attempts to convert all object type columns.
+    report (dict, optional): If given, filled with the number of values of each column per date format,
+                             and of missing and coerced values (see `parse_dates`).
 
     Returns:
     DataFrame: DataFrame with date-like columns converted to datetime type.
@@ -21,37 +26,51 @@ def convert_to_datetime(df, columns=None):
         df[columns] = df[columns].astype(str)
     
     # Iterate through each specified column
+    skipped = {}
     for col in columns:
-        print(f"Attempting column: {col}")
         # Check if the column can be converted to datetime
         try:
-
-            # date1 = pd.to_datetime(df_copy[col], errors='coerce', format='%Y-%m-%d %H:%M:%S')
-            # date2 = pd.to_datetime(df_copy[col], errors='coerce', format='%Y-%m-%d')
-
-            # df[col] = date1.fillna(date2)
-            df_copy[col]  = pd.to_datetime(df_copy[col], errors='coerce', format="mixed", dayfirst=True)
-            print(f"Column {col} transformed successfully.\n")
+            df_copy[col], counts = parse_dates(df_copy[col], dayfirst=True)
         except Exception as e:
-            print(f"Column {col} is incompatible with datetime: {e}\n")
+            skipped[col] = str(e)
             # If conversion fails, skip to the next column
             continue
-            
+        if report is not None:
+            report[col] = counts
+
+    if skipped:
+        log_event('columns_not_datetime', logging.WARNING, columns=skipped)
     return df_copy
 
-def aggregate_data(df, freq, current_date, forecast_horizon):
 
-    df = convert_to_datetime(df, columns=['ΗΜΕΡΟΜΗΝΙΑ ΥΠΟΒΟΛΗΣ ΑΙΤΗΣΗΣ', 'ΗΜΕΡΟΜΗΝΙΑ ΕΚΔ. ΑΔ.ΠΑΡΑΓΩΓΗΣ', 'ΗΜΕΡΟΜΗΝΙΑ ΛΗΞΗΣ ΑΔ.ΠΑΡΑΓΩΓΗΣ'])
+DATE_COLUMNS = ['ΗΜΕΡΟΜΗΝΙΑ ΥΠΟΒΟΛΗΣ ΑΙΤΗΣΗΣ', 'ΗΜΕΡΟΜΗΝΙΑ ΕΚΔ. ΑΔ.ΠΑΡΑΓΩΓΗΣ', 'ΗΜΕΡΟΜΗΝΙΑ ΛΗΞΗΣ ΑΔ.ΠΑΡΑΓΩΓΗΣ']
+
+# Permits are aggregated per period of their issue date
+ISSUE_DATE_COLUMN = 'ΗΜΕΡΟΜΗΝΙΑ ΕΚΔ. ΑΔ.ΠΑΡΑΓΩΓΗΣ'
+
+AGGREGATIONS = {
+    'ΙΣΧΥΣ (MW)': ['count', 'sum', 'mean', 'min', 'max'],
+    'RSI': ['mean', 'min', 'max'],
+    'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ': ['mean', 'min', 'max'],
+    'RSI_ΔΗΜΟΣ ': ['mean', 'min', 'max'],
+    'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ': ['mean', 'min', 'max'],
+    'RSI_ΘΕΣΗ': ['mean', 'min', 'max'],
+}
 
-    aggregation = df.groupby(pd.Grouper(key='ΗΜΕΡΟΜΗΝΙΑ ΕΚΔ. ΑΔ.ΠΑΡΑΓΩΓΗΣ', freq=freq)).agg({
-        'ΙΣΧΥΣ (MW)': ['count', 'sum', 'mean', 'min', 'max'],
-        'RSI': ['mean', 'min', 'max'],
-        'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ': ['mean', 'min', 'max'],
-        'RSI_ΔΗΜΟΣ ': ['mean', 'min', 'max'],
-        'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ': ['mean', 'min', 'max'],
-        'RSI_ΘΕΣΗ': ['mean', 'min', 'max'],
-    })
 
+def extend_aggregation(aggregation, freq, current_date, forecast_horizon):
+    """
+    Drop incomplete periods, append the future periods and flatten the column names of an aggregation.
+
+    Parameters:
+    aggregation (DataFrame): Aggregation with (column, statistic) columns.
+    freq (str): The aggregation frequency.
+    current_date (str): The first future date.
+    forecast_horizon (int): The number of future periods.
+
+    Returns:
+    DataFrame: The extended aggregation.
+    """
     aggregation = aggregation.dropna()
 
     # Extend DataFrame with future dates based on the provided current date and forecast horizon
@@ -63,3 +82,104 @@ def aggregate_data(df, freq, current_date, forecast_horizon):
     aggregation.columns = ['_'.join(col).strip() for col in aggregation.columns.values]
 
     return aggregation
+
+
+def aggregate_data(df, freq, current_date, forecast_horizon, report=None):
+
+    df = convert_to_datetime(df, columns=DATE_COLUMNS, report=report)
+
+    aggregation = df.groupby(pd.Grouper(key=ISSUE_DATE_COLUMN, freq=freq)).agg(AGGREGATIONS)
+
+    return extend_aggregation(aggregation, freq, current_date, forecast_horizon)
+
+
+class StreamingAggregator:
+    def __init__(self, freq):
+        """
+        Initialize the StreamingAggregator class.
+
+        Folds chunks of permit rows into running per-period count, sum, min and max accumulators, from
+        which `aggregate_data`'s statistics are derived. Memory depends on the number of periods only,
+        not on the number of rows.
+
+        Parameters:
+        freq (str): The aggregation frequency. Anchored frequencies (e.g. 'M', 'Q', 'W') give the same
+                    periods as `aggregate_data` whatever the chunking.
+        """
+        self.freq = freq
+        self.columns = list(AGGREGATIONS)
+        self.counts = pd.DataFrame(columns=self.columns, dtype='float64')
+        self.sums = pd.DataFrame(columns=self.columns, dtype='float64')
+        self.mins = pd.DataFrame(columns=self.columns, dtype='float64')
+        self.maxs = pd.DataFrame(columns=self.columns, dtype='float64')
+        self.rows = 0
+
+    def update(self, chunk):
+        """
+        Fold a chunk of permits, whose issue date is already parsed, into the accumulators.
+
+        Parameters:
+        chunk (DataFrame): Permit rows with the issue date and the aggregated columns.
+        """
+        grouped = chunk.groupby(pd.Grouper(key=ISSUE_DATE_COLUMN, freq=self.freq))[self.columns]
+        self.counts = self.counts.add(grouped.count(), fill_value=0)
+        self.sums = self.sums.add(grouped.sum(), fill_value=0)
+        self.mins = pd.concat([self.mins, grouped.min()]).groupby(level=0).min()
+        self.maxs = pd.concat([self.maxs, grouped.max()]).groupby(level=0).max()
+        self.rows += len(chunk)
+
+    def aggregation(self):
+        """
+        Get the per-period statistics of all rows seen so far.
+
+        Returns:
+        DataFrame: Aggregation with the same (column, statistic) columns as `aggregate_data`'s groupby.
+        """
+        counts = self.counts.sort_index()
+        statistics = {
+            'count': counts,
+            'sum': self.sums.reindex(counts.index),
+            # Periods without values get NaN, as in groupby's mean, min and max
+            'mean': self.sums.reindex(counts.index) / counts.where(counts > 0),
+            'min': self.mins.reindex(counts.index),
+            'max': self.maxs.reindex(counts.index),
+        }
+        aggregation = pd.DataFrame({
+            (column, statistic): statistics[statistic][column]
+            for column, column_statistics in AGGREGATIONS.items()
+            for statistic in column_statistics
+        }, index=counts.index)
+        aggregation.index.name = ISSUE_DATE_COLUMN
+        return aggregation
+
+
+def aggregate_data_streaming(source, freq, current_date, forecast_horizon, chunksize=50000, report=None):
+    """
+    Aggregate a permit CSV chunk by chunk, reading only the issue date and the aggregated columns.
+
+    Gives the same result as `aggregate_data` with memory that stays flat in the number of rows.
+
+    Parameters:
+    source: Path or file-like object of the permit CSV.
+    freq (str): The aggregation frequency.
+    current_date (str): The first future date.
+    forecast_horizon (int): The number of future periods.
+    chunksize (int): The number of rows read at a time.
+    report (dict, optional): If given, filled with the date format counts of the issue date (see `parse_dates`).
+
+    Returns:
+    DataFrame: The extended aggregation.
+    """
+    aggregator = StreamingAggregator(freq)
+    dtypes = {ISSUE_DATE_COLUMN: str, **{column: 'float64' for column in AGGREGATIONS}}
+    reader = pd.read_csv(source, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            chunk[ISSUE_DATE_COLUMN], counts = parse_dates(chunk[ISSUE_DATE_COLUMN], dayfirst=True)
+            if report is not None:
+                totals = report.setdefault(ISSUE_DATE_COLUMN, dict.fromkeys(counts, 0))
+                for name, count in counts.items():
+                    totals[name] += count
+            aggregator.update(chunk)
+
+    return extend_aggregation(aggregator.aggregation(), freq, current_date, forecast_horizon)
@@ -0,0 +1,95 @@
+# date_parser.py
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# The date formats found in the RAE registries: the shape of the values in each format, matched for all
+# values at once, and the exact format they are parsed with in a single vectorized call
+DATE_FORMATS = {
+    'iso_datetime': (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', '%Y-%m-%d %H:%M:%S'),
+    'iso_datetime_fraction': (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{1,6}$', '%Y-%m-%d %H:%M:%S.%f'),
+    'iso_date': (r'^\d{4}-\d{2}-\d{2}$', '%Y-%m-%d'),
+    'day_month_year': (r'^\d{1,2}/\d{1,2}/\d{4}$', '%d/%m/%Y'),
+    'day_month_year_dots': (r'^\d{1,2}\.\d{1,2}\.\d{4}$', '%d.%m.%Y'),
+}
+
+# Day counts as written by Excel when a date cell is exported as a number (5 digits cover 1927-2173)
+EXCEL_SERIAL = r'^\d{5}(\.\d+)?$'
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+
+def parse_dates(values, dayfirst=True, parse_excel_serials=False):
+    """
+    Parse a column of date strings, giving the same result as
+    `pd.to_datetime(values, errors='coerce', format='mixed', dayfirst=True)`.
+
+    Each distinct value is parsed once. The values in the shape of one of `DATE_FORMATS` are parsed with
+    one vectorized exact-format call per format; the remaining values, and those the exact format rejects,
+    fall back to the element-wise mixed-format parser.
+
+    Parameters:
+    - values (pd.Series): The column to parse.
+    - dayfirst (bool): Whether ambiguous values in the fallback are read day first.
+    - parse_excel_serials (bool): Whether Excel day serials (e.g. '44000') are converted to dates. The mixed
+      parser turns them into NaT, which stays the default.
+
+    Returns:
+    - tuple: The parsed pd.Series (datetime64[ns]) and a dict with the number of values per format,
+      'excel_serial', 'other' (parsed by the fallback), 'missing' and 'coerced' (non-missing values that became NaT).
+    """
+    values = pd.Series(values)
+    counts = {name: 0 for name in DATE_FORMATS}
+    counts.update(excel_serial=0, other=0, missing=0, coerced=0)
+
+    # Already typed columns are left to pandas, as before
+    if values.dtype != object:
+        parsed = pd.to_datetime(values, errors='coerce', format='mixed', dayfirst=dayfirst)
+        counts['missing'] = int(values.isna().sum())
+        counts['other'] = len(values) - counts['missing']
+        counts['coerced'] = int(parsed.isna().sum()) - counts['missing']
+        return parsed, counts
+
+    # Memoize: parse the distinct values only and map the results back
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object), use_na_sentinel=True)
+    unique_counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    parsed_uniques = np.full(len(uniques), np.datetime64('NaT'), dtype='datetime64[ns]')
+    is_string = np.fromiter((isinstance(value, str) for value in uniques), dtype=bool, count=len(uniques))
+    pending = ~is_string
+
+    strings = pd.Series(uniques, dtype=object)
+    # The shapes are matched with Arrow's vectorized regular expressions
+    arrow_strings = pa.array(strings.where(is_string, None), type=pa.string(), from_pandas=True)
+
+    def shaped_like(pattern):
+        return is_string & pc.match_substring_regex(arrow_strings, pattern).to_numpy(zero_copy_only=False).astype(bool)
+
+    for name, (pattern, date_format) in DATE_FORMATS.items():
+        matches = shaped_like(pattern)
+        positions = np.flatnonzero(matches)
+        parsed = pd.to_datetime(strings.iloc[positions], errors='coerce', format=date_format).to_numpy()
+        valid = ~np.isnat(parsed)
+        parsed_uniques[positions[valid]] = parsed[valid]
+        counts[name] = int(unique_counts[positions[valid]].sum())
+        # Values in the format's shape but not valid in it (e.g. month 13) are left to the fallback
+        pending[positions[~valid]] = True
+        is_string &= ~matches
+
+    serials = shaped_like(EXCEL_SERIAL)
+    counts['excel_serial'] = int(unique_counts[serials].sum())
+    if parse_excel_serials and serials.any():
+        days = strings[serials].astype(float).to_numpy()
+        parsed_uniques[serials] = (EXCEL_EPOCH + pd.to_timedelta(days, unit='D')).to_numpy()
+    is_string &= ~serials
+
+    pending |= is_string
+    if pending.any():
+        fallback = pd.to_datetime(pd.Series(uniques[pending], dtype=object), errors='coerce', format='mixed', dayfirst=dayfirst)
+        parsed_uniques[pending] = fallback.to_numpy()
+        counts['other'] = int(unique_counts[pending & ~np.isnat(parsed_uniques)].sum())
+
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    result[codes >= 0] = parsed_uniques[codes[codes >= 0]]
+    counts['missing'] = int((codes < 0).sum())
+    counts['coerced'] = int(np.isnat(result).sum()) - counts['missing']
+    return pd.Series(result, index=values.index, name=values.name), counts
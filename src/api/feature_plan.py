@@ -0,0 +1,119 @@
+# feature_plan.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class FeaturePlan:
+    def __init__(self):
+        """
+        Initialize the FeaturePlan class.
+
+        A graph of feature computations declared as nodes: each node is a function of the outputs of its
+        input nodes (or of the sources given to `run`) and of its keyword parameters. Declaring the same
+        computation twice (same function, inputs and parameters) adds no node; the first declaration's
+        name is returned and serves both.
+        """
+        self.nodes = {}
+        self.declarations = {}
+        self._names_by_key = {}
+
+    def add(self, name: str, function, inputs: list = (), **params) -> str:
+        """
+        Declare a node.
+
+        Parameters:
+        - name (str): The node name, used to refer to its output.
+        - function (callable): Called as `function(*input_outputs, **params)`.
+        - inputs (list): Names of the nodes or sources whose outputs are the positional arguments.
+        - params: The keyword parameters of the function.
+
+        Returns:
+        - str: The name of the node computing this, `name` unless an identical node was declared before.
+        """
+        key = (function, tuple(inputs), repr(sorted(params.items())))
+        if key in self._names_by_key:
+            name = self._names_by_key[key]
+            self.declarations[name] += 1
+            return name
+        if name in self.nodes:
+            raise ValueError(f"Node '{name}' is already declared with another computation.")
+        self.nodes[name] = {'function': function, 'inputs': list(inputs), 'params': params}
+        self.declarations[name] = 1
+        self._names_by_key[key] = name
+        return name
+
+    def order(self) -> list:
+        """
+        Order the nodes so that every node comes after its inputs, keeping the declaration order otherwise.
+
+        Returns:
+        - list: The node names.
+        """
+        ordered, done = [], set()
+        remaining = list(self.nodes)
+        while remaining:
+            ready = [name for name in remaining if all(node in done or node not in self.nodes for node in self.nodes[name]['inputs'])]
+            if not ready:
+                raise ValueError(f'The nodes {remaining} depend on each other.')
+            ordered.extend(ready)
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+        return ordered
+
+    def run(self, sources: dict, max_workers: int = None, report: dict = None) -> dict:
+        """
+        Compute every node, running the nodes whose inputs are ready concurrently in a thread pool.
+
+        Parameters:
+        - sources (dict): The outputs of the inputs that are not nodes, e.g. {'data': df}.
+        - max_workers (int): Number of threads. Default is the CPU count, at most 4.
+        - report (dict): If given, filled with the cost of each node, in order of completion: its `inputs`,
+          the number of `declarations` it served, `wall` and `cpu` seconds, and the `columns` and `bytes`
+          of its output when it has them.
+
+        Returns:
+        - dict: The outputs of the sources and of every node.
+        """
+        missing = {node for spec in self.nodes.values() for node in spec['inputs'] if node not in self.nodes and node not in sources}
+        if missing:
+            raise ValueError(f'Missing sources {sorted(missing)}.')
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+
+        outputs = dict(sources)
+        order = self.order()
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while order or running:
+                # Submit, in plan order, every node whose inputs are computed
+                for name in [name for name in order if all(node in outputs for node in self.nodes[name]['inputs'])]:
+                    order.remove(name)
+                    inputs = [outputs[node] for node in self.nodes[name]['inputs']]
+                    running[pool.submit(self._run_node, name, inputs)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    outputs[name], cost = future.result()
+                    if report is not None:
+                        report[name] = cost
+        return outputs
+
+    def _run_node(self, name: str, inputs: list) -> tuple:
+        spec = self.nodes[name]
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        output = spec['function'](*inputs, **spec['params'])
+        cost = {
+            'inputs': spec['inputs'],
+            'declarations': self.declarations[name],
+            'wall': time.perf_counter() - wall_start,
+            'cpu': time.thread_time() - cpu_start,
+        }
+        shape = getattr(output, 'shape', None)
+        if shape is not None and len(shape) == 2:
+            cost['columns'] = shape[1]
+        if hasattr(output, 'memory_usage'):
+            cost['bytes'] = int(output.memory_usage(index=False).sum())
+        elif hasattr(output, 'nbytes'):
+            cost['bytes'] = int(output.nbytes)
+        return output, cost
@@ -0,0 +1,215 @@
+# feature_store.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from file_lock import file_lock
+
+# The tables written for every partition by `process_time_series`
+FEATURE_TABLES = ['result', 'extended_result']
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """
+    Hash the index, columns and values of a table, e.g. the aggregation a feature partition was built from.
+
+    Parameters:
+    - df (pd.DataFrame): The table.
+
+    Returns:
+    - str: The hex digest of the table.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    def __init__(self, directory: str, version: str):
+        """
+        Initialize the FeatureStore class.
+
+        A local store of the engineered feature tables. Each (frequency, slice, feature-config version)
+        is a partition of a Hive-style Parquet dataset
+        (`frequency=M/slice=all/version=<version>/write=<id>/extended_result.parquet`), and `manifest.json`
+        records for every partition the write directory to read, the hash of the aggregation it was built
+        from, its tables and their shapes. A write never touches the files in the manifest: it fills a new
+        directory and then swaps the manifest under a lock file shared by the processes using the store.
+        A partition whose recorded input hash differs from the current input is stale; partitions of
+        other versions are kept but never read. Opened files are kept, so their (wide) Parquet footers are
+        parsed once per process.
+
+        Parameters:
+        - directory (str): Root directory of the dataset and its manifest.
+        - version (str): The feature-config version of the partitions written and read.
+        """
+        self.directory = directory
+        self.version = version
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.lock_path = os.path.join(directory, 'manifest.lock')
+        self._lock = threading.Lock()
+        self._files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self, frequency: str, slice_name: str, version: str = None) -> str:
+        return f'frequency={quote(frequency, safe="")}/slice={quote(slice_name, safe="")}/version={version or self.version}'
+
+    def _path(self, entry: dict, table: str) -> str:
+        # Entries written before write directories were introduced have their tables in the partition itself
+        return os.path.join(self.directory, *entry.get('path', entry['key']).split('/'), f'{table}.parquet')
+
+    def _open(self, path: str) -> tuple:
+        # Reuse the opened file while it is not replaced
+        modified = os.stat(path).st_mtime_ns
+        with self._lock:
+            opened = self._files.get(path)
+        if opened is None or opened[0] != modified:
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            index_columns = [column for column in parquet_file.schema_arrow.pandas_metadata['index_columns'] if isinstance(column, str)]
+            opened = (modified, parquet_file, index_columns)
+            with self._lock:
+                # Forget the files of removed write directories
+                for removed in [name for name in self._files if not os.path.exists(name)]:
+                    del self._files[removed]
+                self._files[path] = opened
+        return opened[1], opened[2]
+
+    def _open_table(self, frequency: str, slice_name: str, table: str, input_hash: str = None, attempts: int = 3) -> tuple:
+        for _ in range(attempts):
+            entry = self._load_manifest().get(self._key(frequency, slice_name))
+            if entry is None or table not in entry['tables'] or (input_hash is not None and entry['input_hash'] != input_hash):
+                return None
+            try:
+                return self._open(self._path(entry, table))
+            except FileNotFoundError:
+                # The write was removed by newer writes since the manifest was loaded
+                continue
+        return None
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict) -> None:
+        temporary_path = f'{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(temporary_path, self.manifest_path)
+
+    def status(self, frequency: str, slice_name: str, input_hash: str) -> str:
+        """
+        Check whether a partition can be read for the given input.
+
+        Parameters:
+        - frequency (str): The aggregation frequency.
+        - slice_name (str): The region/technology slice.
+        - input_hash (str): The `frame_digest` of the current input.
+
+        Returns:
+        - str: 'fresh', 'stale' (built from another input) or 'missing'.
+        """
+        entry = self._load_manifest().get(self._key(frequency, slice_name))
+        if entry is None or not all(os.path.exists(self._path(entry, table)) for table in entry['tables']):
+            return 'missing'
+        return 'fresh' if entry['input_hash'] == input_hash else 'stale'
+
+    def write(self, frequency: str, slice_name: str, input_hash: str, tables: dict) -> None:
+        """
+        Write the tables of a partition, replacing a stale one, and record it in the manifest.
+
+        Parameters:
+        - frequency (str): The aggregation frequency.
+        - slice_name (str): The region/technology slice.
+        - input_hash (str): The `frame_digest` of the input the tables were built from.
+        - tables (dict): Mapping of table name to DataFrame; the index is stored with the table.
+        """
+        key = self._key(frequency, slice_name)
+        path = f'{key}/write={time.time_ns()}-{uuid.uuid4().hex[:8]}'
+        directory = os.path.join(self.directory, *path.split('/'))
+        os.makedirs(directory)
+        for table, df in tables.items():
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=True), os.path.join(directory, f'{table}.parquet'))
+
+        with file_lock(self.lock_path):
+            manifest = self._load_manifest()
+            previous = manifest.get(key)
+            manifest[key] = {
+                'key': key,
+                'path': path,
+                'previous_path': previous.get('path') if previous else None,
+                'frequency': frequency,
+                'slice': slice_name,
+                'version': self.version,
+                'input_hash': input_hash,
+                'tables': {table: {'rows': len(df), 'columns': len(df.columns)} for table, df in tables.items()},
+                'written_at': time.time(),
+            }
+            self._save_manifest(manifest)
+
+        # Keep the replaced write for readers that loaded the manifest before the swap; drop the one before it
+        if previous and previous.get('previous_path'):
+            shutil.rmtree(os.path.join(self.directory, *previous['previous_path'].split('/')), ignore_errors=True)
+
+    def read(self, frequency: str, slice_name: str, table: str, columns: list = None, input_hash: str = None) -> pd.DataFrame:
+        """
+        Read a table of a partition, memory-mapping the file and decoding only the requested columns.
+
+        Parameters:
+        - frequency (str): The aggregation frequency.
+        - slice_name (str): The region/technology slice.
+        - table (str): The table name, e.g. 'extended_result'.
+        - columns (list): The columns to load. Default is all columns. The index is always loaded.
+        - input_hash (str): If given, the partition is only read if it was built from this input.
+
+        Returns:
+        - pd.DataFrame: The table, or None if the partition is missing or stale.
+        """
+        opened = self._open_table(frequency, slice_name, table, input_hash)
+        if opened is None:
+            return None
+        parquet_file, index_columns = opened
+        arrow_table = parquet_file.read(columns=None if columns is None else list(columns) + index_columns)
+        # The pandas metadata describes every column of a wide table; decoding it would dominate small reads
+        df = arrow_table.replace_schema_metadata(None).to_pandas()
+        if index_columns:
+            df = df.set_index(index_columns)
+            df.index.names = [None if name.startswith('__index_level_') else name for name in df.index.names]
+        return df
+
+    def columns(self, frequency: str, slice_name: str, table: str) -> list:
+        """
+        Get the column names of a table from its Parquet schema, without reading any data.
+
+        Parameters:
+        - frequency (str): The aggregation frequency.
+        - slice_name (str): The region/technology slice.
+        - table (str): The table name.
+
+        Returns:
+        - list: The column names, or None if the table is missing.
+        """
+        opened = self._open_table(frequency, slice_name, table)
+        if opened is None:
+            return None
+        parquet_file, index_columns = opened
+        return [name for name in parquet_file.schema_arrow.names if name not in index_columns]
+
+    def entries(self) -> list:
+        """
+        List the partitions in the manifest, marking those of other feature-config versions as outdated.
+
+        Returns:
+        - list: The manifest entries, each with an `outdated` flag.
+        """
+        return [dict(entry, outdated=entry['version'] != self.version) for entry in self._load_manifest().values()]
@@ -0,0 +1,21 @@
+# file_lock.py
+import fcntl
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive lock on a lock file, between the threads and the processes that share it.
+
+    The lock is released when the context exits, or by the system if the process dies.
+
+    Parameters:
+    - path (str): The lock file, created if missing.
+    """
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
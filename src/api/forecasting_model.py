@@ -1,8 +1,18 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
 import pandas as pd
 import lightgbm as lgb
 import numpy as np
 from datetime import timedelta
 from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error
+from telemetry import IterationRecorder
+from metrics import BufferedFeval
+from result_cache import evict_files
 
 
 # import debugpy
@@ -11,9 +21,13 @@ from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error
 
 
 def smape(preds, target):
-    n = len(preds)
+    preds, target = np.asarray(preds, dtype=np.float64), np.asarray(target, dtype=np.float64)
     masked_arr = ~((preds == 0) & (target == 0))
     preds, target = preds[masked_arr], target[masked_arr]
+    # Average over the points kept: a point where both are 0 is neither an error nor counted
+    n = len(preds)
+    if n == 0:
+        return 0.0
     num = np.abs(preds - target)
     denom = np.abs(preds) + np.abs(target)
     smape_val = (200 * np.sum(num / denom)) / n
@@ -28,134 +42,459 @@ def lgbm_smape(preds, train_data):
 
 def evaluate_model(y_valid, y_valid_pred):
     rmse = mean_squared_error(y_valid, y_valid_pred, squared=False)
-    print(f'Validation RMSE: {rmse}')
-
     mape = mean_absolute_percentage_error(y_valid, y_valid_pred)
-    print(f'Validation MAPE: {mape}')
-
     mape_sum = mean_absolute_percentage_error([np.sum(y_valid)], [np.sum(y_valid_pred)])
-    print(f'Validation MAPE Sum within window: {mape_sum}')
-
     smape_sum = smape([np.sum(y_valid_pred)], [np.sum(y_valid)]) / 100
-    print(f'Validation SMAPE Sum within window: {smape_sum}')
 
     return rmse, mape, mape_sum, smape_sum
 
 
-def train_and_forecast(df, target_column, last_index, validity_offset_days=30*24, top_k=20):
-    df = df.copy()
-
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Record the wall-clock and CPU time of a stage into `timings[stage]`.
+
+    CPU time is measured for the whole process, so it includes LightGBM's worker threads.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        timings[stage] = {
+            'wall': time.perf_counter() - wall_start,
+            'cpu': time.process_time() - cpu_start,
+        }
+
+
+# Aggregated columns that are (or directly give away) forecasting targets, never used as features
+TARGET_COLUMNS = [
+    'ΙΣΧΥΣ (MW)_count', 'ΙΣΧΥΣ (MW)_sum', 'ΙΣΧΥΣ (MW)_mean', 'ΙΣΧΥΣ (MW)_min', 'ΙΣΧΥΣ (MW)_max',
+    'RSI_mean', 'RSI_min', 'RSI_max', 
+    'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_mean', 'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_min', 'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_max',
+    'RSI_ΔΗΜΟΣ _mean', 'RSI_ΔΗΜΟΣ _min', 'RSI_ΔΗΜΟΣ _max',
+    'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_mean', 'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_min', 'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_max',
+    'RSI_ΘΕΣΗ_mean', 'RSI_ΘΕΣΗ_min', 'RSI_ΘΕΣΗ_max'
+]
+
+# LightGBM parameters of both models; `train_and_forecast` takes overrides, e.g. from `hyperparameter_search`
+DEFAULT_PARAMS = {
+    'objective': 'regression',
+    'metric': 'mape',
+    'boosting_type': 'gbdt',
+    'num_leaves': 31,
+    'learning_rate': 0.05,
+    'feature_fraction': 0.75,
+    'bagging_fraction': 0.75,
+    'early_stopping_rounds': 400,
+    "force_col_wise": True,
+    # The evaluation results are recorded by `IterationRecorder` instead of logged
+    "verbose": -1
+}
+NUM_BOOST_ROUND = 1000
+
+# Byte budget of the cached Dataset binaries; the least recently used are evicted beyond it
+DATASET_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Columns copied into the feature array at a time, bounding the float64 temporaries
+COPY_CHUNK_COLUMNS = 512
+
+
+def split_rows(mask):
+    """
+    Turn a row mask into a slice when the selected rows are contiguous, so indexing returns a view.
+
+    Parameters:
+    - mask (np.ndarray): Boolean mask of the rows.
+
+    Returns:
+    - slice or np.ndarray: A slice, or the row positions if the rows are not contiguous.
+    """
+    positions = np.flatnonzero(mask)
+    if len(positions) == 0:
+        return slice(0, 0)
+    if positions[-1] - positions[0] + 1 == len(positions):
+        return slice(positions[0], positions[-1] + 1)
+    return positions
+
+
+def copy_features(df, features, lag_matrices=()):
+    """
+    Copy feature columns of a table into a float32 (rows, features) array, a chunk of columns at a time.
+
+    Parameters:
+    - df (pd.DataFrame): The feature table.
+    - features (list): The columns to copy, in order.
+    - lag_matrices (list): `LagMatrix` objects with the same rows, holding the features not in the table;
+      they are written straight from their views.
+
+    Returns:
+    - np.ndarray: The C-contiguous float32 array.
+    """
+    positions = df.columns.get_indexer(features)
+    values = np.empty((len(df), len(features)), dtype=np.float32)
+    for lag_matrix in lag_matrices:
+        lag_matrix.fill(values, features)
+    if len(lag_matrices) and (positions < 0).any():
+        # Only the columns of the table are copied from it
+        in_table = np.flatnonzero(positions >= 0)
+        for start in range(0, len(in_table), COPY_CHUNK_COLUMNS):
+            chunk = in_table[start:start + COPY_CHUNK_COLUMNS]
+            values[:, chunk] = df.iloc[:, positions[chunk]].to_numpy(dtype=np.float64)
+        return values
+    for start in range(0, len(features), COPY_CHUNK_COLUMNS):
+        chunk = slice(start, start + COPY_CHUNK_COLUMNS)
+        values[:, chunk] = df.iloc[:, positions[chunk]].to_numpy(dtype=np.float64)
+    return values
+
+
+def fill_missing(block):
+    """
+    Fill NaN values in place with the mean of their column, as `DataFrame.fillna(DataFrame.mean())`.
+
+    Parameters:
+    - block (np.ndarray): The float32 (rows, features) array or view to fill.
+    """
+    missing = np.isnan(block)
+    if missing.any():
+        with warnings.catch_warnings():
+            # Columns without any value keep their NaNs
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            means = np.nanmean(block, axis=0, dtype=np.float64)
+        np.copyto(block, means.astype(np.float32), where=missing)
+
+
+def prepare_feature_base(df, lag_matrices=()):
+    """
+    Copy the features of the table once into a single float32 array (rows, features), before any split.
+
+    NaN values are left in place: they are filled per split by `prepare_split`, so one base can serve
+    several splits (e.g. the folds of a backtest).
+
+    Parameters:
+    - df (pd.DataFrame): The feature table.
+    - lag_matrices (list): `LagMatrix` objects whose lagged variables are features too, as if they were
+      columns of the table (see `run_feature_engineering`'s `lag_matrices`).
+
+    Returns:
+    - dict: The unfilled feature array `values`, its `features` names, the table's datetime `index` and
+      the table itself (`df`) for the targets.
+    """
     # Ensure the index is in datetime format
-    if not pd.api.types.is_datetime64_any_dtype(df.index):
-        df.index = pd.to_datetime(df.index, errors='coerce')
-
+    index = df.index
+    if not pd.api.types.is_datetime64_any_dtype(index):
+        index = pd.to_datetime(index, errors='coerce')
+
+    # Features, without the aggregated target columns (the target itself is removed in select_target)
+    features = df.columns
+    for lag_matrix in lag_matrices:
+        features = features.append(pd.Index(lag_matrix.columns))
+    features = features.sort_values()
+    features = features[~features.isin(TARGET_COLUMNS)]
+
+    return {'values': copy_features(df, features, lag_matrices), 'features': features, 'index': index, 'df': df}
+
+
+def prepare_split(base, last_index, validity_offset_days=30*24, train_days=None, copy=True):
+    """
+    Split the rows of a feature base into training, validation and prediction sets and fill their NaN values.
+
+    On a sorted index the splits are row ranges, so the split matrices are views of the array. NaN values
+    are filled in place, in one pass, with the mean of their column within their split.
+
+    Parameters:
+    - base (dict): The result of `prepare_feature_base`.
+    - last_index (pd.Timestamp): The last date of the validation window.
+    - validity_offset_days (int): The length of the validation window in days.
+    - train_days (int): The length of the training window in days. Default is every row before the
+      validation window.
+    - copy (bool): Fill a copy of the base array, leaving the base reusable for other splits.
+
+    Returns:
+    - dict: The base with the filled `values` and the `rows` of each split.
+    """
+    index = base['index']
     validity_offset = timedelta(days=validity_offset_days)
 
     # Define the last date for the training set
     train_end_date = last_index - validity_offset
+    train_mask = index <= train_end_date
+    if train_days is not None:
+        train_mask &= index > train_end_date - timedelta(days=train_days)
+
+    # Split the rows into training, validation and prediction sets
+    rows = {
+        'train': split_rows(train_mask),
+        'valid': split_rows((index > train_end_date) & (index <= last_index)),
+        'pred': split_rows(index > last_index),
+    }
 
-    # Split the data into training and validation sets
-    train_df = df[df.index <= train_end_date]
-    valid_df = df[(df.index > train_end_date) & (df.index <= last_index)]
-    pred_df = df[(df.index > last_index)]
-
-    # Features and target
-    features = df.columns.difference([target_column])
-    target_lbl = target_column
-
-    X_train, y_train = train_df[features], train_df[target_lbl]
-    X_valid, y_valid = valid_df[features], valid_df[target_lbl]
-    X_pred = pred_df[features]
-
-
-    # Clear dataframe from possible target columns 
-    # List of columns to drop if found
-    columns_to_drop = [
-        'ΙΣΧΥΣ (MW)_count', 'ΙΣΧΥΣ (MW)_sum', 'ΙΣΧΥΣ (MW)_mean', 'ΙΣΧΥΣ (MW)_min', 'ΙΣΧΥΣ (MW)_max',
-        'RSI_mean', 'RSI_min', 'RSI_max', 
-        'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_mean', 'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_min', 'RSI_ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ_max',
-        'RSI_ΔΗΜΟΣ _mean', 'RSI_ΔΗΜΟΣ _min', 'RSI_ΔΗΜΟΣ _max',
-        'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_mean', 'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_min', 'RSI_ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ_max',
-        'RSI_ΘΕΣΗ_mean', 'RSI_ΘΕΣΗ_min', 'RSI_ΘΕΣΗ_max'
-    ]
-
-    # Drop specified columns if they exist
-    X_train = X_train.drop(columns=[col for col in columns_to_drop if col in X_train.columns])
-    X_valid = X_valid.drop(columns=[col for col in columns_to_drop if col in X_valid.columns])
-    X_pred = X_pred.drop(columns=[col for col in columns_to_drop if col in X_pred.columns])
-
-    # Fill NaN values with the average of their respective columns
-    X_train = X_train.fillna(X_train.mean())
-    X_valid = X_valid.fillna(X_valid.mean())
-    X_pred = X_pred.fillna(X_pred.mean())
-
-    # LightGBM dataset
-    train_data = lgb.Dataset(X_train, label=y_train)
-    valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data)
+    values = base['values'].copy() if copy else base['values']
 
-    # Parameters
-    params = {
-        'objective': 'regression',
-        'metric': 'mape',
-        'boosting_type': 'gbdt',
-        'num_leaves': 31,
-        'learning_rate': 0.05,
-        'feature_fraction': 0.75,
-        'bagging_fraction': 0.75,
-        'early_stopping_rounds': 400,
-        "force_col_wise": True,
-        "verbose": 2
-    }
-    evaluation = lgb.log_evaluation(period=1, show_stdv=True)
-    # Training
-    num_boost_round = 1000
-
-    bst1 = lgb.train(
-        params,
-        train_data,
-        num_boost_round=num_boost_round,
-        valid_sets=[valid_data, train_data],
-        feval=lgbm_smape,
-        callbacks=[evaluation],
-    )
+    # Fill NaN values with the average of their respective columns within each split
+    for split in rows.values():
+        block = values[split]
+        fill_missing(block)
+        if not isinstance(split, slice):
+            values[split] = block
 
-    feature_importance = bst1.feature_importance(importance_type='gain')
-    feature_names = X_train.columns
-    feature_importance_df = pd.DataFrame({'feature': feature_names, 'importance': feature_importance})
-    feature_importance_df = feature_importance_df.sort_values(by='importance', ascending=False)
-    feature_importance_df = feature_importance_df[feature_importance_df['importance']!=0]
-    
-    top_100_features = feature_importance_df['feature'].head(top_k).tolist()
+    return dict(base, values=values, rows=rows)
 
-    X_train_top100 = X_train[top_100_features]
-    X_valid_top100 = X_valid[top_100_features]
-    X_pred_top100 = X_pred[top_100_features]
 
-    train_data_top100 = lgb.Dataset(X_train_top100, label=y_train)
-    valid_data_top100 = lgb.Dataset(X_valid_top100, label=y_valid, reference=train_data_top100)
+def prepare_feature_matrices(df, last_index, validity_offset_days=30*24, train_days=None, lag_matrices=()):
+    """
+    Split the feature table and build the cleaned feature matrix, independently of the target.
 
-    bst2 = lgb.train(
-        params,
-        train_data_top100,
-        num_boost_round=num_boost_round,
-        valid_sets=[valid_data_top100, train_data_top100],
-        feval=lgbm_smape,
-        callbacks=[evaluation],
-    )
+    The features are copied once into a single float32 array (see `prepare_feature_base`), and the splits
+    are filled in place (see `prepare_split`).
+
+    The result can be shared by every target trained on the same split (see `select_target`).
+
+    Parameters:
+    - df (pd.DataFrame): The feature table.
+    - last_index (pd.Timestamp): The last date of the validation window.
+    - validity_offset_days (int): The length of the validation window in days.
+    - train_days (int): The length of the training window in days. Default is every row before the
+      validation window.
+    - lag_matrices (list): `LagMatrix` objects whose lagged variables are features too.
+
+    Returns:
+    - dict: The feature array `values`, its `features` names, the `rows` of each split, the table's
+      datetime `index` and the table itself (`df`) for the targets.
+    """
+    return prepare_split(prepare_feature_base(df, lag_matrices), last_index, validity_offset_days, train_days, copy=False)
+
+
+def select_target(prepared, target_column):
+    """
+    Select the target and its feature matrices from the shared, prepared split.
 
-    y_valid_pred1 = bst1.predict(X_valid, num_iteration=bst1.best_iteration)
-    y_valid_pred2 = bst2.predict(X_valid_top100, num_iteration=bst2.best_iteration)
+    Parameters:
+    - prepared (dict): The result of `prepare_feature_matrices`.
+    - target_column (str): The name of the target column.
 
-    rmse1, mape1, mape_sum1, smape_sum1 = evaluate_model(y_valid, y_valid_pred1)
-    rmse2, mape2, mape_sum2, smape_sum2 = evaluate_model(y_valid, y_valid_pred2)
+    Returns:
+    - tuple: X_train, y_train, X_valid, y_valid and X_pred, the X matrices as float32 arrays whose
+      columns are `feature_names(prepared, target_column)`.
+    """
+    values, rows = prepared['values'], prepared['rows']
+    target = prepared['df'][target_column].to_numpy(dtype=np.float64)
+
+    # The target is only still among the features if it is not one of the aggregated target columns
+    if target_column in prepared['features']:
+        values = np.delete(values, prepared['features'].get_loc(target_column), axis=1)
+
+    X_train, y_train = values[rows['train']], target[rows['train']]
+    X_valid, y_valid = values[rows['valid']], target[rows['valid']]
+    X_pred = values[rows['pred']]
+
+    return X_train, y_train, X_valid, y_valid, X_pred
+
+
+def feature_names(prepared, target_column):
+    """
+    Get the names of the feature columns returned by `select_target`.
+
+    Parameters:
+    - prepared (dict): The result of `prepare_feature_matrices`.
+    - target_column (str): The name of the target column.
+
+    Returns:
+    - list: The feature names.
+    """
+    return [feature for feature in prepared['features'] if feature != target_column]
+
+
+def model_columns(model_string, columns):
+    """
+    Map the features of a saved model back to the columns of a feature table, so only those are loaded.
+
+    LightGBM stores feature names with whitespace replaced by underscores.
+
+    Parameters:
+    - model_string (str): The model, as returned by `Booster.model_to_string()`.
+    - columns (list): The columns of the feature table, e.g. from `FeatureStore.columns`.
+
+    Returns:
+    - list: The table columns the model needs, in the model's feature order.
+    """
+    by_model_name = {'_'.join(column.split(' ')): column for column in columns}
+    return [by_model_name[name] for name in lgb.Booster(model_str=model_string).feature_name()]
+
+
+def predict_rows(booster, df, columns):
+    """
+    Score the rows of a feature table with a trained booster.
+
+    Missing values are filled with the mean of their column over the scored rows, as for the
+    prediction split in `train_and_forecast`.
+
+    Parameters:
+    - booster (lgb.Booster): The booster, saved at its best iteration.
+    - df (pd.DataFrame): The rows to score.
+    - columns (list): The table columns of the booster's features (see `model_columns`).
+
+    Returns:
+    - np.ndarray: The predictions.
+    """
+    values = copy_features(df, columns)
+    fill_missing(values)
+    return booster.predict(values)
+
+
+def build_datasets(X_train, y_train, X_valid, y_valid, features, params, directory=None, keep_raw=False, max_cache_bytes=DATASET_CACHE_BYTES):
+    """
+    Construct (bin) the training and validation LightGBM Datasets of a model, or reload them from the binaries
+    cached in `directory`.
+
+    The binaries are keyed by a hash of the matrices, labels, feature names and parameters, so a repeated
+    request on the same table and split reloads the binned features instead of binning them again. The top-k
+    model's Datasets are built from the column subset of the same matrices and cached the same way. Beyond
+    `max_cache_bytes`, the least recently used binaries are evicted.
+
+    Parameters:
+    - X_train, y_train, X_valid, y_valid (np.ndarray): The feature matrices and labels.
+    - features (list): The feature names.
+    - params (dict): The training parameters, which also control the binning.
+    - directory (str): Directory of the cached binaries. Default is no cache.
+    - keep_raw (bool): Keep the raw matrices in the Datasets, without the cache, as needed to warm-start a booster.
+    - max_cache_bytes (int): The byte budget of the binaries in `directory`.
+
+    Returns:
+    - tuple: The constructed training and validation Datasets, and whether they were reloaded from the cache.
+    """
+    free_raw_data = not keep_raw
+    if directory is None or keep_raw:
+        train_data = lgb.Dataset(X_train, label=y_train, feature_name=list(features), params=params, free_raw_data=free_raw_data).construct()
+        valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data, params={'verbose': -1}, free_raw_data=free_raw_data).construct()
+        return train_data, valid_data, False
+
+    # Thread counts and logging do not change the binned Datasets
+    digest = hashlib.sha256()
+    for array in (X_train, y_train, X_valid, y_valid):
+        digest.update(repr((array.shape, array.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    binning_params = {key: value for key, value in params.items() if key not in ('num_threads', 'verbose')}
+    digest.update(json.dumps([list(features), binning_params, lgb.__version__], ensure_ascii=False).encode())
+    key = digest.hexdigest()[:24]
+    train_path = os.path.join(directory, f'{key}.train.bin')
+    valid_path = os.path.join(directory, f'{key}.valid.bin')
+
+    if os.path.exists(train_path) and os.path.exists(valid_path):
+        try:
+            train_data = lgb.Dataset(train_path, params=params).construct()
+            valid_data = lgb.Dataset(valid_path, reference=train_data, params={'verbose': -1}).construct()
+            # Touch the binaries so eviction follows recent use
+            os.utime(train_path)
+            os.utime(valid_path)
+            return train_data, valid_data, True
+        except (lgb.basic.LightGBMError, OSError):
+            # Evicted by another process since the check; built again below
+            pass
+
+    train_data = lgb.Dataset(X_train, label=y_train, feature_name=list(features), params=params).construct()
+    valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data, params={'verbose': -1}).construct()
+    os.makedirs(directory, exist_ok=True)
+    # The validation binary is written last, so a key is only complete once both are
+    for dataset, path in [(train_data, train_path), (valid_data, valid_path)]:
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        dataset.save_binary(temporary_path)
+        os.replace(temporary_path, path)
+    evict_files(directory, max_cache_bytes, '.bin')
+    return train_data, valid_data, False
+
+
+def prepare_forecast_data(df, target_column, last_index, validity_offset_days=30*24):
+    return select_target(prepare_feature_matrices(df, last_index, validity_offset_days), target_column)
+
+
+def train_and_forecast(df, target_column, last_index, validity_offset_days=30*24, top_k=20, num_threads=None, prepared=None,
+                       train_days=None, init_model=None, params=None, dataset_dir=None, valid_only_metrics=False):
+    timings = {}
+
+    # Reuse the split prepared for another target (or fold) when given
+    with stage_timer(timings, 'prepare'):
+        if prepared is None:
+            prepared = prepare_feature_matrices(df, last_index, validity_offset_days, train_days)
+        X_train, y_train, X_valid, y_valid, X_pred = select_target(prepared, target_column)
+        features = feature_names(prepared, target_column)
 
-    y_forecast_pred1 = bst1.predict(X_pred, num_iteration=bst1.best_iteration)
-    y_forecast_pred2 = bst2.predict(X_pred_top100, num_iteration=bst2.best_iteration)
+    # Parameters
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    # Limit LightGBM's threads when several trainings share the machine
+    if num_threads is not None:
+        params['num_threads'] = num_threads
+
+    # LightGBM dataset, binned once per table and split when cached on disk
+    with stage_timer(timings, 'dataset_model1'):
+        train_data, valid_data, reloaded = build_datasets(
+            X_train, y_train, X_valid, y_valid, features, params, dataset_dir, keep_raw=init_model is not None
+        )
+    timings['dataset_model1']['cached'] = reloaded
+
+    # Training, recording the evaluation results of every round
+    num_boost_round = NUM_BOOST_ROUND
+    recorder1, recorder2 = IterationRecorder(num_boost_round), IterationRecorder(num_boost_round)
+
+    with stage_timer(timings, 'train_model1'):
+        bst1 = lgb.train(
+            params,
+            train_data,
+            num_boost_round=num_boost_round,
+            valid_sets=[valid_data] if valid_only_metrics else [valid_data, train_data],
+            feval=BufferedFeval(('smape',)),
+            callbacks=[recorder1],
+            # Continue boosting from a previous booster on the same features, e.g. the previous backtest fold
+            init_model=lgb.Booster(model_str=init_model) if init_model is not None else None,
+        )
 
-    y_forecast1 = np.concatenate([y_valid_pred1, y_forecast_pred1])
-    y_forecast2 = np.concatenate([y_valid_pred2, y_forecast_pred2])
-    forecast_dates = np.concatenate([valid_df.index, pred_df.index])
-    print(feature_importance_df.head(top_k))
+    feature_importance = bst1.feature_importance(importance_type='gain')
+    feature_importance_df = pd.DataFrame({'feature': features, 'importance': feature_importance})
+    feature_importance_df = feature_importance_df.sort_values(by='importance', ascending=False)
+    feature_importance_df = feature_importance_df[feature_importance_df['importance']!=0]
+    
+    top_100_features = feature_importance_df['feature'].head(top_k).tolist()
+    top_100_positions = feature_importance_df.index[:top_k].to_numpy()
+
+    X_train_top100 = X_train[:, top_100_positions]
+    X_valid_top100 = X_valid[:, top_100_positions]
+    X_pred_top100 = X_pred[:, top_100_positions]
+
+    with stage_timer(timings, 'dataset_model2'):
+        train_data_top100, valid_data_top100, reloaded = build_datasets(
+            X_train_top100, y_train, X_valid_top100, y_valid, top_100_features, params, dataset_dir
+        )
+    timings['dataset_model2']['cached'] = reloaded
+
+    with stage_timer(timings, 'train_model2'):
+        bst2 = lgb.train(
+            params,
+            train_data_top100,
+            num_boost_round=num_boost_round,
+            valid_sets=[valid_data_top100] if valid_only_metrics else [valid_data_top100, train_data_top100],
+            feval=BufferedFeval(('smape',)),
+            callbacks=[recorder2],
+        )
+
+    with stage_timer(timings, 'evaluate'):
+        y_valid_pred1 = bst1.predict(X_valid, num_iteration=bst1.best_iteration)
+        y_valid_pred2 = bst2.predict(X_valid_top100, num_iteration=bst2.best_iteration)
+
+        rmse1, mape1, mape_sum1, smape_sum1 = evaluate_model(y_valid, y_valid_pred1)
+        rmse2, mape2, mape_sum2, smape_sum2 = evaluate_model(y_valid, y_valid_pred2)
+
+        y_forecast_pred1 = bst1.predict(X_pred, num_iteration=bst1.best_iteration)
+        y_forecast_pred2 = bst2.predict(X_pred_top100, num_iteration=bst2.best_iteration)
+
+        y_forecast1 = np.concatenate([y_valid_pred1, y_forecast_pred1])
+        y_forecast2 = np.concatenate([y_valid_pred2, y_forecast_pred2])
+    forecast_dates = np.concatenate([prepared['index'][prepared['rows']['valid']], prepared['index'][prepared['rows']['pred']]])
+
+    # Per-round metrics of each booster, and the top features by gain of the first one
+    telemetry1 = recorder1.summary(
+        best_iteration=bst1.best_iteration,
+        top_features={'feature': top_100_features, 'gain': feature_importance_df['importance'].head(top_k).tolist()},
+    )
+    telemetry2 = recorder2.summary(best_iteration=bst2.best_iteration)
 
-    return (bst1.model_to_string(), y_forecast1, rmse1, mape1, mape_sum1, smape_sum1), (bst2.model_to_string(), y_forecast2, rmse2, mape2, mape_sum2, smape_sum2), forecast_dates
+    return (bst1.model_to_string(), y_forecast1, rmse1, mape1, mape_sum1, smape_sum1, telemetry1), (bst2.model_to_string(), y_forecast2, rmse2, mape2, mape_sum2, smape_sum2, telemetry2), forecast_dates, timings
 
@@ -0,0 +1,355 @@
+# hyperparameter_search.py
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import wait, FIRST_COMPLETED
+import numpy as np
+import lightgbm as lgb
+
+from feature_store import frame_digest
+from forecasting_model import DEFAULT_PARAMS, NUM_BOOST_ROUND, prepare_feature_matrices, select_target, feature_names, stage_timer
+from metrics import BufferedFeval
+from training_executor import worker_input
+
+# Sampled parameters: (kind, low, high), drawn uniformly, log-uniformly or as integers. Parameters that change
+# the binning of the Dataset (e.g. max_bin, min_data_in_leaf) are not searched, so one Dataset serves every trial
+SEARCH_SPACE = {
+    'num_leaves': ('log_int', 4, 128),
+    'learning_rate': ('log', 0.01, 0.3),
+    'feature_fraction': ('uniform', 0.3, 1.0),
+    'bagging_fraction': ('uniform', 0.5, 1.0),
+    'bagging_freq': ('int', 0, 5),
+    'lambda_l2': ('log', 1e-3, 10.0),
+}
+
+# Validation metrics a search can minimize, with their name in the booster's scores
+SEARCH_METRICS = {'rmse': 'rmse', 'mape': 'mape', 'smape': 'SMAPE'}
+
+
+def _load_datasets(train_path, valid_path):
+    train = lgb.Dataset(train_path, params={'verbose': -1}).construct()
+    return train, lgb.Dataset(valid_path, reference=train, params={'verbose': -1}).construct()
+
+
+def sample_params(rng, space=SEARCH_SPACE):
+    """
+    Draw one set of parameters from the search space.
+
+    Parameters:
+    - rng (np.random.Generator): The random generator of the search.
+    - space (dict): The search space.
+
+    Returns:
+    - dict: The sampled parameters.
+    """
+    params = {}
+    for name, (kind, low, high) in space.items():
+        if kind == 'log_int':
+            params[name] = int(round(np.exp(rng.uniform(np.log(low), np.log(high)))))
+        elif kind == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        elif kind == 'log':
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def rung_budgets(min_rounds, max_rounds=NUM_BOOST_ROUND, eta=3):
+    """
+    The boosting rounds of each rung of successive halving: `min_rounds`, times `eta` per rung, up to `max_rounds`.
+
+    Parameters:
+    - min_rounds (int): The rounds of the first rung.
+    - max_rounds (int): The rounds of the last rung.
+    - eta (int): The reduction factor between rungs.
+
+    Returns:
+    - list: The rounds of each rung.
+    """
+    budgets = [min(min_rounds, max_rounds)]
+    while budgets[-1] < max_rounds:
+        budgets.append(min(budgets[-1] * eta, max_rounds))
+    return budgets
+
+
+class SuccessiveHalving:
+    def __init__(self, n_trials: int, n_rungs: int, eta: int = 3):
+        """
+        Initialize the SuccessiveHalving class.
+
+        Schedules the trials of asynchronous successive halving (ASHA). Whenever a worker is free, the best
+        `1/eta` of the results of a rung that have not been promoted yet go to the next rung, highest rungs
+        first; otherwise a new trial starts on the first rung. Once every trial has started and no trial
+        is running or has reached the last rung, the best unpromoted trial of the highest rung is promoted,
+        so the search always ends with a trial trained to the last rung.
+
+        Parameters:
+        - n_trials (int): Number of trials.
+        - n_rungs (int): Number of rungs.
+        - eta (int): Reduction factor between rungs.
+        """
+        self.n_trials = n_trials
+        self.eta = eta
+        self.top = n_rungs - 1
+        self.rungs = [[] for _ in range(n_rungs)]
+        self.promoted = [set() for _ in range(n_rungs)]
+        self.started = 0
+
+    def next_job(self, idle: bool) -> tuple:
+        """
+        Get the next trial to run.
+
+        Parameters:
+        - idle (bool): Whether no trial is running.
+
+        Returns:
+        - tuple: The trial and the rung to run it on, or None if there is nothing to run for now.
+        """
+        # Promote the best 1/eta of a rung, highest rungs first
+        for k in reversed(range(self.top)):
+            ranked = sorted(self.rungs[k])
+            for _, i in ranked[:len(ranked) // self.eta]:
+                if i not in self.promoted[k]:
+                    self.promoted[k].add(i)
+                    return i, k + 1
+        if self.started < self.n_trials:
+            self.started += 1
+            return self.started - 1, 0
+        # Once every trial has run, the best trial so far is trained to the last rung
+        if idle and not self.rungs[self.top]:
+            for k in reversed(range(self.top)):
+                ranked = [(score, i) for score, i in sorted(self.rungs[k]) if i not in self.promoted[k]]
+                if ranked:
+                    self.promoted[k].add(ranked[0][1])
+                    return ranked[0][1], k + 1
+        return None
+
+    def report(self, trial: int, rung: int, score: float) -> None:
+        """
+        Record the validation score of a trial on a rung (lower is better).
+
+        Parameters:
+        - trial (int): The trial.
+        - rung (int): The rung it ran on.
+        - score (float): Its score.
+        """
+        self.rungs[rung].append((score, trial))
+
+
+def _run_trial(train_path, valid_path, params, rounds, metric, num_threads):
+    """
+    Train a trial on the search's Datasets, loaded once per worker, for a number of rounds and return its
+    best validation score.
+    """
+    wall_start = time.perf_counter()
+    train, valid = worker_input((train_path, valid_path), _load_datasets, train_path, valid_path)
+    trial_params = dict(DEFAULT_PARAMS, **params, verbose=-1)
+    trial_params['metric'] = 'None' if metric == 'smape' else metric
+    if num_threads is not None:
+        trial_params['num_threads'] = num_threads
+
+    booster = lgb.train(
+        trial_params,
+        train,
+        num_boost_round=rounds,
+        valid_sets=[valid],
+        feval=BufferedFeval(('smape',)) if metric == 'smape' else None,
+    )
+    score = booster.best_score['valid_0'][SEARCH_METRICS[metric]]
+    return {
+        'score': float(score) if np.isfinite(score) else float('inf'),
+        'best_iteration': booster.best_iteration,
+        'wall': time.perf_counter() - wall_start,
+    }
+
+
+class HyperparameterSearch:
+    def __init__(self, directory: str, executor):
+        """
+        Initialize the HyperparameterSearch class.
+
+        Tunes the LightGBM parameters of `train_and_forecast` by random search with asynchronous successive
+        halving (ASHA): every trial is first trained for a few rounds, and only the best `1/eta` of each rung
+        are promoted to `eta` times more rounds, so poor trials are pruned early. Trials run concurrently on
+        the shared training pool, with its LightGBM threads per worker. The LightGBM Datasets of the split are
+        built and saved once; each worker loads them once and shares them across its trials.
+
+        Every search is persisted in its own directory with its Datasets and its leaderboard, which is
+        updated as trials complete.
+
+        Parameters:
+        - directory (str): Directory of the searches.
+        - executor (TrainingExecutor): The shared training pool.
+        """
+        self.directory = directory
+        self.executor = executor
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, search_id: str, name: str) -> str:
+        return os.path.join(self.directory, search_id, name)
+
+    def _save(self, leaderboard: dict) -> None:
+        path = self._path(leaderboard['search_id'], 'leaderboard.json')
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(leaderboard, f, ensure_ascii=False, indent=1)
+        os.replace(temporary_path, path)
+
+    def leaderboard(self, search_id: str) -> dict:
+        """
+        Get the persisted leaderboard of a search.
+
+        Parameters:
+        - search_id (str): The search id.
+
+        Returns:
+        - dict: The leaderboard, or None if the search does not exist.
+        """
+        try:
+            with open(self._path(search_id, 'leaderboard.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def entries(self) -> list:
+        """
+        List the searches with their best trial, most recent first.
+
+        Returns:
+        - list: The leaderboards without their trials.
+        """
+        entries = [self.leaderboard(name) for name in os.listdir(self.directory)]
+        entries = [{key: value for key, value in entry.items() if key != 'trials'} for entry in entries if entry is not None]
+        return sorted(entries, key=lambda entry: entry['started_at'], reverse=True)
+
+    def _build_datasets(self, df, target_column, last_index, validity_offset_days, search_id) -> tuple:
+        train_path, valid_path = self._path(search_id, 'train.bin'), self._path(search_id, 'valid.bin')
+        if not (os.path.exists(train_path) and os.path.exists(valid_path)):
+            prepared = prepare_feature_matrices(df, last_index, validity_offset_days)
+            X_train, y_train, X_valid, y_valid, _ = select_target(prepared, target_column)
+            if len(y_train) == 0 or len(y_valid) == 0:
+                raise ValueError('The split has no training or validation rows.')
+            features = list(feature_names(prepared, target_column))
+            train_data = lgb.Dataset(X_train, label=y_train, feature_name=features, params={'verbose': -1})
+            valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data, params={'verbose': -1})
+            # Unique temporary names, so concurrent runs of a search do not write into each other's files
+            suffix = f'{os.getpid()}.{uuid.uuid4().hex}.tmp'
+            train_data.save_binary(f'{train_path}.{suffix}')
+            valid_data.save_binary(f'{valid_path}.{suffix}')
+            os.replace(f'{train_path}.{suffix}', train_path)
+            os.replace(f'{valid_path}.{suffix}', valid_path)
+        return train_path, valid_path
+
+    def run(self, df, target_column, last_index, validity_offset_days=30*24, n_trials=20, metric='rmse',
+            min_rounds=50, max_rounds=NUM_BOOST_ROUND, eta=3, seed=0) -> dict:
+        """
+        Run a search, or return its leaderboard if the same search on the same feature table has completed.
+
+        Parameters:
+        - df (pd.DataFrame): The feature table.
+        - target_column (str): The name of the target column.
+        - last_index (pd.Timestamp): The last date of the validation window.
+        - validity_offset_days (int): The length of the validation window in days.
+        - n_trials (int): Number of sampled parameter sets.
+        - metric (str): The validation metric minimized: 'rmse', 'mape' or 'smape'.
+        - min_rounds (int): Boosting rounds of the first rung.
+        - max_rounds (int): Boosting rounds of the last rung.
+        - eta (int): Reduction factor between rungs.
+        - seed (int): Seed of the parameter sampling.
+
+        Returns:
+        - dict: The leaderboard: the trials ranked by rung reached then score, and the `best` trial.
+        """
+        if target_column not in df.columns:
+            raise ValueError(f'Unknown target_column {target_column}.')
+        if metric not in SEARCH_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(SEARCH_METRICS)}.")
+        if n_trials < 1 or min_rounds < 1 or eta < 2:
+            raise ValueError('n_trials and min_rounds must be positive and eta at least 2.')
+
+        settings = {
+            'target_column': target_column,
+            'last_index': last_index.strftime('%Y-%m-%d'),
+            'validity_offset_days': validity_offset_days,
+            'metric': metric,
+            'n_trials': n_trials,
+            'budgets': rung_budgets(min_rounds, max_rounds, eta),
+            'eta': eta,
+            'seed': seed,
+        }
+        key = json.dumps([frame_digest(df), settings, SEARCH_SPACE, DEFAULT_PARAMS])
+        search_id = hashlib.sha256(key.encode()).hexdigest()[:16]
+        leaderboard = self.leaderboard(search_id)
+        if leaderboard is not None and leaderboard['status'] == 'done':
+            return leaderboard
+        os.makedirs(os.path.join(self.directory, search_id), exist_ok=True)
+
+        timings = {}
+        with stage_timer(timings, 'datasets'):
+            train_path, valid_path = self._build_datasets(df, target_column, last_index, validity_offset_days, search_id)
+
+        budgets = settings['budgets']
+        top = len(budgets) - 1
+        rng = np.random.default_rng(seed)
+        trials = [{'trial': i, 'params': sample_params(rng), 'status': 'pending', 'rung': None, 'history': []} for i in range(n_trials)]
+        scheduler = SuccessiveHalving(n_trials, len(budgets), eta)
+
+        def ranking():
+            ranked = sorted(trials, key=lambda trial: (-(trial['rung'] if trial['rung'] is not None else -1), trial.get('score', float('inf'))))
+            best = next((trial for trial in ranked if trial['rung'] is not None), None)
+            return dict(
+                settings, search_id=search_id, started_at=started_at, status=status,
+                search_space={name: list(bounds) for name, bounds in SEARCH_SPACE.items()},
+                best=None if best is None else {key: best[key] for key in ['trial', 'params', 'score', 'rung', 'rounds', 'best_iteration']},
+                trials=ranked, timings=timings,
+            )
+
+        started_at, status = time.time(), 'running'
+        wall_start = time.perf_counter()
+        # At most one trial per worker of the shared pool is in flight, so promotions see the latest rungs
+        workers = min(self.executor.max_workers, n_trials)
+        running = {}
+        while True:
+            while len(running) < workers:
+                job = scheduler.next_job(idle=not running)
+                if job is None:
+                    break
+                i, k = job
+                trials[i]['status'] = 'running'
+                future = self.executor.schedule(
+                    _run_trial, train_path, valid_path, trials[i]['params'], budgets[k], metric, self.executor.num_threads)
+                running[future] = (i, k)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, k = running.pop(future)
+                try:
+                    result = future.result()
+                except BaseException:
+                    # Do not leave the other trials of a failed search queued on the shared pool
+                    for pending in running:
+                        pending.cancel()
+                    raise
+                scheduler.report(i, k, result['score'])
+                trials[i].update(
+                    rung=k, rounds=budgets[k], score=result['score'], best_iteration=result['best_iteration'],
+                    status='completed' if k == top else 'paused',
+                )
+                trials[i]['history'].append(dict(result, rung=k, rounds=budgets[k]))
+            self._save(ranking())
+
+        # Trials that were not promoted to the last rung were pruned
+        for trial in trials:
+            if trial['status'] == 'paused':
+                trial['status'] = 'pruned'
+        timings['search'] = {'wall': time.perf_counter() - wall_start}
+        status = 'done'
+        leaderboard = ranking()
+        self._save(leaderboard)
+        return leaderboard
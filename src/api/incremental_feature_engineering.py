@@ -0,0 +1,436 @@
+# incremental_feature_engineering.py
+import copy
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from file_lock import file_lock
+from time_series_engineering import (
+    LAG_LIST,
+    WINDOW_SIZES,
+    ManualSeasonalDecomposition,
+    MultiWindowRollingEngine,
+    TimeSeriesFeatureEngineering,
+    run_feature_engineering,
+)
+
+
+class IncrementalFeatureEngineering:
+    def __init__(self, mw_prefix: str = '(MW)', rsi_prefix: str = 'RSI_', decomposition_feature: str = 'ΙΣΧΥΣ (MW)_sum',
+                 period: int = 12, lags: list = LAG_LIST, window_sizes: list = WINDOW_SIZES):
+        """
+        Initialize the IncrementalFeatureEngineering class.
+
+        Produces the same columns as `run_feature_engineering`, but keeps the state of the last run
+        (a tail of recent rows plus expanding, EWM, autocorrelation and monthly accumulators) so that
+        new periods can be appended without recomputing the full history.
+
+        Trailing rows without any value (the future dates added by `/aggregate` and
+        `extend_with_future_dates`) are dropped before fitting and updating.
+
+        The centered trend of the last `period // 2` rows is only known once later rows arrive, so each
+        update emits these rows again, recomputed, before the new ones; the accumulators only hold the
+        rows before them. With this, features of the raw aggregated columns and of the trend equal a full
+        recompute. Features of statistics of the whole history (autocorrelation, monthly means, the
+        seasonal component and the residual built on it) and their lags, rolling, EWM and expanding
+        metrics are computed as of the update that emits a row and are not revised afterwards.
+
+        Parameters:
+        - mw_prefix (str): The prefix for MW features. Default is '(MW)'.
+        - rsi_prefix (str): The prefix for RSI features. Default is 'RSI_'.
+        - decomposition_feature (str): The feature passed to the seasonal decomposition.
+        - period (int): The period of the seasonality.
+        - lags (list): List of lag values for lagged variables and autocorrelation.
+        - window_sizes (list): List of window sizes for rolling calculations.
+        """
+        self.mw_prefix = mw_prefix
+        self.rsi_prefix = rsi_prefix
+        self.decomposition_feature = decomposition_feature
+        self.period = period
+        self.lags = list(lags)
+        self.window_sizes = list(window_sizes)
+        # Rows of context needed to recompute lags of rolling features of the decomposition
+        self.history_length = max(self.lags) + max(self.window_sizes) + period
+        # Trailing rows whose centered trend is not final yet
+        self.revised_rows = period // 2
+        self.state = None
+
+    def fit(self, data: pd.DataFrame) -> tuple:
+        """
+        Run the full feature engineering once and initialize the incremental state.
+
+        Parameters:
+        - data (pd.DataFrame): The input dataframe with time series data.
+
+        Returns:
+        - tuple: The final and extended results, as returned by `run_feature_engineering`.
+        """
+        data = self._drop_future_rows(data)
+        final_result, extended_result = run_feature_engineering(data, self.mw_prefix, self.rsi_prefix)
+        # The accumulators hold the rows up to the ones the next update recomputes
+        settled = max(0, len(data) - self.revised_rows)
+
+        decomposition = extended_result[[f'{self.decomposition_feature}_{c}' for c in ['trend', 'seasonal', 'residual']]]
+        detrended = data[self.decomposition_feature] - decomposition.iloc[:, 0]
+        sources = {
+            'mw': pd.concat([data, decomposition], axis=1).filter(like=self.mw_prefix),
+            'rsi': data.filter(like=self.rsi_prefix),
+        }
+
+        self.state = {
+            'data_columns': data.columns,
+            'final_columns': final_result.columns,
+            'extended_columns': extended_result.columns,
+            'history': extended_result.tail(self.history_length),
+            'revised': len(data) - settled,
+            'counted': detrended.notna().to_numpy()[-self.history_length:],
+            'decomposition': self._empty_monthly(1),
+            'monthly': {},
+            'expanding': {},
+            'ewm': {},
+            'autocorr': {},
+        }
+        self._accumulate_monthly(self.state['decomposition'], detrended.to_frame(), detrended.notna().to_numpy()[:, None])
+        for family, frame in sources.items():
+            values = frame.to_numpy(dtype=float)
+            self.state['monthly'][family] = self._empty_monthly(values.shape[1])
+            self._accumulate_monthly(self.state['monthly'][family], frame.iloc[:settled], ~np.isnan(values[:settled]))
+            self.state['expanding'][family] = self._empty_expanding(values.shape[1])
+            self._accumulate_expanding(self.state['expanding'][family], values[:settled])
+            _, self.state['ewm'][family] = MultiWindowRollingEngine(values[:settled]).ewm_means(self.window_sizes, return_state=True)
+            self.state['autocorr'][family] = self._empty_autocorrelation(values)
+            self._accumulate_autocorrelation(self.state['autocorr'][family], values[:settled], 0)
+
+        return final_result, extended_result
+
+    def update(self, new_data: pd.DataFrame) -> tuple:
+        """
+        Compute the feature rows for new periods from the stored state.
+
+        Parameters:
+        - new_data (pd.DataFrame): The new rows, with the same columns as the data passed to `fit`.
+
+        Returns:
+        - tuple: The final and extended result rows: the last `revised_rows` rows emitted before,
+          recomputed, followed by the new periods.
+        """
+        if self.state is None:
+            raise ValueError('The incremental state is not initialized; call fit first.')
+        history = self.state['history']
+        new_data = self._drop_future_rows(new_data[self.state['data_columns']])
+        if len(new_data) and len(history) and new_data.index[0] <= history.index[-1]:
+            raise ValueError(f'New rows must start after {history.index[-1]}.')
+
+        n_old = len(history)
+        raw = pd.concat([history[self.state['data_columns']], new_data])
+        # Rows from `start` are emitted; rows from `settled` are only folded into copies of the accumulators
+        start = n_old - self.state['revised']
+        settled = max(start, len(raw) - self.revised_rows)
+        index = raw.index[start:]
+
+        decomposition = self._update_decomposition(raw)
+        sources = {
+            'mw': pd.concat([raw, decomposition], axis=1).filter(like=self.mw_prefix),
+            'rsi': raw.filter(like=self.rsi_prefix),
+        }
+
+        families = {}
+        for family, prefix in [('mw', self.mw_prefix), ('rsi', self.rsi_prefix)]:
+            frame = sources[family]
+            values = frame.to_numpy(dtype=float)
+            observed = ~np.isnan(values)
+
+            # Autocorrelation, monthly means and expanding metrics only need the accumulators
+            self._accumulate_autocorrelation(self.state['autocorr'][family], values[:settled], start)
+            autocorr = self._accumulate_autocorrelation(copy.deepcopy(self.state['autocorr'][family]), values, settled)
+            self._accumulate_monthly(self.state['monthly'][family], frame.iloc[start:settled], observed[start:settled])
+            monthly_state = copy.deepcopy(self.state['monthly'][family])
+            self._accumulate_monthly(monthly_state, frame.iloc[settled:], observed[settled:])
+            expanding = [
+                self._accumulate_expanding(self.state['expanding'][family], values[start:settled]),
+                self._accumulate_expanding(copy.deepcopy(self.state['expanding'][family]), values[settled:]),
+            ]
+            expanding_mean, expanding_std = (np.concatenate(metric) for metric in zip(*expanding))
+
+            autocorr_metrics = pd.DataFrame(
+                np.tile(autocorr.reshape(1, -1), (len(index), 1)),
+                index=index,
+                columns=[f'{feature}_autocorr_lag_{lag}' for lag in self.lags for feature in frame.columns],
+            )
+            seasonal_aggregations = pd.DataFrame(
+                self._monthly_means(monthly_state, index), index=index, columns=[f'{feature}_mean_monthly' for feature in frame.columns])
+            expanding_metrics = pd.DataFrame(
+                np.stack([expanding_mean, expanding_std], axis=2).reshape(len(index), -1),
+                index=index,
+                columns=[f'{feature}_expanding_{metric}' for feature in frame.columns for metric in ['mean', 'std']],
+            )
+
+            # Rolling windows are recomputed over the stored tail, EWMs continue from their state
+            engineer = TimeSeriesFeatureEngineering(frame, self.mw_prefix, self.rsi_prefix)
+            rolling_metrics = engineer.calculate_rolling_metrics(prefix, window_sizes=self.window_sizes)
+            settled_means, self.state['ewm'][family] = MultiWindowRollingEngine(values[start:settled]).ewm_means(
+                self.window_sizes, state=self.state['ewm'][family], return_state=True)
+            revised_means = MultiWindowRollingEngine(values[settled:]).ewm_means(self.window_sizes, state=self.state['ewm'][family])
+            ewm_means = np.concatenate([settled_means, revised_means], axis=1)
+            ewm_columns = [f'{feature}_ewm_{window_size}' for window_size in self.window_sizes for feature in frame.columns]
+            ewm_rows = pd.DataFrame(ewm_means.transpose(1, 0, 2).reshape(len(index), -1), index=index, columns=ewm_columns)
+            rolling_metrics[ewm_columns] = pd.concat([history[ewm_columns].iloc[:start], ewm_rows]).to_numpy()
+
+            families[family] = {
+                'autocorr': self._with_history(autocorr_metrics, start),
+                'seasonal': self._with_history(seasonal_aggregations, start),
+                'expanding': self._with_history(expanding_metrics, start),
+                'rolling': rolling_metrics,
+            }
+
+        # MW lags are taken over every MW column built so far, RSI lags over the raw RSI columns
+        mw = families['mw']
+        lag_sources_mw = pd.concat([raw, decomposition, mw['autocorr'], mw['seasonal'], mw['expanding'], mw['rolling']], axis=1)
+        lagged_mw = self._lagged_rows(lag_sources_mw.filter(like=self.mw_prefix), start)
+        lagged_rsi = self._lagged_rows(raw.filter(like=self.rsi_prefix), start)
+
+        rsi = families['rsi']
+        time_features = TimeSeriesFeatureEngineering(raw.iloc[start:]).extract_time_based_features()
+        final_result = pd.concat([
+            mw['rolling'].iloc[start:], mw['autocorr'].iloc[start:], lagged_mw, mw['seasonal'].iloc[start:], mw['expanding'].iloc[start:],
+            rsi['rolling'].iloc[start:], rsi['autocorr'].iloc[start:], lagged_rsi, rsi['seasonal'].iloc[start:], rsi['expanding'].iloc[start:],
+            time_features,
+        ], axis=1)
+        extended_result = pd.concat([raw.iloc[start:], decomposition.iloc[start:], final_result], axis=1)
+
+        self.state['history'] = pd.concat([history.iloc[:start], extended_result]).tail(self.history_length)
+        self.state['revised'] = len(raw) - settled
+        self.state['counted'] = self.state['counted'][-self.history_length:]
+
+        return final_result, extended_result
+
+    def save(self, path: str) -> None:
+        """
+        Persist the incremental state, replacing the file at once so a reader never sees a partial state.
+
+        Parameters:
+        - path (str): The file path of the state.
+        """
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def load(path: str) -> 'IncrementalFeatureEngineering':
+        """
+        Load a persisted incremental state.
+
+        Parameters:
+        - path (str): The file path of the state.
+
+        Returns:
+        - IncrementalFeatureEngineering: The restored instance.
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _with_history(self, new_rows: pd.DataFrame, start: int) -> pd.DataFrame:
+        """
+        Prepend the stored values of the same columns before `start`, so lags over the tail see the emitted rows.
+        """
+        return pd.concat([self.state['history'][new_rows.columns].iloc[:start], new_rows])
+
+    @staticmethod
+    def _drop_future_rows(data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop the trailing rows without any value, e.g. the future dates appended for forecasting.
+        """
+        observed = data.notna().any(axis=1).to_numpy()
+        return data.iloc[:len(observed) - int(np.argmax(observed[::-1]))] if observed.any() else data.iloc[:0]
+
+    def _lagged_rows(self, frame: pd.DataFrame, start: int) -> pd.DataFrame:
+        """
+        Create the lagged variables of `frame` for the rows `start:` only, by indexing into the tail.
+        """
+        values = frame.to_numpy(dtype=float)
+        positions = np.arange(start, len(frame))
+        blocks = []
+        for lag in self.lags:
+            lagged = np.full((len(positions), values.shape[1]), np.nan)
+            available = positions >= lag
+            lagged[available] = values[positions[available] - lag]
+            blocks.append(lagged)
+        return pd.DataFrame(
+            np.hstack(blocks),
+            index=frame.index[start:],
+            columns=[f'{feature}_lagged_{lag}' for lag in self.lags for feature in frame.columns],
+        )
+
+    def _update_decomposition(self, raw: pd.DataFrame) -> pd.DataFrame:
+        """
+        Recompute the decomposition over the stored tail and the new rows.
+
+        The centered trend is recomputed from the raw values, detrended values that became available
+        are folded into the monthly accumulator, and the seasonal component is read from it.
+        """
+        data = raw[self.decomposition_feature]
+        trend = ManualSeasonalDecomposition(data, self.period).moving_average(window=self.period)
+        detrended = data - trend
+
+        counted = np.concatenate([self.state['counted'], np.zeros(len(raw) - len(self.state['counted']), dtype=bool)])
+        newly_available = detrended.notna().to_numpy() & ~counted
+        self._accumulate_monthly(self.state['decomposition'], detrended.to_frame(), newly_available[:, None])
+        self.state['counted'] = counted | newly_available
+
+        seasonal = self._monthly_means(self.state['decomposition'], raw.index)[:, 0]
+        residual = data - trend - seasonal
+
+        decomposition = pd.DataFrame({
+            f'{self.decomposition_feature}_trend': trend,
+            f'{self.decomposition_feature}_seasonal': seasonal,
+            f'{self.decomposition_feature}_residual': residual,
+        }, index=raw.index)
+        return decomposition
+
+    @staticmethod
+    def _empty_monthly(n_columns: int) -> tuple:
+        return np.zeros((12, n_columns)), np.zeros((12, n_columns))
+
+    @staticmethod
+    def _accumulate_monthly(state: tuple, frame: pd.DataFrame, mask: np.ndarray) -> None:
+        """
+        Add the masked values to the per-month sums and counts.
+        """
+        sums, counts = state
+        months = frame.index.month.to_numpy() - 1
+        values = np.where(mask, frame.to_numpy(dtype=float), 0.0)
+        np.add.at(sums, months, values)
+        np.add.at(counts, months, mask)
+
+    @staticmethod
+    def _monthly_means(state: tuple, index: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Read the monthly means of the accumulated values for the rows of `index`.
+        """
+        sums, counts = state
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (sums / counts)[index.month.to_numpy() - 1]
+
+    @staticmethod
+    def _empty_expanding(n_columns: int) -> dict:
+        return {'count': np.zeros(n_columns), 'mean': np.zeros(n_columns), 'm2': np.zeros(n_columns)}
+
+    @staticmethod
+    def _accumulate_expanding(state: dict, values: np.ndarray) -> tuple:
+        """
+        Fold rows into the running count, mean and sum of squared deviations (Welford).
+
+        Returns the expanding mean and sample standard deviation after each row.
+        """
+        means = np.full(values.shape, np.nan)
+        stds = np.full(values.shape, np.nan)
+        count, mean, m2 = state['count'], state['mean'], state['m2']
+        for i, row in enumerate(values):
+            observed = ~np.isnan(row)
+            count += observed
+            delta = np.where(observed, row - mean, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean += np.where(observed, delta / count, 0.0)
+            m2 += np.where(observed, delta * (row - mean), 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means[i] = np.where(count >= 1, mean, np.nan)
+                stds[i] = np.where(count >= 2, np.sqrt(np.maximum(m2, 0.0) / (count - 1)), np.nan)
+        return means, stds
+
+    def _empty_autocorrelation(self, values: np.ndarray) -> dict:
+        # Sums are taken around a per-column reference value to limit cancellation
+        with np.errstate(invalid='ignore'):
+            reference = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(values.shape[1])
+        shape = (len(self.lags), values.shape[1])
+        state = {name: np.zeros(shape) for name in ['n', 'x', 'y', 'xx', 'yy', 'xy']}
+        state['reference'] = reference
+        return state
+
+    def _accumulate_autocorrelation(self, state: dict, values: np.ndarray, start: int) -> np.ndarray:
+        """
+        Add the (x[t], x[t - lag]) pairs of rows `start:` to the pair sums and return the Pearson correlations.
+        """
+        centered = values - state['reference']
+        for i, lag in enumerate(self.lags):
+            first = max(start, lag)
+            if first >= len(centered):
+                # No pair yet: the rows do not reach back `lag` rows
+                continue
+            x = centered[first:]
+            y = centered[first - lag:len(centered) - lag]
+            valid = ~np.isnan(x) & ~np.isnan(y)
+            x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+            state['n'][i] += valid.sum(axis=0)
+            state['x'][i] += x.sum(axis=0)
+            state['y'][i] += y.sum(axis=0)
+            state['xx'][i] += (x * x).sum(axis=0)
+            state['yy'][i] += (y * y).sum(axis=0)
+            state['xy'][i] += (x * y).sum(axis=0)
+
+        n = state['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = n * state['xy'] - state['x'] * state['y']
+            variance = (n * state['xx'] - state['x'] ** 2) * (n * state['yy'] - state['y'] ** 2)
+            autocorr = np.where((n >= 2) & (variance > 0), covariance / np.sqrt(variance), np.nan)
+        return np.clip(autocorr, -1.0, 1.0)
+
+
+def run_incremental_feature_engineering(data: pd.DataFrame, state_path: str, table_path: str, mw_prefix: str = '(MW)',
+                                        rsi_prefix: str = 'RSI_') -> tuple:
+    """
+    Append the features of new periods to a persisted feature table.
+
+    On the first call the full feature engineering runs on `data` and both the state and the table
+    are written. On later calls `data` holds only the new periods; their feature rows are computed
+    from the stored state and appended to the table, replacing the last rows it revises (see
+    `IncrementalFeatureEngineering.update`).
+
+    Calls are serialized by a lock file next to the state. The state records the byte offset of the
+    table where the rows revised by the next update start; an update truncates the table there before
+    appending, so its cost does not grow with the table, and the state is replaced last. A call that
+    failed after writing the table but before the state is then undone by the next one.
+
+    Parameters:
+    - data (pd.DataFrame): The input dataframe with time series data (full history or new periods).
+    - state_path (str): The file path of the persisted incremental state.
+    - table_path (str): The CSV file path of the persisted extended feature table.
+    - mw_prefix (str): The prefix for MW features. Default is '(MW)'.
+    - rsi_prefix (str): The prefix for RSI features. Default is 'RSI_'.
+
+    Returns:
+    - tuple: The final and extended result rows produced by this call, revised rows included.
+    """
+    with file_lock(f'{state_path}.lock'):
+        if os.path.exists(state_path) and os.path.exists(table_path):
+            engineer = IncrementalFeatureEngineering.load(state_path)
+            final_result, extended_result = engineer.update(data)
+            with open(table_path, 'rb+') as f:
+                f.truncate(engineer.state['table_offset'])
+                f.seek(0, os.SEEK_END)
+                offset = _append_rows(f, extended_result, engineer.state['revised'])
+        else:
+            engineer = IncrementalFeatureEngineering(mw_prefix, rsi_prefix)
+            final_result, extended_result = engineer.fit(data)
+            temporary_path = f'{table_path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as f:
+                f.write(extended_result.iloc[:0].to_csv().encode())
+                offset = _append_rows(f, extended_result, engineer.state['revised'])
+            os.replace(temporary_path, table_path)
+
+        engineer.state['table_offset'] = offset
+        engineer.save(state_path)
+    return final_result, extended_result
+
+
+def _append_rows(f, rows: pd.DataFrame, revised: int) -> int:
+    """
+    Write rows at the position of a binary CSV file and return the offset where its last `revised` rows start.
+    """
+    settled = len(rows) - revised
+    f.write(rows.iloc[:settled].to_csv(header=False).encode())
+    offset = f.tell()
+    f.write(rows.iloc[settled:].to_csv(header=False).encode())
+    return offset
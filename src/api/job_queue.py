@@ -0,0 +1,232 @@
+# job_queue.py
+import errno
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Running jobs record their process and a heartbeat; a job whose process is gone or whose heartbeat is
+# older than STALE_SECONDS was interrupted and is queued again
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = 60
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class JobQueue:
+    def __init__(self, directory: str, handler, max_workers: int = 1, max_queued: int = 16):
+        """
+        Initialize the JobQueue class.
+
+        Runs long requests in the background. Job state is persisted in a SQLite database and the
+        uploaded input of each job is kept on disk, so jobs that were queued or running when the
+        API stopped are queued again on start-up. Several processes may share the directory (e.g. the
+        reloader's parent and child): a job is claimed by one of them with a conditional update, and a
+        running job is only queued again once its process is gone or its heartbeat is stale.
+
+        Parameters:
+        - directory (str): Directory holding the job database and the job inputs.
+        - handler (callable): Function `handler(params, input_path)` returning a JSON-serializable result.
+        - max_workers (int): Number of jobs run at the same time.
+        - max_queued (int): Maximum number of queued and running jobs; further submissions are rejected.
+        """
+        self.directory = directory
+        self.handler = handler
+        self.max_queued = max_queued
+        self.db_path = os.path.join(directory, 'jobs.sqlite')
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers)
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            # Take the write lock first: upgrading a read lock fails at once while another process writes
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT, params TEXT, result TEXT, error TEXT, '
+                'created_at REAL, started_at REAL, finished_at REAL, owner INTEGER, heartbeat REAL)'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+            for column, kind in [('owner', 'INTEGER'), ('heartbeat', 'REAL')]:
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        self._resume()
+        threading.Thread(target=self._beat, daemon=True).start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _input_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.input')
+
+    def _resume(self) -> None:
+        # Queue again the jobs interrupted by a restart, fail those whose input is gone
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, status, owner, heartbeat FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at").fetchall()
+        for job_id, status, owner, heartbeat in rows:
+            if status == 'running':
+                if owner is not None and _process_alive(owner) and now - (heartbeat or 0) < STALE_SECONDS:
+                    continue
+                # Only the process that sees the job still owned by the stale owner queues it again
+                with self._connect() as conn:
+                    claimed = conn.execute(
+                        "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL WHERE id = ? AND status = 'running' AND owner IS ?",
+                        (job_id, owner),
+                    ).rowcount
+                if not claimed:
+                    continue
+            if os.path.exists(self._input_path(job_id)):
+                self._workers.submit(self._run, job_id)
+            else:
+                self._set(job_id, status='failed', error='Job input was lost on restart.', finished_at=time.time())
+
+    def _beat(self) -> None:
+        # Refresh the heartbeat of the jobs this process runs
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND owner = ?", (time.time(), self.pid))
+            except sqlite3.Error:
+                continue
+
+    def _set(self, job_id: str, **fields) -> None:
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', [*fields.values(), job_id])
+
+    def submit(self, params: dict, input_bytes: bytes) -> str:
+        """
+        Queue a job.
+
+        Parameters:
+        - params (dict): JSON-serializable job parameters passed to the handler.
+        - input_bytes (bytes): The uploaded input, stored on disk for the handler.
+
+        Returns:
+        - str: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            with self._connect() as conn:
+                # Count and insert in one write transaction, so processes sharing the queue respect its depth
+                conn.execute('BEGIN IMMEDIATE')
+                (active,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()
+                if active >= self.max_queued:
+                    raise QueueFullError(f'The job queue is full ({self.max_queued} jobs).')
+                with open(self._input_path(job_id), 'wb') as f:
+                    f.write(input_bytes)
+                conn.execute(
+                    "INSERT INTO jobs (id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+                    (job_id, json.dumps(params), time.time()),
+                )
+        self._workers.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id: str) -> None:
+        # Claim the job: only one thread of one process moves it from queued to running
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), self.pid, time.time(), job_id),
+            ).rowcount
+        if not claimed:
+            job = self.status(job_id)
+            # Claimed elsewhere, the input is still needed; otherwise the job was cancelled or is finished
+            if job is None or job['status'] not in ('queued', 'running'):
+                self._remove_input(job_id)
+            return
+
+        job = self.status(job_id)
+        try:
+            result = self.handler(job['params'], self._input_path(job_id))
+        except Exception as e:
+            fields = {'status': 'failed', 'error': str(e)}
+        else:
+            fields = {'status': 'done', 'result': json.dumps(result)}
+
+        # A job cancelled while running keeps its cancelled status and its result is discarded
+        fields['finished_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = 'running' AND owner = ?",
+                [*fields.values(), job_id, self.pid],
+            )
+        self._remove_input(job_id)
+
+    def _remove_input(self, job_id: str) -> None:
+        try:
+            os.remove(self._input_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def status(self, job_id: str) -> dict:
+        """
+        Get the state of a job, without its result.
+
+        Parameters:
+        - job_id (str): The job id.
+
+        Returns:
+        - dict: The job state, or None if the job does not exist.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, status, params, error, created_at, started_at, finished_at FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ['id', 'status', 'params', 'error', 'created_at', 'started_at', 'finished_at']
+        job = dict(zip(keys, row))
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def result(self, job_id: str):
+        """
+        Get the result of a finished job.
+
+        Parameters:
+        - job_id (str): The job id.
+
+        Returns:
+        - The handler's result, or None if the job does not exist or is not done.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        A queued job never starts. A running job cannot be interrupted, but its result is discarded.
+
+        Parameters:
+        - job_id (str): The job id.
+
+        Returns:
+        - bool: Whether the job was cancelled.
+        """
+        with self._connect() as conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            ).rowcount
+        return bool(cancelled)
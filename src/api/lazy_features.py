@@ -0,0 +1,200 @@
+# lazy_features.py
+import re
+import numpy as np
+import pandas as pd
+
+from feature_plan import FeaturePlan
+from time_series_engineering import (
+    AUTOCORRELATION_OUTPUTS,
+    ACF_WINDOW,
+    AutocorrelationEngine,
+    MultiWindowRollingEngine,
+    SeasonalDecompositionEngine,
+)
+
+# Suffixes of the engineered feature names, as produced by run_feature_engineering: (pattern, operation)
+SUFFIXES = [
+    (re.compile(r'^(.+)_lagged_(\d+)$'), 'lag'),
+    (re.compile(r'^(.+)_autocorr_lag_(\d+)$'), 'autocorr'),
+    (re.compile(r'^(.+)_(mean|std|min|max|skew)_rolling_(\d+)$'), 'rolling'),
+    (re.compile(r'^(.+)_ewm_(\d+)$'), 'ewm'),
+    (re.compile(r'^(.+)_mean_monthly$'), 'monthly'),
+    (re.compile(r'^(.+)_expanding_(mean|std)$'), 'expanding'),
+    (re.compile(r'^(.+)_(trend|seasonal|residual)_(\d+)$'), 'decomposition'),
+    (re.compile(r'^(.+)_(trend|seasonal|residual)$'), 'decomposition'),
+]
+TIME_FEATURES = ['month', 'year']
+
+# The period of the decomposition without a period suffix, as in run_feature_engineering
+DECOMPOSITION_PERIOD = 12
+
+
+def _source(data, column):
+    return data[column].to_numpy(dtype=float)
+
+
+def _lag(values, lag):
+    # As Series.shift(lag)
+    lagged = np.full(len(values), np.nan)
+    if lag < len(values):
+        lagged[lag:] = values[:len(values) - lag]
+    return lagged
+
+
+def _window_statistics(values, window):
+    return MultiWindowRollingEngine(values[:, np.newaxis]).window_statistics(window)
+
+
+def _ewm(values, span):
+    return MultiWindowRollingEngine(values[:, np.newaxis]).ewm_means([span])[0, :, 0]
+
+
+def _pick(components, component):
+    return components[component][:, 0]
+
+
+def _autocorrelation(values, lag, output, window):
+    engine = AutocorrelationEngine(values[:, np.newaxis])
+    if output == 'constant':
+        return np.full(len(values), engine.acf([lag])[0, 0])
+    return engine.expanding_acf([lag], window=window if output == 'rolling' else None)[0, :, 0]
+
+
+def _monthly(values, data):
+    return pd.Series(values, index=data.index).groupby(data.index.month).transform('mean').to_numpy()
+
+
+def _expanding(values, statistic):
+    return getattr(pd.Series(values).expanding(), statistic)().to_numpy()
+
+
+def _decompose(values, data, period):
+    return SeasonalDecompositionEngine(values[:, np.newaxis], data.index).decompose(period)
+
+
+def _time(data, attribute):
+    return np.asarray(getattr(data.index, attribute), dtype=float)
+
+
+class LazyFeatures:
+    def __init__(self, features: list, columns: list, autocorrelation: str = 'constant'):
+        """
+        Initialize the LazyFeatures class.
+
+        Derives, from the names of engineered features (e.g. a booster's `feature_name()`), the
+        computations producing only those features from an aggregation: each name is read back into its
+        operations down to a column of the aggregation, e.g. `ΙΣΧΥΣ (MW)_sum_trend_mean_rolling_3_lagged_2`
+        into a lag of a rolling mean of the trend of `ΙΣΧΥΣ (MW)_sum`. The operations are the nodes of a
+        `FeaturePlan`, one column each, so intermediate columns shared by several features are computed once.
+
+        Parameters:
+        - features (list): The feature names. Names with whitespace replaced by underscores, as LightGBM
+          stores them, are matched too.
+        - columns (list): The columns of the aggregation.
+        - autocorrelation (str): The autocorrelation output the model was trained with.
+        """
+        if autocorrelation not in AUTOCORRELATION_OUTPUTS:
+            raise ValueError(f"Unknown autocorrelation output '{autocorrelation}'; use {', '.join(AUTOCORRELATION_OUTPUTS)}.")
+        self.autocorrelation = autocorrelation
+        self.columns = list(columns)
+        self._by_model_name = {'_'.join(column.split(' ')): column for column in self.columns}
+        self.plan = FeaturePlan()
+        # Rows of history each node needs before a row, None for the whole history
+        self._history = {}
+
+        unknown = []
+        # The table column name of each feature, and the node computing it (shared by identical features)
+        self.features = []
+        self._nodes = []
+        for feature in features:
+            try:
+                node, name = self._declare(feature)
+            except KeyError:
+                unknown.append(feature)
+                continue
+            self._nodes.append(node)
+            self.features.append(name)
+        if unknown:
+            raise ValueError(f'Cannot derive the features {unknown[:10]} from the aggregation columns.')
+        self.sources = [column for column in self.columns if column in self.plan.nodes]
+
+    @property
+    def history(self) -> int:
+        """
+        The number of rows before the first scored row needed to compute the features, None if they
+        depend on the whole history (e.g. expanding statistics or autocorrelations).
+        """
+        depths = [self._history[node] for node in self._nodes]
+        return None if None in depths else max(depths, default=0)
+
+    def _add(self, name: str, history: int, function, inputs: list, **params) -> str:
+        name = self.plan.add(name, function, inputs, **params)
+        self._history[name] = history
+        return name
+
+    def _declare(self, feature: str) -> tuple:
+        # Declare the nodes of a feature, down to the aggregation, and return its node and table column name
+        if feature in self.columns or feature in self._by_model_name:
+            column = self._by_model_name.get(feature, feature)
+            return self._add(column, 0, _source, ['data'], column=column), column
+        if feature in TIME_FEATURES:
+            return self._add(feature, 0, _time, ['data'], attribute=feature), feature
+
+        for pattern, operation in SUFFIXES:
+            match = pattern.match(feature)
+            if match is None:
+                continue
+            base, base_name = self._declare(match.group(1))
+            depth = self._history[base]
+            name = base_name + feature[len(match.group(1)):]
+
+            if operation == 'lag':
+                lag = int(match.group(2))
+                return self._add(name, None if depth is None else depth + lag, _lag, [base], lag=lag), name
+            if operation == 'rolling':
+                window = int(match.group(3))
+                history = None if depth is None else depth + window - 1
+                statistics = self._add(f'{base} (rolling {window})', history, _window_statistics, [base], window=window)
+                return self._add(name, history, _pick, [statistics], component=match.group(2)), name
+            if operation == 'ewm':
+                return self._add(name, None, _ewm, [base], span=int(match.group(2))), name
+            if operation == 'autocorr':
+                return self._add(name, None, _autocorrelation, [base], lag=int(match.group(2)), output=self.autocorrelation, window=ACF_WINDOW), name
+            if operation == 'monthly':
+                return self._add(name, None, _monthly, [base, 'data']), name
+            if operation == 'expanding':
+                return self._add(name, None, _expanding, [base], statistic=match.group(2)), name
+            period = int(match.group(3)) if match.re.groups == 3 else DECOMPOSITION_PERIOD
+            components = self._add(f'{base} (decomposition {period})', None, _decompose, [base, 'data'], period=period)
+            return self._add(name, None, _pick, [components], component=match.group(2)), name
+
+        raise KeyError(feature)
+
+    def compute(self, data: pd.DataFrame, start_date=None, max_workers: int = None, report: dict = None) -> pd.DataFrame:
+        """
+        Compute the features from the aggregation.
+
+        Parameters:
+        - data (pd.DataFrame): The aggregation, as passed to `run_feature_engineering`.
+        - start_date (str or pd.Timestamp): If given, only the rows from this date on are returned, and when
+          the features need a bounded history, the rows before it are only used as far as it goes.
+        - max_workers (int): Number of threads of the plan.
+        - report (dict): If given, filled with the cost of each node (see `FeaturePlan.run`).
+
+        Returns:
+        - pd.DataFrame: The features, in the order they were given, with their table column names.
+        """
+        missing = [column for column in self.sources if column not in data.columns]
+        if missing:
+            raise ValueError(f'Missing aggregation columns: {missing[:10]}')
+        if start_date is not None:
+            keep = data.index >= pd.to_datetime(start_date)
+            if self.history is not None and keep.any():
+                # Every kept row is at or after the first one, so its history starts at most `history` rows before it
+                first = max(0, int(np.argmax(keep)) - self.history)
+                data, keep = data.iloc[first:], keep[first:]
+        outputs = self.plan.run({'data': data}, max_workers=max_workers, report=report)
+        features = pd.DataFrame(dict(zip(self.features, [outputs[node] for node in self._nodes])), index=data.index)
+        if start_date is not None:
+            features = features[keep]
+        return features
@@ -0,0 +1,74 @@
+# metrics.py
+import numpy as np
+
+# Custom evaluation metrics, with the name reported by LightGBM; all are lower-is-better
+FEVAL_METRICS = {'smape': 'SMAPE', 'mape': 'MAPE', 'rmse': 'RMSE'}
+
+
+class BufferedFeval:
+    def __init__(self, metrics: tuple = ('smape',)):
+        """
+        Initialize the BufferedFeval class.
+
+        A LightGBM `feval` computing SMAPE, MAPE and/or RMSE without allocating per round: the labels and
+        their derived terms are cached, and the work arrays preallocated, on the first call for each Dataset,
+        then every round only runs in-place NumPy operations on them. SMAPE skips the points where both the
+        prediction and the label are 0 and averages over the remaining ones.
+
+        To evaluate the validation set only, leave the training Dataset out of `valid_sets`: LightGBM's early
+        stopping expects the same metrics for every evaluated Dataset.
+
+        Parameters:
+        - metrics (tuple): The metrics computed, among 'smape', 'mape' and 'rmse'.
+        """
+        unknown = [metric for metric in metrics if metric not in FEVAL_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics {unknown}; use {', '.join(FEVAL_METRICS)}.")
+        self.metrics = tuple(metrics)
+        self._buffers = {}
+
+    def _buffers_for(self, eval_data) -> dict:
+        buffers = self._buffers.get(id(eval_data))
+        if buffers is None or buffers['data'] is not eval_data:
+            label = np.asarray(eval_data.get_label(), dtype=np.float64)
+            buffers = {
+                'data': eval_data,
+                'label': label,
+                'abs_label': np.abs(label),
+                # As in sklearn's mean_absolute_percentage_error
+                'inverse_label': 1 / np.maximum(np.abs(label), np.finfo(np.float64).eps),
+                # Without labels equal to 0, no SMAPE denominator can be 0
+                'zero_label': bool(np.any(label == 0)),
+                'error': np.empty_like(label),
+                'work': np.empty_like(label),
+            }
+            self._buffers[id(eval_data)] = buffers
+        return buffers
+
+    def __call__(self, preds, eval_data) -> list:
+        buffers = self._buffers_for(eval_data)
+        error, work = buffers['error'], buffers['work']
+        n = len(error)
+
+        results = []
+        for metric in self.metrics:
+            np.subtract(preds, buffers['label'], out=error)
+            if metric == 'rmse':
+                value = np.sqrt(np.dot(error, error) / n)
+            elif metric == 'mape':
+                np.abs(error, out=error)
+                value = np.dot(error, buffers['inverse_label']) / n
+            else:
+                np.abs(error, out=error)
+                np.abs(preds, out=work)
+                np.add(work, buffers['abs_label'], out=work)
+                kept = n
+                if buffers['zero_label']:
+                    # The denominator is only 0 where the prediction and the label are both 0, and so is the error
+                    kept = np.count_nonzero(work)
+                    np.maximum(work, np.finfo(np.float64).tiny, out=work)
+                np.divide(error, work, out=error)
+                value = 200 * error.sum() / kept if kept else 0.0
+            results.append((FEVAL_METRICS[metric], value, False))
+        return results
+
@@ -0,0 +1,169 @@
+# model_registry.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import lightgbm as lgb
+
+# The boosters trained by `train_and_forecast` for every registered model
+MODEL_NAMES = ['model1', 'model2']
+
+# Model ids are hex digests; anything else (e.g. a path from a request) is rejected before touching the disk
+MODEL_ID_PATTERN = re.compile(r'[0-9a-f]{16,64}')
+
+
+def model_id(target_column: str, last_index: str, validity_offset_days: int, feature_version: str, input_hash: str) -> str:
+    """
+    Build the id of a model from what determines it: the target, the training window, the feature-config
+    version and the hash of the feature table it was trained on.
+
+    Parameters:
+    - target_column (str): The name of the target column.
+    - last_index (str): The last date of the validation window (format: YYYY-MM-DD).
+    - validity_offset_days (int): The length of the validation window in days.
+    - feature_version (str): The feature-config version.
+    - input_hash (str): The `frame_digest` of the feature table.
+
+    Returns:
+    - str: The model id.
+    """
+    key = json.dumps([target_column, last_index, validity_offset_days, feature_version, input_hash])
+    return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+
+class ModelRegistry:
+    def __init__(self, directory: str, max_loaded: int = 8):
+        """
+        Initialize the ModelRegistry class.
+
+        Stores the boosters of every forecast with their metadata (target, training window, feature-config
+        version, input hash, features) and metrics, one directory per model id. Loaded boosters are kept
+        in an in-process LRU, so repeated scoring does not parse the model files again.
+
+        Parameters:
+        - directory (str): Directory of the registered models.
+        - max_loaded (int): Maximum number of boosters kept loaded in memory.
+        """
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, model_id: str, name: str) -> str:
+        if not isinstance(model_id, str) or not MODEL_ID_PATTERN.fullmatch(model_id):
+            raise ValueError(f'Invalid model id: {model_id!r}')
+        return os.path.join(self.directory, model_id, name)
+
+    def register(self, metadata: dict, models: dict) -> str:
+        """
+        Store the boosters of a forecast and their metadata, replacing a model with the same id.
+
+        Parameters:
+        - metadata (dict): JSON-serializable metadata; must contain `model_id`.
+        - models (dict): Mapping of model name to the booster's `model_to_string()`.
+
+        Returns:
+        - str: The model id.
+        """
+        os.makedirs(os.path.dirname(self._path(metadata['model_id'], 'metadata.json')), exist_ok=True)
+        for name, model_string in models.items():
+            path = self._path(metadata['model_id'], f'{name}.txt')
+            temporary_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(temporary_path, 'w') as f:
+                f.write(model_string)
+            os.replace(temporary_path, path)
+
+        # The metadata is written last, so a model is only visible once its boosters are complete
+        path = self._path(metadata['model_id'], 'metadata.json')
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(dict(metadata, registered_at=time.time()), f, ensure_ascii=False, indent=1)
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            for name in models:
+                self._loaded.pop((metadata['model_id'], name), None)
+        return metadata['model_id']
+
+    def metadata(self, model_id: str) -> dict:
+        """
+        Get the metadata of a registered model.
+
+        Parameters:
+        - model_id (str): The model id.
+
+        Returns:
+        - dict: The metadata, or None if the model is not registered or the id is invalid.
+        """
+        try:
+            with open(self._path(model_id, 'metadata.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def model_string(self, model_id: str, name: str) -> str:
+        """
+        Read a registered booster as text, e.g. to return it to a client.
+
+        Parameters:
+        - model_id (str): The model id.
+        - name (str): 'model1' or 'model2'.
+
+        Returns:
+        - str: The booster's `model_to_string()`.
+        """
+        with open(self._path(model_id, f'{name}.txt')) as f:
+            return f.read()
+
+    def load(self, model_id: str, name: str) -> lgb.Booster:
+        """
+        Get a registered booster, from the LRU when it is loaded.
+
+        Parameters:
+        - model_id (str): The model id.
+        - name (str): 'model1' or 'model2'.
+
+        Returns:
+        - lgb.Booster: The booster, or None if the model is not registered or the id is invalid.
+        """
+        if name not in MODEL_NAMES:
+            return None
+        try:
+            path = self._path(model_id, f'{name}.txt')
+        except ValueError:
+            return None
+
+        key = (model_id, name)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._loaded[key]
+
+        if not os.path.exists(path):
+            return None
+        booster = lgb.Booster(model_file=path)
+
+        with self._lock:
+            self.stats['loads'] += 1
+            self._loaded[key] = booster
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+                self.stats['evictions'] += 1
+        return booster
+
+    def entries(self) -> list:
+        """
+        List the metadata of the registered models, most recent first.
+
+        Returns:
+        - list: The metadata of every registered model.
+        """
+        entries = [self.metadata(name) for name in os.listdir(self.directory)]
+        return sorted([entry for entry in entries if entry is not None], key=lambda entry: entry['registered_at'], reverse=True)
@@ -0,0 +1,218 @@
+# result_cache.py
+import ast
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+def code_version(paths: list) -> str:
+    """
+    Hash the source files that determine the results, so cached results are invalidated when they change.
+
+    Parameters:
+    - paths (list): List of source file paths.
+
+    Returns:
+    - str: The hex digest of the files' contents.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def local_modules(paths: list) -> list:
+    """
+    Follow the imports of source files to the modules of their own directories, recursively.
+
+    Parameters:
+    - paths (list): List of source file paths, e.g. the module defining the cached endpoints.
+
+    Returns:
+    - list: The sorted paths of the given files and of every local module they import, directly or not.
+    """
+    found, pending = set(), [os.path.abspath(path) for path in paths]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+        names += [node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom) and node.module and not node.level]
+        for name in names:
+            module_path = os.path.join(os.path.dirname(path), *name.split('.')) + '.py'
+            if os.path.exists(module_path):
+                pending.append(module_path)
+    return sorted(found)
+
+
+def evict_files(directory: str, max_bytes: int, suffix: str) -> int:
+    """
+    Remove the least recently used files of a directory until their total size fits a byte budget.
+
+    Files are ordered by modification time, so readers touch (`os.utime`) the files they use. Files whose
+    names share the part before the first dot (e.g. '<key>.train.bin' and '<key>.valid.bin') are evicted
+    together.
+
+    Parameters:
+    - directory (str): The directory.
+    - max_bytes (int): The budget of the files.
+    - suffix (str): The suffix of the files counted and evicted, e.g. '.pkl'.
+
+    Returns:
+    - int: The number of removed files.
+    """
+    groups = {}
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            mtime, size, names = groups.get(name.split('.')[0], (0.0, 0, []))
+            groups[name.split('.')[0]] = (max(mtime, stat.st_mtime), size + stat.st_size, names + [name])
+    total = sum(size for _, size, _ in groups.values())
+    evicted = 0
+    for _, size, names in sorted(groups.values()):
+        if total <= max_bytes:
+            break
+        for name in names:
+            try:
+                os.remove(os.path.join(directory, name))
+                evicted += 1
+            except OSError:
+                continue
+        total -= size
+    return evicted
+
+
+class ResultCache:
+    def __init__(self, directory: str, version: str, max_memory_items: int = 32, max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the ResultCache class.
+
+        A content-addressed cache of API responses: entries are keyed by a hash of the endpoint, the
+        uploaded bytes, the form parameters and the code version. Recently used entries are kept in
+        memory; all entries are also written to disk so they survive restarts. Both tiers evict the
+        least recently used entries when full.
+
+        Parameters:
+        - directory (str): Directory of the on-disk tier.
+        - version (str): Code/feature-config version included in every key.
+        - max_memory_items (int): Maximum number of entries kept in memory.
+        - max_disk_bytes (int): Maximum total size of the on-disk tier.
+        """
+        self.directory = directory
+        self.version = version
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, endpoint: str, payload: bytes, params: dict) -> str:
+        """
+        Build the cache key of a request.
+
+        Parameters:
+        - endpoint (str): The endpoint name.
+        - payload (bytes or file-like): The uploaded file; file objects are hashed block by block.
+        - params (dict): The form parameters; values may be lists for repeated fields.
+
+        Returns:
+        - str: The key.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        digest.update(endpoint.encode())
+        digest.update(repr(sorted(params.items())).encode())
+        if hasattr(payload, 'read'):
+            for block in iter(lambda: payload.read(1024 * 1024), b''):
+                digest.update(block)
+        else:
+            digest.update(payload)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def get(self, key: str):
+        """
+        Look up an entry, first in memory and then on disk.
+
+        Parameters:
+        - key (str): The cache key.
+
+        Returns:
+        - The cached value, or None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        # Touch the file so disk eviction follows recent use
+        os.utime(path)
+        with self._lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value) -> None:
+        """
+        Store an entry in both tiers.
+
+        Parameters:
+        - key (str): The cache key.
+        - value: A picklable value.
+        """
+        path = self._path(key)
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            self._remember(key, value)
+        self._evict_disk()
+
+    def _remember(self, key: str, value) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _evict_disk(self) -> None:
+        evicted = evict_files(self.directory, self.max_disk_bytes, '.pkl')
+        with self._lock:
+            self.stats['evictions'] += evicted
+
+    def summary(self) -> dict:
+        """
+        Get the hit/miss counters and the current size of both tiers.
+
+        Returns:
+        - dict: The cache statistics.
+        """
+        with self._lock:
+            summary = dict(self.stats, memory_items=len(self._memory))
+        summary['hits'] = summary['memory_hits'] + summary['disk_hits']
+        summary['disk_items'] = sum(1 for name in os.listdir(self.directory) if name.endswith('.pkl'))
+        return summary
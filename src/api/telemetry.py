@@ -0,0 +1,106 @@
+# telemetry.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import numpy as np
+
+# Logger of the structured summaries; it only enqueues records once `configure_logging` is called
+logger = logging.getLogger('rae_forecasting')
+
+_listener = None
+
+
+def configure_logging(level='INFO', stream=None) -> None:
+    """
+    Emit the structured logs of `level` and above on stderr (or `stream`) from a background thread, so that
+    a logging call only formats and enqueues its record and never waits on the output.
+
+    Parameters:
+    - level (str or int): The minimum level logged, e.g. 'INFO' or 'WARNING'.
+    - stream (file): The output stream. Default is stderr.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(lambda: _listener.stop())
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def log_event(event: str, level: int = logging.INFO, **fields) -> None:
+    """
+    Log an event as one JSON object, e.g. `{"event": "forecast_trained", "target_column": ..., ...}`.
+
+    Parameters:
+    - event (str): The event name.
+    - level (int): The logging level.
+    - fields: The JSON-serializable fields of the event.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(dict(event=event, **fields), ensure_ascii=False, default=str))
+
+
+class IterationRecorder:
+    # Run before early stopping, like `lgb.log_evaluation`
+    order = 10
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Initialize the IterationRecorder class.
+
+        A LightGBM callback recording the evaluation results of every boosting round into a ring buffer of
+        the last `capacity` rounds, preallocated on the first round, instead of logging them.
+
+        Parameters:
+        - capacity (int): Number of rounds kept.
+        """
+        self.capacity = capacity
+        self.names = None
+        self.values = None
+        self.first_iteration = None
+        self.count = 0
+
+    def __call__(self, env) -> None:
+        if self.values is None:
+            self.names = [f'{data_name} {eval_name}' for data_name, eval_name, *_ in env.evaluation_result_list]
+            self.values = np.full((self.capacity, len(self.names)), np.nan)
+            self.first_iteration = env.iteration + 1
+        row = self.values[self.count % self.capacity]
+        for i, result in enumerate(env.evaluation_result_list):
+            row[i] = result[2]
+        self.count += 1
+
+    def summary(self, **fields) -> dict:
+        """
+        Get the recorded rounds as compact arrays, one per metric, oldest round first.
+
+        Parameters:
+        - fields: Further entries of the summary, e.g. the booster's `best_iteration`.
+
+        Returns:
+        - dict: The number of the first kept round (`first_iteration`, 1-based), the number of `rounds`
+          and the `metrics` arrays.
+        """
+        if self.values is None:
+            return dict(fields, first_iteration=None, rounds=0, metrics={})
+        kept = min(self.count, self.capacity)
+        values = self.values[:kept]
+        if self.count > self.capacity:
+            values = np.roll(values, -(self.count % self.capacity), axis=0)
+        return dict(
+            fields,
+            first_iteration=self.first_iteration + self.count - kept,
+            rounds=self.count,
+            metrics={name: values[:, i].tolist() for i, name in enumerate(self.names)},
+        )
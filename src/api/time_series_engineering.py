@@ -1,5 +1,19 @@
 # time_series_engineering.py
+import numpy as np
 import pandas as pd
+from feature_store import frame_digest
+from feature_plan import FeaturePlan
+
+# Default lags and rolling windows used by run_feature_engineering
+LAG_LIST = [2, 6, 12, 18, 24, 30, 42, 54, 66, 78, 84, 90, 100]
+WINDOW_SIZES = [3, 6, 7, 11, 12, 24]
+
+# Outputs of calculate_autocorrelation, and the number of rows of the 'rolling' ACF
+AUTOCORRELATION_OUTPUTS = ['constant', 'table', 'expanding', 'rolling']
+ACF_WINDOW = 60
+
+# Periods of the seasonal decompositions of all MW and RSI features, when requested
+DECOMPOSITION_PERIODS = [3, 6, 12]
 
 class ManualSeasonalDecomposition:
     def __init__(self, data: pd.Series, period: int):
@@ -50,6 +64,431 @@ class ManualSeasonalDecomposition:
             'residual': residual
         }
 
+class SeasonalDecompositionEngine:
+    def __init__(self, values: np.ndarray, index: pd.DatetimeIndex):
+        """
+        Initialize the SeasonalDecompositionEngine class.
+
+        Decomposes every column of a 2-D block at once, for one or several periods, as
+        `ManualSeasonalDecomposition` does for a single series: a centered moving average of `period`
+        rows as the trend, and the mean detrended value of each phase of the period as the seasonal
+        component. The phase of a row is its month counted from year 0, modulo the period, so with a
+        period of 12 the phases are the calendar months.
+
+        Parameters:
+        - values (np.ndarray): The input block with shape (n_rows, n_columns).
+        - index (pd.DatetimeIndex): The dates of the rows.
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.months = np.asarray(index.year, dtype=np.int64) * 12 + np.asarray(index.month, dtype=np.int64) - 1
+
+    def moving_average(self, window: int) -> np.ndarray:
+        """
+        Calculate the centered moving average of every column, matching pandas' `rolling(window, center=True).mean()`.
+
+        Parameters:
+        - window (int): The window size.
+
+        Returns:
+        - np.ndarray: Array of the input shape.
+        """
+        n_rows = len(self.values)
+        average = np.full(self.values.shape, np.nan)
+        if window > n_rows:
+            return average
+        # Row i gets the window of rows i - window // 2 to i + (window - 1) // 2
+        start = window // 2
+        windows = np.lib.stride_tricks.sliding_window_view(self.values, window, axis=0)
+        average[start:start + len(windows)] = windows.mean(axis=-1)
+        return average
+
+    def phase_means(self, detrended: np.ndarray, period: int) -> np.ndarray:
+        """
+        Calculate the mean of every column per phase of the period, ignoring NaN.
+
+        The rows are scattered into a (cycle, phase, column) layout, where the first and last cycles
+        and months without a row are incomplete: their slots hold a count of 0 and do not weigh in
+        the means.
+
+        Parameters:
+        - detrended (np.ndarray): The block with shape (n_rows, n_columns).
+        - period (int): The period of the seasonality.
+
+        Returns:
+        - np.ndarray: Array with shape (period, n_columns); NaN for phases without values.
+        """
+        cycle, phase = np.divmod(self.months, period)
+        cycle -= cycle.min() if len(cycle) else 0
+        observed = ~np.isnan(detrended)
+
+        n_cycles = int(cycle.max()) + 1 if len(cycle) else 0
+        sums = np.zeros((n_cycles, period, detrended.shape[1]))
+        counts = np.zeros_like(sums)
+        # Several rows can fall in a slot when the rows are more frequent than months
+        np.add.at(sums, (cycle, phase), np.where(observed, detrended, 0.0))
+        np.add.at(counts, (cycle, phase), observed)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return sums.sum(axis=0) / counts.sum(axis=0)
+
+    def decompose(self, period: int) -> dict:
+        """
+        Perform the seasonal decomposition of every column for one period.
+
+        Parameters:
+        - period (int): The period of the seasonality.
+
+        Returns:
+        - dict: A dictionary mapping 'trend', 'seasonal' and 'residual' to arrays of the input shape.
+        """
+        trend = self.moving_average(period)
+        detrended = self.values - trend
+        seasonal = self.phase_means(detrended, period)[self.months % period]
+        return {
+            'trend': trend,
+            'seasonal': seasonal,
+            'residual': self.values - trend - seasonal,
+        }
+
+class FeatureBlockBuilder:
+    def __init__(self, index: pd.Index):
+        """
+        Initialize the FeatureBlockBuilder class.
+
+        Collects the columns of one feature family as NumPy arrays and assembles them
+        into a single consolidated DataFrame, instead of inserting columns one by one.
+
+        Parameters:
+        - index (pd.Index): The index of the resulting DataFrame.
+        """
+        self.index = index
+        self.names = []
+        self.values = []
+
+    def add(self, name: str, values) -> None:
+        """
+        Add a feature column to the block.
+
+        Parameters:
+        - name (str): The column name.
+        - values (array-like or scalar): The column values. Scalars are broadcast to the index length.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 0:
+            values = np.full(len(self.index), values)
+        self.names.append(name)
+        self.values.append(values)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Assemble the collected columns into a DataFrame backed by a single 2-D block.
+
+        Returns:
+        - pd.DataFrame: DataFrame with the collected features, in insertion order.
+        """
+        if not self.values:
+            return pd.DataFrame(index=self.index)
+        # Stack as (columns, rows) so the transposed view matches pandas' block layout without a copy
+        block = np.vstack(self.values)
+        return pd.DataFrame(block.T, index=self.index, columns=self.names)
+
+class MultiWindowRollingEngine:
+    def __init__(self, values: np.ndarray):
+        """
+        Initialize the MultiWindowRollingEngine class.
+
+        Computes trailing rolling statistics for every column of a 2-D block at once,
+        matching pandas' `rolling(window)` semantics (min_periods equal to the window,
+        so any NaN inside a window yields NaN).
+
+        Parameters:
+        - values (np.ndarray): The input block with shape (n_rows, n_columns).
+        """
+        self.values = np.asarray(values, dtype=float)
+
+    def window_statistics(self, window: int) -> dict:
+        """
+        Calculate rolling mean, std, min, max and skew for a single window size.
+
+        Parameters:
+        - window (int): The window size.
+
+        Returns:
+        - dict: A dictionary mapping 'mean', 'std', 'min', 'max' and 'skew' to arrays of the input shape.
+        """
+        n_rows, n_columns = self.values.shape
+        stats = {name: np.full((n_rows, n_columns), np.nan) for name in ['mean', 'std', 'min', 'max', 'skew']}
+        if window > n_rows:
+            return stats
+
+        # (n_rows - window + 1, n_columns, window) view over the input, no copy
+        windows = np.lib.stride_tricks.sliding_window_view(self.values, window, axis=0)
+        valid = slice(window - 1, None)
+
+        mean = windows.mean(axis=-1)
+        low = windows.min(axis=-1)
+        high = windows.max(axis=-1)
+        constant = low == high
+
+        deviations = windows - mean[..., np.newaxis]
+        m2 = np.einsum('ijk,ijk->ij', deviations, deviations) / window
+        m3 = (deviations ** 3).mean(axis=-1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if window > 1:
+                std = np.sqrt(m2 * window / (window - 1))
+                std[constant] = 0.0
+            else:
+                std = np.full_like(mean, np.nan)
+
+            if window > 2:
+                skew = np.sqrt(window * (window - 1.0)) * m3 / ((window - 2) * m2 ** 1.5)
+                skew[m2 <= 0] = np.nan
+                skew[constant] = 0.0
+            else:
+                skew = np.full_like(mean, np.nan)
+
+        stats['mean'][valid] = mean
+        stats['std'][valid] = std
+        stats['min'][valid] = low
+        stats['max'][valid] = high
+        stats['skew'][valid] = skew
+        return stats
+
+    def ewm_means(self, spans: list, state: dict = None, return_state: bool = False):
+        """
+        Calculate exponentially weighted means for several spans in one pass over the rows.
+
+        Matches pandas' `ewm(span=span).mean()` (adjust=True, ignore_na=False). Passing the
+        state returned by a previous call continues the recursion as if both blocks were one series.
+
+        Parameters:
+        - spans (list): List of spans.
+        - state (dict): Optional state from a previous call over the preceding rows.
+        - return_state (bool): Whether to also return the state after the last row.
+
+        Returns:
+        - np.ndarray: Array with shape (len(spans), n_rows, n_columns), and the state dict if requested.
+        """
+        n_rows, n_columns = self.values.shape
+        result = np.full((len(spans), n_rows, n_columns), np.nan)
+
+        decay = (1.0 - 2.0 / (np.asarray(spans, dtype=float) + 1.0))[:, np.newaxis]
+        if state is None:
+            weighted = np.full((len(spans), n_columns), np.nan)
+            old_weight = np.ones_like(weighted)
+            seen = np.zeros(n_columns, dtype=bool)
+        else:
+            weighted, old_weight, seen = state['weighted'].copy(), state['old_weight'].copy(), state['seen'].copy()
+
+        for i in range(n_rows):
+            current = self.values[i]
+            observed = ~np.isnan(current)
+            seen |= observed
+            started = ~np.isnan(weighted)
+
+            old_weight = np.where(started, old_weight * decay, old_weight)
+            update = started & observed
+            blended = (old_weight * weighted + current) / (old_weight + 1.0)
+            weighted = np.where(update & (weighted != current), blended, weighted)
+            old_weight = np.where(update, old_weight + 1.0, old_weight)
+            weighted = np.where(~started & observed, current, weighted)
+
+            result[:, i] = np.where(seen, weighted, np.nan)
+
+        if return_state:
+            return result, {'weighted': weighted, 'old_weight': old_weight, 'seen': seen}
+        return result
+
+class AutocorrelationEngine:
+    def __init__(self, values: np.ndarray):
+        """
+        Initialize the AutocorrelationEngine class.
+
+        Computes the lag autocorrelations of every column of a 2-D block at once, matching pandas'
+        `Series.autocorr(lag)`: the Pearson correlation of each value with the value `lag` rows earlier,
+        over the pairs where both are observed (NaN if fewer than 2 pairs or a constant side).
+
+        Parameters:
+        - values (np.ndarray): The input block with shape (n_rows, n_columns).
+        """
+        self.values = np.asarray(values, dtype=float)
+        observed = ~np.isnan(self.values)
+        # Correlations do not depend on a shift of the values; centering keeps the pair sums well conditioned
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # As np.nanmean, without its warning for columns without values
+            center = np.nan_to_num(np.where(observed, self.values, 0.0).sum(axis=0) / observed.sum(axis=0))
+        self.observed = observed.astype(float)
+        self.centered = np.where(observed, self.values - center, 0.0)
+
+    @staticmethod
+    def _pearson(count, sum_a, sum_b, sum_aa, sum_bb, sum_ab) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_a = count * sum_aa - sum_a ** 2
+            var_b = count * sum_bb - sum_b ** 2
+            correlation = (count * sum_ab - sum_a * sum_b) / np.sqrt(var_a * var_b)
+            # Round-off leaves constant sides with a tiny variance instead of 0
+            constant = (var_a <= 1e-10 * count * sum_aa) | (var_b <= 1e-10 * count * sum_bb)
+        correlation[(count < 1.5) | constant] = np.nan
+        return np.clip(correlation, -1.0, 1.0)
+
+    def acf(self, lags: list) -> np.ndarray:
+        """
+        Calculate the autocorrelation of the whole series for several lags in one FFT pass.
+
+        The pair counts and sums of every lag are cross-correlations of the observed mask, the values and
+        their squares, so they all come from 3 forward and 6 inverse real FFTs of the block.
+
+        Parameters:
+        - lags (list): List of lags.
+
+        Returns:
+        - np.ndarray: Array with shape (len(lags), n_columns).
+        """
+        n_rows, n_columns = self.values.shape
+        lags = np.asarray(lags, dtype=int)
+        result = np.full((len(lags), n_columns), np.nan)
+        usable = (lags >= 0) & (lags < n_rows)
+        if n_rows == 0 or not usable.any():
+            return result
+
+        # Zero padding to twice the length makes the circular correlations linear
+        size = 2 * n_rows
+        spectra = np.fft.rfft(np.stack([self.observed, self.centered, self.centered ** 2]), n=size, axis=1)
+        mask, values, squares = spectra
+        # Sum over t of f[t] * g[t - lag] is the inverse FFT of F * conj(G) at `lag`
+        products = np.stack([
+            mask * mask.conj(),       # pair count
+            values * mask.conj(),     # sum of the later values
+            mask * values.conj(),     # sum of the earlier values
+            squares * mask.conj(),    # sum of the squared later values
+            mask * squares.conj(),    # sum of the squared earlier values
+            values * values.conj(),   # sum of the products
+        ])
+        sums = np.fft.irfft(products, n=size, axis=1)[:, lags[usable]]
+        sums[0] = np.round(sums[0])
+        result[usable] = self._pearson(*sums)
+        return result
+
+    def expanding_acf(self, lags: list, window: int = None) -> np.ndarray:
+        """
+        Calculate the autocorrelation for several lags as of every row, from the pairs up to that row only.
+
+        Parameters:
+        - lags (list): List of lags.
+        - window (int): If given, only the pairs whose later value is in the last `window` rows are used
+          (a rolling ACF), and the first `window - 1` rows are NaN.
+
+        Returns:
+        - np.ndarray: Array with shape (len(lags), n_rows, n_columns).
+        """
+        n_rows, n_columns = self.values.shape
+        result = np.full((len(lags), n_rows, n_columns), np.nan)
+        for i, lag in enumerate(lags):
+            if lag < 0 or lag >= n_rows:
+                continue
+            later, earlier = slice(lag, None), slice(None, n_rows - lag)
+            pairs = self.observed[later] * self.observed[earlier]
+            a = self.centered[later] * pairs
+            b = self.centered[earlier] * pairs
+            # Running pair sums indexed by the row of the later value
+            sums = np.cumsum(np.stack([pairs, a, b, a * a, b * b, a * b]), axis=1)
+            if window is not None:
+                if window > n_rows:
+                    continue
+                sums[:, window:] -= sums[:, :-window].copy()
+                if window - 1 > lag:
+                    sums[:, :window - 1 - lag] = 0.0
+            result[i, lag:] = self._pearson(*sums)
+        return result
+
+class LagMatrix:
+    def __init__(self, values: np.ndarray, index: pd.Index, features: list, lags: list):
+        """
+        Initialize the LagMatrix class.
+
+        The lagged variables of a block of features, as `shift(lag)` columns named `<feature>_lagged_<lag>`
+        (lag-major, as `create_lagged_variables`), without a copy per lag: the block is copied once into a
+        buffer padded with `max(lags)` rows of NaN, column-major so that every feature's padded series is
+        contiguous, and each lag is a view of the buffer starting `lag` rows before the data.
+
+        Parameters:
+        - values (np.ndarray): The input block with shape (n_rows, n_columns).
+        - index (pd.Index): The index of the rows.
+        - features (list): The names of the columns of the block.
+        - lags (list): List of non-negative lags.
+        """
+        values = np.asarray(values, dtype=float)
+        self.index = index
+        self.features = list(features)
+        self.lags = list(lags)
+        self.padding = max(self.lags, default=0)
+        self.buffer = np.full((self.padding + len(values), values.shape[1]), np.nan, order='F')
+        self.buffer[self.padding:] = values
+        self.columns = [f'{feature}_lagged_{lag}' for lag in self.lags for feature in self.features]
+        self._positions = {name: divmod(i, len(self.features)) for i, name in enumerate(self.columns)}
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.index), len(self.columns)
+
+    def lag(self, lag: int) -> np.ndarray:
+        """
+        Get the block shifted by `lag` rows.
+
+        Parameters:
+        - lag (int): The lag, between 0 and the largest lag.
+
+        Returns:
+        - np.ndarray: A read-only view with shape (n_rows, n_columns).
+        """
+        start = self.padding - lag
+        view = self.buffer[start:start + len(self.index)]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get one lagged variable.
+
+        Parameters:
+        - name (str): The column name, `<feature>_lagged_<lag>`.
+
+        Returns:
+        - np.ndarray: A read-only view with shape (n_rows,).
+        """
+        lag, j = self._positions[name]
+        return self.lag(self.lags[lag])[:, j]
+
+    def fill(self, out: np.ndarray, columns: list) -> None:
+        """
+        Write the lagged variables into the columns of `out` that carry their names, e.g. the feature
+        array handed to LightGBM, converting to its dtype on the fly. Other columns are left untouched.
+
+        Parameters:
+        - out (np.ndarray): The (n_rows, len(columns)) array to write into.
+        - columns (list): The column names of `out`.
+        """
+        for position, name in enumerate(columns):
+            if name in self._positions:
+                out[:, position] = self.column(name)
+
+    def to_frame(self, columns: list = None) -> pd.DataFrame:
+        """
+        Materialize the lagged variables as a DataFrame backed by a single 2-D block.
+
+        Parameters:
+        - columns (list): The columns to materialize, in order. Default is all columns.
+
+        Returns:
+        - pd.DataFrame: The lagged variables.
+        """
+        columns = self.columns if columns is None else list(columns)
+        # Filled as (columns, rows) so the transposed view matches pandas' block layout without a copy
+        block = np.empty((len(columns), len(self.index)))
+        self.fill(block.T, columns)
+        return pd.DataFrame(block.T, index=self.index, columns=columns)
+
 class TimeSeriesFeatureEngineering:
     def __init__(self, data: pd.DataFrame, mw_prefix: str = '(MW)', rsi_prefix: str = 'RSI_'):
         """
@@ -64,7 +503,7 @@ class TimeSeriesFeatureEngineering:
         self.mw_prefix = mw_prefix
         self.rsi_prefix = rsi_prefix
 
-    def calculate_rolling_metrics(self, prefix: str, window_sizes: list = [3, 6, 7, 11, 12, 24]) -> pd.DataFrame:
+    def calculate_rolling_metrics(self, prefix: str, window_sizes: list = WINDOW_SIZES) -> pd.DataFrame:
         """
         Calculate rolling metrics for the features with the given prefix.
 
@@ -75,56 +514,77 @@ class TimeSeriesFeatureEngineering:
         Returns:
         - pd.DataFrame: DataFrame with rolling metrics.
         """
-        rolling_metrics = pd.DataFrame(index=self.data.index)
+        rolling_metrics = FeatureBlockBuilder(self.data.index)
+        features = self.data.filter(like=prefix).columns
+
+        # Compute every window and statistic for the whole block of features together
+        engine = MultiWindowRollingEngine(self.data[features].to_numpy(dtype=float))
+        ewm_means = engine.ewm_means(window_sizes)
         
-        for window_size in window_sizes:
-            for feature in self.data.filter(like=prefix).columns:
-                rolling_metrics[f'{feature}_mean_rolling_{window_size}'] = self.data[feature].rolling(window=window_size).mean()
-                rolling_metrics[f'{feature}_std_rolling_{window_size}'] = self.data[feature].rolling(window=window_size).std()
-                rolling_metrics[f'{feature}_min_rolling_{window_size}'] = self.data[feature].rolling(window=window_size).min()
-                rolling_metrics[f'{feature}_max_rolling_{window_size}'] = self.data[feature].rolling(window=window_size).max()
-                rolling_metrics[f'{feature}_skew_rolling_{window_size}'] = self.data[feature].rolling(window=window_size).skew()
-                rolling_metrics[f'{feature}_ewm_{window_size}'] = self.data[feature].ewm(span=window_size).mean()
+        for w, window_size in enumerate(window_sizes):
+            stats = engine.window_statistics(window_size)
+            for j, feature in enumerate(features):
+                rolling_metrics.add(f'{feature}_mean_rolling_{window_size}', stats['mean'][:, j])
+                rolling_metrics.add(f'{feature}_std_rolling_{window_size}', stats['std'][:, j])
+                rolling_metrics.add(f'{feature}_min_rolling_{window_size}', stats['min'][:, j])
+                rolling_metrics.add(f'{feature}_max_rolling_{window_size}', stats['max'][:, j])
+                rolling_metrics.add(f'{feature}_skew_rolling_{window_size}', stats['skew'][:, j])
+                rolling_metrics.add(f'{feature}_ewm_{window_size}', ewm_means[w, :, j])
         
-        return rolling_metrics
+        return rolling_metrics.to_frame()
 
-    def calculate_autocorrelation(self, prefix: str, lags: list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 24, 48]) -> pd.DataFrame:
+    def calculate_autocorrelation(self, prefix: str, lags: list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 24, 48], output: str = 'constant', window: int = ACF_WINDOW) -> pd.DataFrame:
         """
         Calculate autocorrelation for the features with the given prefix.
 
         Parameters:
         - prefix (str): The prefix to filter columns.
         - lags (list): List of lag values for autocorrelation calculations. Default is [1, 2, 3].
+        - output (str): 'constant' for the ACF of the whole series broadcast to a column per feature and lag,
+          'table' for the same values as one row per feature and one `lag_<lag>` column per lag, 'expanding'
+          for columns of the ACF as of each row, or 'rolling' for the ACF as of each row from the pairs whose
+          later value is in the last `window` rows.
+        - window (int): The number of rows of the 'rolling' ACF.
 
         Returns:
         - pd.DataFrame: DataFrame with autocorrelation values.
         """
-        autocorr = pd.DataFrame(index=self.data.index)
-        
-        for lag in lags:
-            for feature in self.data.filter(like=prefix).columns:
-                autocorr[f'{feature}_autocorr_lag_{lag}'] = self.data[feature].autocorr(lag=lag)
+        if output not in AUTOCORRELATION_OUTPUTS:
+            raise ValueError(f"Unknown autocorrelation output '{output}'; use {', '.join(AUTOCORRELATION_OUTPUTS)}.")
+        features = self.data.filter(like=prefix).columns
+
+        # Compute every lag for the whole block of features together
+        engine = AutocorrelationEngine(self.data[features].to_numpy(dtype=float))
+        if output in ('constant', 'table'):
+            acf = engine.acf(lags)
+            if output == 'table':
+                return pd.DataFrame(acf.T, index=features, columns=[f'lag_{lag}' for lag in lags])
+        else:
+            acf = engine.expanding_acf(lags, window=window if output == 'rolling' else None)
+
+        autocorr = FeatureBlockBuilder(self.data.index)
+        for l, lag in enumerate(lags):
+            for j, feature in enumerate(features):
+                autocorr.add(f'{feature}_autocorr_lag_{lag}', acf[l, ..., j])
         
-        return autocorr
+        return autocorr.to_frame()
 
-    def create_lagged_variables(self, prefix: str, lags: list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 24, 46, 58]) -> pd.DataFrame:
+    def create_lagged_variables(self, prefix: str, lags: list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 24, 46, 58], materialize: bool = True) -> pd.DataFrame:
         """
         Create lagged variables for the features with the given prefix.
 
         Parameters:
         - prefix (str): The prefix to filter columns.
         - lag_lengths (list): List of lag lengths to create lagged variables. Default is [1, 2, 3].
+        - materialize (bool): Return a DataFrame, or else the `LagMatrix` of views it would be built from.
 
         Returns:
         - pd.DataFrame: DataFrame with lagged variables.
         """
-        lagged_data = pd.DataFrame(index=self.data.index)
+        features = self.data.filter(like=prefix).columns
+        lagged_data = LagMatrix(self.data[features].to_numpy(dtype=float), self.data.index, features, lags)
         
-        for lag_length in lags:
-            for feature in self.data.filter(like=prefix).columns:
-                lagged_data[f'{feature}_lagged_{lag_length}'] = self.data[feature].shift(lag_length)
-        
-        return lagged_data
+        return lagged_data.to_frame() if materialize else lagged_data
 
     def calculate_seasonal_aggregations(self, prefix: str) -> pd.DataFrame:
         """
@@ -136,12 +596,12 @@ class TimeSeriesFeatureEngineering:
         Returns:
         - pd.DataFrame: DataFrame with seasonal aggregations.
         """
-        seasonal_aggregations = pd.DataFrame(index=self.data.index)
+        seasonal_aggregations = FeatureBlockBuilder(self.data.index)
         
         for feature in self.data.filter(like=prefix).columns:
-            seasonal_aggregations[f'{feature}_mean_monthly'] = self.data[feature].groupby(self.data.index.month).transform('mean')
+            seasonal_aggregations.add(f'{feature}_mean_monthly', self.data[feature].groupby(self.data.index.month).transform('mean'))
         
-        return seasonal_aggregations
+        return seasonal_aggregations.to_frame()
 
     def extract_time_based_features(self) -> pd.DataFrame:
         """
@@ -165,13 +625,14 @@ class TimeSeriesFeatureEngineering:
         Returns:
         - pd.DataFrame: DataFrame with expanding metrics.
         """
-        expanding_metrics = pd.DataFrame(index=self.data.index)
+        expanding_metrics = FeatureBlockBuilder(self.data.index)
         
         for feature in self.data.filter(like=prefix).columns:
-            expanding_metrics[f'{feature}_expanding_mean'] = self.data[feature].expanding().mean()
-            expanding_metrics[f'{feature}_expanding_std'] = self.data[feature].expanding().std()
+            expanding = self.data[feature].expanding()
+            expanding_metrics.add(f'{feature}_expanding_mean', expanding.mean())
+            expanding_metrics.add(f'{feature}_expanding_std', expanding.std())
         
-        return expanding_metrics
+        return expanding_metrics.to_frame()
 
     def calculate_manual_seasonal_decomposition(self, feature: str, period: int) -> pd.DataFrame:
         """
@@ -184,92 +645,211 @@ class TimeSeriesFeatureEngineering:
         Returns:
         - pd.DataFrame: DataFrame with trend, seasonal, and residual components.
         """
-        data = self.data[feature]
-        decomposer = ManualSeasonalDecomposition(data, period)
-        components = decomposer.decompose()
+        engine = SeasonalDecompositionEngine(self.data[[feature]].to_numpy(dtype=float), self.data.index)
+        components = engine.decompose(period)
         
-        decomposition = pd.DataFrame(index=self.data.index)
-        decomposition[f'{feature}_trend'] = components['trend']
-        decomposition[f'{feature}_seasonal'] = components['seasonal']
-        decomposition[f'{feature}_residual'] = components['residual']
+        decomposition = FeatureBlockBuilder(self.data.index)
+        decomposition.add(f'{feature}_trend', components['trend'][:, 0])
+        decomposition.add(f'{feature}_seasonal', components['seasonal'][:, 0])
+        decomposition.add(f'{feature}_residual', components['residual'][:, 0])
         
-        return decomposition
+        return decomposition.to_frame()
+
+    def calculate_seasonal_decompositions(self, prefix: str, periods: list = DECOMPOSITION_PERIODS) -> pd.DataFrame:
+        """
+        Calculate the seasonal decomposition of all the features with the given prefix for several periods.
+
+        Parameters:
+        - prefix (str): The prefix to filter columns.
+        - periods (list): List of periods of the seasonality.
+
+        Returns:
+        - pd.DataFrame: DataFrame with `<feature>_trend_<period>`, `<feature>_seasonal_<period>` and
+          `<feature>_residual_<period>` columns.
+        """
+        decomposition = FeatureBlockBuilder(self.data.index)
+        features = self.data.filter(like=prefix).columns
+
+        # Decompose the whole block of features together, period by period
+        engine = SeasonalDecompositionEngine(self.data[features].to_numpy(dtype=float), self.data.index)
+        for period in periods:
+            components = engine.decompose(period)
+            for j, feature in enumerate(features):
+                for component in ['trend', 'seasonal', 'residual']:
+                    decomposition.add(f'{feature}_{component}_{period}', components[component][:, j])
+
+        return decomposition.to_frame()
 
+def _select(*frames, prefix: str) -> pd.DataFrame:
+    # The columns of the frames whose name contains the prefix, side by side
+    return pd.concat([frame.filter(like=prefix) for frame in frames], axis=1)
 
-def run_feature_engineering(data: pd.DataFrame, mw_prefix: str = '(MW)', rsi_prefix: str = 'RSI_') -> pd.DataFrame:
+
+def _family(frame: pd.DataFrame, method: str, **kwargs):
+    # A feature family of TimeSeriesFeatureEngineering, computed on the given columns
+    return getattr(TimeSeriesFeatureEngineering(frame), method)(**kwargs)
+
+
+def feature_plan(mw_prefix: str = '(MW)', rsi_prefix: str = 'RSI_', autocorrelation: str = 'constant', decomposition_periods: list = None, materialize_lags: bool = True) -> tuple:
     """
-    Run the entire feature engineering process on the given data.
+    Declare the feature families of `run_feature_engineering` as the nodes of a `FeaturePlan`, run on a
+    source named 'data'.
+
+    Every family reads only the columns it needs, selected once per set of inputs and prefix. The MW
+    families read the MW aggregates and their decomposition, the MW lagged variables also read the MW
+    families' outputs, and the RSI families read the RSI aggregates only, so MW and RSI families are
+    independent of each other.
 
     Parameters:
-    - data (pd.DataFrame): The input dataframe with time series data.
-    - mw_prefix (str): The prefix for MW features. Default is '(MW)'.
-    - rsi_prefix (str): The prefix for RSI features. Default is 'RSI_'.
+    - mw_prefix (str): The prefix for MW features.
+    - rsi_prefix (str): The prefix for RSI features.
+    - autocorrelation (str): The `output` of `calculate_autocorrelation`.
+    - decomposition_periods (list): The periods of the decompositions of all aggregates, if any.
+    - materialize_lags (bool): Whether the lagged variables are DataFrames or `LagMatrix` objects.
 
     Returns:
-    - pd.DataFrame: DataFrame with engineered features.
+    - tuple: The plan, the names of the nodes making up the final result, in order, and the names of
+      the nodes of the autocorrelation tables (with the 'table' mode).
     """
-    lag_list = [2,6,12,18,24,30,42,54,66,78,84,90,100]
-    engineer = TimeSeriesFeatureEngineering(data, mw_prefix, rsi_prefix)
+    plan = FeaturePlan()
+    lags = LAG_LIST
 
     # Perform seasonal decomposition for MW features
-    decomposition_mw = engineer.calculate_manual_seasonal_decomposition(f'ΙΣΧΥΣ (MW)_sum', period=12)
+    decomposition_mw = plan.add('decomposition_mw', _family, ['data'], method='calculate_manual_seasonal_decomposition', feature='ΙΣΧΥΣ (MW)_sum', period=12)
+
+    families = {}
+    for name, prefix, sources in [('mw', mw_prefix, ['data', decomposition_mw]), ('rsi', rsi_prefix, ['data'])]:
+        features = plan.add(f'features_{name}', _select, sources, prefix=prefix)
+        families[name] = {
+            'autocorr': plan.add(f'autocorr_{name}', _family, [features], method='calculate_autocorrelation', prefix=prefix, lags=lags, output=autocorrelation),
+            'seasonal': plan.add(f'seasonal_aggregations_{name}', _family, [features], method='calculate_seasonal_aggregations', prefix=prefix),
+            'expanding': plan.add(f'expanding_metrics_{name}', _family, [features], method='calculate_expanding_metrics', prefix=prefix),
+            'rolling': plan.add(f'rolling_metrics_{name}', _family, [features], method='calculate_rolling_metrics', prefix=prefix),
+        }
+        # The ACF table has one row per feature, so it is neither a column block nor a lag source
+        columns = [] if autocorrelation == 'table' else [families[name]['autocorr']]
+        lag_sources = [features]
+        if name == 'mw':
+            # The MW lagged variables also cover the MW families
+            lag_sources = [plan.add('lag_sources_mw', _select, sources + columns + [families[name][family] for family in ['seasonal', 'expanding', 'rolling']], prefix=prefix)]
+        families[name]['lagged'] = plan.add(f'lagged_data_{name}', _family, lag_sources, method='create_lagged_variables', prefix=prefix, lags=lags, materialize=materialize_lags)
+        families[name]['columns'] = columns
+
+    # Decompose every MW and RSI aggregate together, without deriving further features from the components
+    decompositions = []
+    if decomposition_periods:
+        for name, prefix in [('mw', mw_prefix), ('rsi', rsi_prefix)]:
+            aggregates = plan.add(f'aggregates_{name}', _select, ['data'], prefix=prefix)
+            decompositions.append(plan.add(f'decompositions_{name}', _family, [aggregates], method='calculate_seasonal_decompositions', prefix=prefix, periods=decomposition_periods))
 
-    engineer.data = pd.concat([data, decomposition_mw], axis=1)
+    # Extract time-based features
+    time_features = plan.add('time_features', _family, ['data'], method='extract_time_based_features')
 
-    # Calculate autocorrelation for MW features
-    autocorr_mw = engineer.calculate_autocorrelation(engineer.mw_prefix, 
-                                                 lags=lag_list
-                                                 )
+    blocks = []
+    for name in ['mw', 'rsi']:
+        nodes = families[name]
+        lagged = [nodes['lagged']] if materialize_lags else []
+        blocks += [nodes['rolling']] + nodes['columns'] + lagged + [nodes['seasonal'], nodes['expanding']]
+    blocks += decompositions + [time_features]
 
-    # Calculate seasonal aggregations for MW features
-    seasonal_aggregations_mw = engineer.calculate_seasonal_aggregations(engineer.mw_prefix)
+    tables = [families[name]['autocorr'] for name in ['mw', 'rsi']] if autocorrelation == 'table' else []
+    return plan, blocks, tables
 
-    # Calculate expanding metrics for MW features
-    expanding_metrics_mw = engineer.calculate_expanding_metrics(engineer.mw_prefix)
 
-    # Calculate rolling metrics for MW features
-    rolling_metrics_mw = engineer.calculate_rolling_metrics(engineer.mw_prefix)
+def run_feature_engineering(data: pd.DataFrame, mw_prefix: str = '(MW)', rsi_prefix: str = 'RSI_', autocorrelation: str = 'constant', autocorrelation_table: dict = None, decomposition_periods: list = None, lag_matrices: dict = None, max_workers: int = None, report: dict = None) -> pd.DataFrame:
+    """
+    Run the entire feature engineering process on the given data.
 
-    engineer.data = pd.concat([data, decomposition_mw, autocorr_mw, seasonal_aggregations_mw, expanding_metrics_mw, rolling_metrics_mw], axis=1)
+    The feature families are computed as the nodes of `feature_plan`, independent families concurrently.
 
-    # Create lagged variables for MW features
-    lagged_data_mw = engineer.create_lagged_variables(engineer.mw_prefix, 
-                                                 lags=lag_list
-                                                 )
+    Parameters:
+    - data (pd.DataFrame): The input dataframe with time series data.
+    - mw_prefix (str): The prefix for MW features. Default is '(MW)'.
+    - rsi_prefix (str): The prefix for RSI features. Default is 'RSI_'.
+    - autocorrelation (str): The `output` of `calculate_autocorrelation`. With 'table', the result has no
+      autocorrelation columns and the ACF of each feature is only given through `autocorrelation_table`.
+    - autocorrelation_table (dict): If given with the 'table' mode, filled with the ACF table of the MW and
+      RSI features under 'table'.
+    - decomposition_periods (list): If given, the result also has the trend, seasonal and residual
+      components of every MW and RSI aggregate for each of these periods.
+    - lag_matrices (dict): If given, the lagged variables are left out of the tables and put in it as
+      `LagMatrix` objects under 'mw' and 'rsi', to be materialized only when needed.
+    - max_workers (int): Number of threads computing the feature families. Default is the CPU count, at most 4.
+    - report (dict): If given, filled with the cost of each node of the plan (see `FeaturePlan.run`).
 
-    # Repeat the process for RSI features
-    autocorr_rsi = engineer.calculate_autocorrelation(engineer.rsi_prefix, 
-                                                 lags=lag_list
-                                                 )
-    seasonal_aggregations_rsi = engineer.calculate_seasonal_aggregations(engineer.rsi_prefix)
-    expanding_metrics_rsi = engineer.calculate_expanding_metrics(engineer.rsi_prefix)
-    rolling_metrics_rsi = engineer.calculate_rolling_metrics(engineer.rsi_prefix)
-    lagged_data_rsi = engineer.create_lagged_variables(engineer.rsi_prefix, 
-                                                 lags=lag_list
-                                                 )
+    Returns:
+    - pd.DataFrame: DataFrame with engineered features.
+    """
+    plan, blocks, tables = feature_plan(mw_prefix, rsi_prefix, autocorrelation, decomposition_periods, materialize_lags=lag_matrices is None)
+    outputs = plan.run({'data': data}, max_workers=max_workers, report=report)
 
-    # Extract time-based features
-    time_features = engineer.extract_time_based_features()
+    if tables and autocorrelation_table is not None:
+        autocorrelation_table['table'] = pd.concat([outputs[name] for name in tables])
+    if lag_matrices is not None:
+        lag_matrices.update(mw=outputs['lagged_data_mw'], rsi=outputs['lagged_data_rsi'])
 
     # Concatenate all the results into a single DataFrame
-    final_result = pd.concat([
-        rolling_metrics_mw, autocorr_mw, lagged_data_mw, seasonal_aggregations_mw, expanding_metrics_mw,
-        rolling_metrics_rsi, autocorr_rsi, lagged_data_rsi, seasonal_aggregations_rsi, expanding_metrics_rsi,
-        time_features
-    ], axis=1)
+    final_result = pd.concat([outputs[name] for name in blocks], axis=1)
 
-    extended_result = pd.concat([data, decomposition_mw, final_result], axis=1)
+    extended_result = pd.concat([data, outputs['decomposition_mw'], final_result], axis=1)
 
     return final_result, extended_result
 
-def process_time_series(df, current_date, forecast_horizon):
-    final_result, extended_result =run_feature_engineering(df)
-
+def extend_with_future_dates(final_result, current_date, forecast_horizon):
     # Extend DataFrame with future dates based on the provided current date and forecast horizon
     future_dates = pd.date_range(start=current_date, periods=forecast_horizon, freq='M')  # Assuming monthly frequency for example
     future_index = pd.DatetimeIndex(future_dates)
     future_data = pd.DataFrame(index=future_index)
 
-    final_result = pd.concat([final_result, future_data])
+    return pd.concat([final_result, future_data])
+
+def process_time_series(df, current_date, forecast_horizon, store=None, frequency='M', slice_name='all', autocorrelation='constant', autocorrelation_table=None, decomposition_periods=None):
+    """
+    Engineer the features of an aggregation and extend the result with the future dates.
+
+    With a feature store, the tables are read from the (frequency, slice_name) partition when it was built
+    from the same aggregation, and otherwise computed and written to it.
+
+    Parameters:
+    - df (pd.DataFrame): The aggregation.
+    - current_date (str): The first future date.
+    - forecast_horizon (int): The number of future periods.
+    - store (FeatureStore): Optional feature store.
+    - frequency (str): The aggregation frequency, part of the partition key.
+    - slice_name (str): The region/technology slice, part of the partition key.
+    - autocorrelation (str): The autocorrelation mode of `run_feature_engineering`.
+    - autocorrelation_table (dict): If given with the 'table' mode, filled with the ACF table under 'table'.
+    - decomposition_periods (list): The periods of the decompositions of all aggregates of `run_feature_engineering`.
+
+    A partition built with other options than these is recomputed.
+
+    Returns:
+    - tuple: The final result, extended with the future dates, and the extended result.
+    """
+    tables = {} if autocorrelation == 'table' else None
+    options = dict(autocorrelation=autocorrelation, autocorrelation_table=tables, decomposition_periods=decomposition_periods)
+    if store is None:
+        final_result, extended_result = run_feature_engineering(df, **options)
+    else:
+        # The input hash of a partition also records the options other than the defaults
+        input_hash = frame_digest(df)
+        if autocorrelation != 'constant':
+            input_hash = f'{input_hash}:{autocorrelation}'
+        if decomposition_periods:
+            input_hash = f"{input_hash}:decomposition={','.join(map(str, decomposition_periods))}"
+        final_result = store.read(frequency, slice_name, 'result', input_hash=input_hash)
+        extended_result = store.read(frequency, slice_name, 'extended_result', input_hash=input_hash)
+        if tables is not None:
+            tables['table'] = store.read(frequency, slice_name, 'autocorrelation', input_hash=input_hash)
+        if final_result is None or extended_result is None or (tables is not None and tables['table'] is None):
+            final_result, extended_result = run_feature_engineering(df, **options)
+            written = {'result': final_result, 'extended_result': extended_result}
+            if tables is not None:
+                written['autocorrelation'] = tables['table']
+            store.write(frequency, slice_name, input_hash, written)
+    if tables is not None and autocorrelation_table is not None:
+        autocorrelation_table['table'] = tables['table']
+
+    final_result = extend_with_future_dates(final_result, current_date, forecast_horizon)
 
     return final_result, extended_result
\ No newline at end of file
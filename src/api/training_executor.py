@@ -0,0 +1,223 @@
+# training_executor.py
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from forecasting_model import prepare_feature_matrices, train_and_forecast
+
+# Inputs shared by the tasks of a call (feature tables, prepared splits, Datasets), loaded once per worker
+# process and kept by key for the next tasks of the same call
+_worker_inputs = OrderedDict()
+WORKER_INPUTS = 2
+
+
+def worker_input(key, loader, *args):
+    """
+    Get an input of the worker process by key, loading it with `loader(*args)` on first use.
+
+    Parameters:
+    - key (hashable): The key of the input, unique to its content (e.g. the path of a file written once).
+    - loader (callable): Loads the input.
+    - args: The arguments of the loader.
+
+    Returns:
+    - The input.
+    """
+    if key not in _worker_inputs:
+        _worker_inputs[key] = loader(*args)
+        while len(_worker_inputs) > WORKER_INPUTS:
+            _worker_inputs.popitem(last=False)
+    _worker_inputs.move_to_end(key)
+    return _worker_inputs[key]
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def shared_input(path):
+    """
+    Get, in a worker process, a value written by `TrainingExecutor.shared`, reading its file once per worker.
+    """
+    return worker_input(path, _load_pickle, path)
+
+
+def _run_training(df, target_column, last_index, validity_offset_days, top_k, num_threads, dataset_dir=None, valid_only_metrics=False,
+                  shared_path=None):
+    """
+    Run `train_and_forecast` in a worker process and add the worker-side total to the timings.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    prepared = None
+    if df is None:
+        df, splits = shared_input(shared_path)
+        prepared = splits.get((last_index, validity_offset_days))
+    result_model1, result_model2, forecast_dates, timings = train_and_forecast(
+        df, target_column, last_index, validity_offset_days, top_k, num_threads=num_threads, prepared=prepared,
+        dataset_dir=dataset_dir, valid_only_metrics=valid_only_metrics,
+    )
+    timings['total'] = {
+        'wall': time.perf_counter() - wall_start,
+        'cpu': time.process_time() - cpu_start,
+    }
+    return result_model1, result_model2, forecast_dates, timings
+
+
+class TrainingExecutor:
+    def __init__(self, max_workers: int = None, num_threads: int = None, dataset_dir: str = None, valid_only_metrics: bool = False):
+        """
+        Initialize the TrainingExecutor class.
+
+        Runs `train_and_forecast` for several targets or configurations in a process pool, limiting
+        LightGBM's threads per worker so that workers times threads does not exceed the CPU count. The pool
+        is shared by every caller (forecasts, backtests, searches), so the bound holds across requests.
+
+        Parameters:
+        - max_workers (int): Number of worker processes. Default is the CPU count divided by `num_threads`,
+          or at most 4 if neither is given.
+        - num_threads (int): LightGBM threads per worker. Default is the CPU count divided by `max_workers`.
+        - dataset_dir (str): Directory caching the binned LightGBM Datasets (see `build_datasets`). Default is no cache.
+        - valid_only_metrics (bool): Evaluate the metrics of every round on the validation set only.
+        """
+        cpu_count = os.cpu_count() or 1
+        if max_workers is None and num_threads is None:
+            max_workers = min(4, cpu_count)
+        if max_workers is None:
+            max_workers = max(1, cpu_count // num_threads)
+        if num_threads is None:
+            num_threads = max(1, cpu_count // max_workers)
+        self.max_workers = max_workers
+        self.num_threads = num_threads
+        self.dataset_dir = dataset_dir
+        self.valid_only_metrics = valid_only_metrics
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # The shared pool is created lazily so that importing the API does not fork workers
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def schedule(self, function, *args):
+        """
+        Schedule a module-level function on the shared pool.
+
+        Parameters:
+        - function (callable): The function, run in a worker process.
+        - args: Its arguments.
+
+        Returns:
+        - concurrent.futures.Future: Future resolving to its result.
+        """
+        return self._get_pool().submit(function, *args)
+
+    @contextmanager
+    def shared(self, value):
+        """
+        Write a value shared by the tasks of a call once, instead of sending it with every task.
+
+        Tasks receive the yielded path and read the value with `shared_input`, which loads it once per
+        worker. The file is removed when the context exits.
+
+        Parameters:
+        - value: The picklable value.
+
+        Yields:
+        - str: The path of the value.
+        """
+        fd, path = tempfile.mkstemp(prefix='shared-', suffix='.pkl')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            yield path
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def results(futures: list) -> list:
+        """
+        Wait for the results of futures, in order. On the first failure the futures that have not started
+        are cancelled, so a failed call does not keep the shared pool busy, and the error is raised.
+
+        Parameters:
+        - futures (list): The futures.
+
+        Returns:
+        - list: Their results.
+        """
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def submit(self, df, target_column, last_index, validity_offset_days=30*24, top_k=20):
+        """
+        Schedule a single training on the shared pool.
+
+        Parameters:
+        - df (pd.DataFrame): The feature table.
+        - target_column (str): The name of the target column.
+        - last_index (pd.Timestamp): The last date of the validation window.
+        - validity_offset_days (int): The length of the validation window in days.
+        - top_k (int): Number of features kept for the second model.
+
+        Returns:
+        - concurrent.futures.Future: Future resolving to the `train_and_forecast` results and stage timings.
+        """
+        return self.schedule(
+            _run_training, df, target_column, last_index, validity_offset_days, top_k, self.num_threads, self.dataset_dir,
+            self.valid_only_metrics,
+        )
+
+    def map(self, df, jobs: list) -> list:
+        """
+        Train several targets or configurations on the same feature table concurrently.
+
+        The feature matrices are prepared once per (last_index, validity_offset_days) split. The jobs run on
+        the shared pool; the feature table and prepared splits are written once and read once per worker
+        instead of being sent with every job.
+
+        Parameters:
+        - df (pd.DataFrame): The feature table.
+        - jobs (list): List of dicts with `target_column`, `last_index` and optionally
+          `validity_offset_days` and `top_k`.
+
+        Returns:
+        - list: The results of each job, in the order of `jobs`.
+        """
+        jobs = [dict(job, validity_offset_days=job.get('validity_offset_days', 30*24), top_k=job.get('top_k', 20)) for job in jobs]
+        prepared = {}
+        for job in jobs:
+            split = (job['last_index'], job['validity_offset_days'])
+            if split not in prepared:
+                prepared[split] = prepare_feature_matrices(df, *split)
+
+        with self.shared((df, prepared)) as path:
+            futures = [
+                self.schedule(
+                    _run_training, None, job['target_column'], job['last_index'],
+                    job['validity_offset_days'], job['top_k'], self.num_threads, self.dataset_dir,
+                    self.valid_only_metrics, path,
+                )
+                for job in jobs
+            ]
+            return self.results(futures)
+
+    def shutdown(self) -> None:
+        """
+        Shut down the shared pool, waiting for running trainings.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,126 @@
+# transport.py
+import io
+import uuid
+import pandas as pd
+import pyarrow as pa
+
+CSV_MIMETYPE = 'text/csv'
+JSON_MIMETYPE = 'application/json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+BINARY_MIMETYPES = [ARROW_MIMETYPE, PARQUET_MIMETYPE]
+
+# Leading bytes of an Arrow IPC stream (continuation marker), an Arrow IPC file / Feather v2 and a Parquet file
+_ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+_ARROW_FILE_MAGIC = b'ARROW1'
+_PARQUET_MAGIC = b'PAR1'
+
+
+def sniff_format(head: bytes) -> str:
+    """
+    Detect the format of a table from its leading bytes.
+
+    Parameters:
+    - head (bytes): The first bytes of the table (at least 6).
+
+    Returns:
+    - str: ARROW_MIMETYPE, PARQUET_MIMETYPE or CSV_MIMETYPE.
+    """
+    if head.startswith(_PARQUET_MAGIC):
+        return PARQUET_MIMETYPE
+    if head.startswith(_ARROW_STREAM_MAGIC) or head.startswith(_ARROW_FILE_MAGIC):
+        return ARROW_MIMETYPE
+    return CSV_MIMETYPE
+
+
+def read_frame(source, **csv_kwargs) -> pd.DataFrame:
+    """
+    Read an uploaded table, detecting from its leading bytes whether it is Arrow IPC, Parquet or CSV.
+
+    Arrow and Parquet bodies carry their own index and dtypes; the keyword arguments are only used
+    for the CSV fallback.
+
+    Parameters:
+    - source: A file-like object (e.g. the uploaded file) or a file path.
+    - **csv_kwargs: Keyword arguments passed to `pd.read_csv`.
+
+    Returns:
+    - pd.DataFrame: The table.
+    """
+    if hasattr(source, 'read'):
+        data = source.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+
+    mimetype = sniff_format(data[:8])
+    if mimetype == PARQUET_MIMETYPE:
+        return pd.read_parquet(io.BytesIO(data), engine='pyarrow')
+    if mimetype == ARROW_MIMETYPE:
+        if data.startswith(_ARROW_FILE_MAGIC):
+            return pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+    return pd.read_csv(io.BytesIO(data), **csv_kwargs)
+
+
+def write_frame(df: pd.DataFrame, mimetype: str) -> bytes:
+    """
+    Serialize a table, including its index, as Arrow IPC, Parquet or CSV.
+
+    Parameters:
+    - df (pd.DataFrame): The table.
+    - mimetype (str): One of ARROW_MIMETYPE, PARQUET_MIMETYPE or CSV_MIMETYPE.
+
+    Returns:
+    - bytes: The serialized table.
+    """
+    if mimetype == ARROW_MIMETYPE:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if mimetype == PARQUET_MIMETYPE:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, engine='pyarrow', index=True)
+        return buffer.getvalue()
+    return df.to_csv(index=True).encode('utf-8')
+
+
+def negotiate(accept_mimetypes, fallback: str) -> str:
+    """
+    Choose the response format from the request's Accept header.
+
+    The text fallback is listed first, so clients that accept anything keep getting it.
+
+    Parameters:
+    - accept_mimetypes (werkzeug.datastructures.MIMEAccept): The parsed Accept header.
+    - fallback (str): The text format of the endpoint (CSV_MIMETYPE or JSON_MIMETYPE).
+
+    Returns:
+    - str: The chosen mimetype.
+    """
+    return accept_mimetypes.best_match([fallback] + BINARY_MIMETYPES, default=fallback)
+
+
+def write_multipart(frames: dict, mimetype: str) -> tuple:
+    """
+    Serialize several named tables as the parts of a single multipart/mixed body.
+
+    Parameters:
+    - frames (dict): Mapping of part name to table.
+    - mimetype (str): The format of every part.
+
+    Returns:
+    - tuple: The body and its Content-Type, including the boundary.
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, df in frames.items():
+        body.write(f'--{boundary}\r\n'.encode())
+        body.write(f'Content-Disposition: attachment; name="{name}"\r\n'.encode())
+        body.write(f'Content-Type: {mimetype}\r\n\r\n'.encode())
+        body.write(write_frame(df, mimetype))
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/mixed; boundary={boundary}'
@@ -0,0 +1,134 @@
+# registry_consolidation.py
+import datetime
+import os
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Date-times at midnight, as written for plain dates by Excel and by the Parquet cache
+_MIDNIGHT = re.compile(r'^(\d{4}-\d{2}-\d{2}) 00:00:00$')
+
+PROVENANCE_COLUMNS = ['file', 'first_seen', 'last_seen']
+
+GREEK_MONTHS = ['ΙΑΝΟΥΑΡΙΟΣ', 'ΦΕΒΡΟΥΑΡΙΟΣ', 'ΜΑΡΤΙΟΣ', 'ΑΠΡΙΛΙΟΣ', 'ΜΑΙΟΣ', 'ΙΟΥΝΙΟΣ',
+                'ΙΟΥΛΙΟΣ', 'ΑΥΓΟΥΣΤΟΣ', 'ΣΕΠΤΕΜΒΡΙΟΣ', 'ΟΚΤΩΒΡΙΟΣ', 'ΝΟΕΜΒΡΙΟΣ', 'ΔΕΚΕΜΒΡΙΟΣ']
+_REGISTER_MONTH = re.compile(r'({})[\W_]*(\d{{4}})'.format('|'.join(GREEK_MONTHS)))
+# Latin letters typed instead of their Greek look-alikes in some file names (e.g. 'OKTΩΒΡΙΟΣ')
+_LOOKALIKES = str.maketrans('ABEHIKMNOPTXYZ', 'ΑΒΕΗΙΚΜΝΟΡΤΧΥΖ')
+
+
+def _normalize_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str):
+        value = value.strip()
+        match = _MIDNIGHT.match(value)
+        return match.group(1) if match else value
+    return value
+
+
+def snapshot_date(label: str):
+    """
+    Read the month of a register from its file name, e.g. 'ΜΗΤΡΩΟ-ΑΔΕΙΩΝ-ΕΡΓΑ-ΑΠΕ-ΜΑΡΤΙΟΣ-2024.xlsx'.
+
+    Parameters:
+    - label (str): The file name or path.
+
+    Returns:
+    - pd.Timestamp: The first day of the register month, or None if the name holds no month and year.
+    """
+    name = unicodedata.normalize('NFD', os.path.basename(str(label)).upper())
+    # Drop the accents and diaeresis ('ΜΑΪΟΣ') and read Latin look-alikes as Greek
+    name = ''.join(char for char in name if not unicodedata.combining(char)).translate(_LOOKALIKES)
+    match = _REGISTER_MONTH.search(name)
+    if match is None:
+        return None
+    return pd.Timestamp(year=int(match.group(2)), month=GREEK_MONTHS.index(match.group(1)) + 1, day=1)
+
+
+def normalize_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize a registry snapshot so that the same record is written the same way in every snapshot.
+
+    Dates, whether typed as dates or as text, become 'YYYY-MM-DD' strings (as in `merge_dataframes`) and
+    surrounding whitespace is stripped from text.
+
+    Parameters:
+    - df (pd.DataFrame): The snapshot.
+
+    Returns:
+    - pd.DataFrame: The normalized snapshot.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+        elif df[col].dtype == 'object':
+            df[col] = df[col].map(_normalize_value)
+    return df
+
+
+def record_keys(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """
+    Hash the normalized fields of each record into a 64-bit composite key.
+
+    Parameters:
+    - df (pd.DataFrame): The normalized records.
+    - columns (list): The columns forming the key.
+
+    Returns:
+    - np.ndarray: The uint64 key of each record.
+    """
+    # Compare fields as text, so 2 and '2' or 0.5 read from different snapshots give the same key
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy()
+
+
+def consolidate_snapshots(snapshots: list, key_columns: list = None, snapshot_dates: list = None) -> pd.DataFrame:
+    """
+    Consolidate registry snapshots into one table of distinct records, in a single pass.
+
+    The normalized snapshots are concatenated once and deduplicated on a hashed composite key of
+    the record's fields (by default all of them: application id, RAE registry number, dates, ...).
+    Each record keeps the values of its latest snapshot and its provenance, stored as categoricals:
+    the `file` its values were taken from, and the `first_seen` and `last_seen` snapshots.
+
+    Parameters:
+    - snapshots (list): List of (label, DataFrame) pairs, oldest first unless `snapshot_dates` is given;
+      the label is usually the file path.
+    - key_columns (list): The columns identifying a record. Default is all columns.
+    - snapshot_dates (list): The register date of each snapshot (e.g. from `snapshot_date`). If given, the
+      snapshots are ordered by it instead of by their position; snapshots without a date (None) come first.
+
+    Returns:
+    - pd.DataFrame: The distinct records with their provenance columns.
+    """
+    if snapshot_dates is not None:
+        if len(snapshot_dates) != len(snapshots):
+            raise ValueError('snapshot_dates must give one date per snapshot.')
+        dates = pd.to_datetime(pd.Series(snapshot_dates, dtype=object)).fillna(pd.Timestamp.min).to_numpy()
+        snapshots = [snapshots[i] for i in np.argsort(dates, kind='stable')]
+
+    # Several snapshots (e.g. the sheets of a workbook) may share a label
+    labels = list(dict.fromkeys(label for label, _ in snapshots))
+    label_codes = np.array([labels.index(label) for label, _ in snapshots])
+    frames = [normalize_snapshot(df) for _, df in snapshots]
+    snapshot_index = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+    records = pd.concat(frames, ignore_index=True)
+
+    if key_columns is None:
+        key_columns = list(records.columns)
+    keys = record_keys(records, key_columns)
+
+    # First and last snapshot of every key, then keep the latest row of each key
+    seen = pd.DataFrame({'key': keys, 'snapshot': snapshot_index}).groupby('key', sort=False)['snapshot']
+    first_seen = seen.transform('min').to_numpy()
+    last_seen = seen.transform('max').to_numpy()
+    keep = ~pd.Series(keys).duplicated(keep='last').to_numpy()
+
+    records = records[keep].reset_index(drop=True)
+    snapshot_labels = pd.CategoricalDtype(labels, ordered=True)
+    records['file'] = pd.Categorical.from_codes(label_codes[snapshot_index[keep]], dtype=snapshot_labels)
+    records['first_seen'] = pd.Categorical.from_codes(label_codes[first_seen[keep]], dtype=snapshot_labels)
+    records['last_seen'] = pd.Categorical.from_codes(label_codes[last_seen[keep]], dtype=snapshot_labels)
+    return records
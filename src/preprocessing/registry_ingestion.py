@@ -0,0 +1,150 @@
+# registry_ingestion.py
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+def file_digest(path: str) -> str:
+    """
+    Hash the contents of a file, block by block.
+
+    Parameters:
+    - path (str): The file path.
+
+    Returns:
+    - str: The hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a parsed sheet storable as Parquet.
+
+    Column names become strings, and object columns mixing several types (e.g. dates typed as text in
+    some rows) are stored as text; missing values are kept.
+
+    Parameters:
+    - df (pd.DataFrame): The sheet as returned by `pd.read_excel`.
+
+    Returns:
+    - pd.DataFrame: The normalized sheet.
+    """
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes == 'object']:
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1:
+            df[col] = df[col].map(lambda value: value if pd.isna(value) else str(value))
+    return df
+
+
+def _parse_workbook(file_path: str, sheet_paths: dict, header: int) -> None:
+    # Runs in a worker process: parse the requested sheets once and write each to its cache file
+    sheets = pd.read_excel(file_path, header=header, sheet_name=list(sheet_paths), parse_dates=False)
+    for sheet_name, df_sheet in sheets.items():
+        cache_path = sheet_paths[sheet_name]
+        temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+        normalize_sheet(df_sheet).to_parquet(temporary_path, engine='pyarrow', index=False)
+        os.replace(temporary_path, cache_path)
+
+
+class RegistryIngestion:
+    def __init__(self, cache_dir: str, max_workers: int = None):
+        """
+        Initialize the RegistryIngestion class.
+
+        Loads the sheets of the RAE registry workbooks, parsing the workbooks in a process pool and
+        caching every parsed sheet as Parquet. Cache entries are keyed by the hash of the workbook, so
+        unchanged monthly registers are never parsed again; the hash is only recomputed when the file's
+        modification time or size changes.
+
+        Parameters:
+        - cache_dir (str): Directory of the Parquet cache and its index.
+        - max_workers (int): Number of parsing processes. Default is the CPU count.
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.stats = {'hits': 0, 'misses': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def _digest(self, file_path: str) -> str:
+        # Reuse the recorded hash while the file's modification time and size are unchanged
+        stat = os.stat(file_path)
+        entry = self.index.get(os.path.abspath(file_path))
+        if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['sha256']
+        digest = file_digest(file_path)
+        self.index[os.path.abspath(file_path)] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha256': digest}
+        return digest
+
+    def _cache_path(self, digest: str, sheet_name, header: int) -> str:
+        return os.path.join(self.cache_dir, f'{digest}-sheet{sheet_name}-header{header}.parquet')
+
+    def _save_index(self) -> None:
+        temporary_path = f'{self.index_path}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(temporary_path, self.index_path)
+
+    def _read_sheet(self, path: str, column_pattern: str = None) -> pd.DataFrame:
+        # Read only the matching columns: some registers are padded with thousands of unnamed columns
+        if column_pattern is None:
+            return pd.read_parquet(path, engine='pyarrow')
+        columns = [name for name in pq.read_schema(path).names if re.search(column_pattern, name)]
+        return pd.read_parquet(path, engine='pyarrow', columns=columns)
+
+    def load(self, file_paths: list, sheet_names: list = None, header: int = 1, column_pattern: str = None) -> list:
+        """
+        Load the given sheets of each workbook, parsing only the workbooks missing from the cache.
+
+        Parameters:
+        - file_paths (list): List of workbook paths.
+        - sheet_names (list): Sheets to load from each workbook, by position or name. Default is the first sheet.
+        - header (int): Row of the column names, as in `pd.read_excel`.
+        - column_pattern (str): If given, only the columns whose name matches this regular expression are
+          read, as with `DataFrame.filter(regex=...)`. Default is all columns.
+
+        Returns:
+        - list: One dict of sheet name to DataFrame per workbook, in the order of `file_paths`.
+        """
+        sheet_names = [0] if sheet_names is None else sheet_names
+        cache_paths = []
+        missing = {}
+        for file_path in file_paths:
+            digest = self._digest(file_path)
+            sheet_paths = {sheet_name: self._cache_path(digest, sheet_name, header) for sheet_name in sheet_names}
+            cache_paths.append(sheet_paths)
+            stale = {sheet_name: path for sheet_name, path in sheet_paths.items() if not os.path.exists(path)}
+            if stale:
+                missing[file_path] = stale
+        self._save_index()
+
+        self.stats['misses'] += len(missing)
+        self.stats['hits'] += len(file_paths) - len(missing)
+        if missing:
+            max_workers = min(self.max_workers or os.cpu_count() or 1, len(missing))
+            # A fresh worker per workbook, so the parser's memory is released after each one
+            with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as pool:
+                futures = [pool.submit(_parse_workbook, file_path, sheet_paths, header) for file_path, sheet_paths in missing.items()]
+                for future in futures:
+                    future.result()
+
+        return [
+            {sheet_name: self._read_sheet(path, column_pattern) for sheet_name, path in sheet_paths.items()}
+            for sheet_paths in cache_paths
+        ]
@@ -42,7 +42,7 @@ if uploaded_file is not None:
 
     if st.session_state.get('aggregated_data_available', False):
         if st.sidebar.button('Process Time Series'):
-            result, extended_result = process_time_series('cache/agg_res.csv', current_date.strftime('%Y-%m-%d'), forecast_horizon)
+            result, extended_result = process_time_series('cache/agg_res.arrow', current_date.strftime('%Y-%m-%d'), forecast_horizon)
             if result is not None and extended_result is not None:
                 st.session_state.processed_data_available = True
                 st.session_state.extended_result = extended_result
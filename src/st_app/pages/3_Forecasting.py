@@ -58,7 +58,7 @@ if uploaded_file is not None:
 
     if st.session_state.get('aggregated_data_available', False):
         if st.sidebar.button('Process Time Series'):
-            result, extended_result = process_time_series('cache/agg_res.csv', current_date.strftime('%Y-%m-%d'), forecast_horizon)
+            result, extended_result = process_time_series('cache/agg_res.arrow', current_date.strftime('%Y-%m-%d'), forecast_horizon)
             if result is not None and extended_result is not None:
                 st.write('Processed Time Series Data', result.head())
                 st.write('Extended Time Series Data', extended_result.head())
@@ -76,7 +76,7 @@ if uploaded_file is not None:
         if st.sidebar.button('Forecast'):
             st.sidebar.markdown("---")
         # Example usage within the Streamlit app
-        result_model1, result_model2, forecast_dates = forecast('cache/extended_result.csv', target_column, last_index.strftime('%Y-%m-%d'), validity_offset_days)
+        result_model1, result_model2, forecast_dates = forecast('cache/extended_result.arrow', target_column, last_index.strftime('%Y-%m-%d'), validity_offset_days)
         if result_model1 and result_model2:
             st.session_state.model1_forecast_data, st.session_state.model1_rmse, st.session_state.model1_mape, st.session_state.model1_mape_sum, st.session_state.model1_smape_sum, st.session_state.model1_mdl = result_model1
             st.session_state.model2_forecast_data, st.session_state.model2_rmse, st.session_state.model2_mape, st.session_state.model2_mape_sum, st.session_state.model2_smape_sum, st.session_state.model2_mdl = result_model2
@@ -2,10 +2,45 @@ import pandas as pd
 import numpy as np
 import requests
 import io
+import time
+import pyarrow as pa
 import streamlit as st
 import plotly.graph_objects as go
 import statsmodels.api as sm
 
+# Tables are exchanged with the API as Arrow IPC streams; the API falls back to CSV for other clients
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def read_arrow(data):
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def write_arrow(df, file_path):
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(file_path, 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def split_multipart(response):
+    """
+    Split a multipart/mixed API response into its named parts.
+
+    Parameters:
+    - response (requests.Response): The API response.
+
+    Returns:
+    - dict: Mapping of part name to the raw bytes of the part.
+    """
+    boundary = response.headers['Content-Type'].split('boundary=')[1].strip('"').encode()
+    parts = {}
+    for part in response.content.split(b'--' + boundary)[1:-1]:
+        headers, body = part[2:].split(b'\r\n\r\n', 1)
+        name = headers.decode().split('name="')[1].split('"')[0]
+        parts[name] = body[:-2]  # Strip the CRLF before the next boundary
+    return parts
+
+
 # Function to upload and get aggregated data from the API
 def get_aggregated_data(file_path, frequency, current_date, forecast_horizon):
     url = 'http://127.0.0.1:5000/aggregate'
@@ -15,10 +50,10 @@ def get_aggregated_data(file_path, frequency, current_date, forecast_horizon):
         'current_date': current_date,
         'forecast_horizon': forecast_horizon
     }
-    response = requests.post(url, files=files, data=data)
+    response = requests.post(url, files=files, data=data, headers={'Accept': ARROW_MIMETYPE})
     if response.status_code == 200:
-        result = pd.read_csv(io.StringIO(response.text), index_col=0, parse_dates=True)
-        result.to_csv('cache/agg_res.csv')  # Save the result as agg_res.csv in the cache folder
+        result = read_arrow(response.content)
+        write_arrow(result, 'cache/agg_res.arrow')  # Save the result as agg_res.arrow in the cache folder
         return result
     else:
         st.error(f"Error {response.status_code}: {response.text}")
@@ -32,20 +67,21 @@ def process_time_series(file_path, current_date, forecast_horizon):
         'current_date': current_date,
         'forecast_horizon': forecast_horizon
     }
-    response = requests.post(url, files=files, data=data)
+    response = requests.post(url, files=files, data=data, headers={'Accept': ARROW_MIMETYPE})
     if response.status_code == 200:
-        json_response = response.json()
-        result = pd.read_csv(io.StringIO(json_response['result']), index_col=0, parse_dates=True)
-        extended_result = pd.read_csv(io.StringIO(json_response['extended_result']), index_col=0, parse_dates=True)
-        extended_result.to_csv('cache/extended_result.csv')  # Save the extended result as extended_result.csv in the cache folder
-        result.to_csv('cache/result.csv')  # Save the result as extended_result.csv in the cache folder
+        parts = split_multipart(response)
+        result = read_arrow(parts['result'])
+        extended_result = read_arrow(parts['extended_result'])
+        write_arrow(extended_result, 'cache/extended_result.arrow')  # Save the extended result as extended_result.arrow in the cache folder
+        write_arrow(result, 'cache/result.arrow')  # Save the result as result.arrow in the cache folder
         return result, extended_result
     else:
         st.error(f"Error {response.status_code}: {response.text}")
         return None, None
 
-def forecast(file_path, target_column, last_index, validity_offset_days):
-    url = 'http://127.0.0.1:5000/forecast'
+def forecast(file_path, target_column, last_index, validity_offset_days, poll_interval=2):
+    # Submit the forecast as a background job and poll it, so the API worker is not blocked while training
+    url = 'http://127.0.0.1:5000/jobs/forecast'
     files = {'file': open(file_path, 'rb')}
     data = {
         'target_column': target_column,
@@ -53,6 +89,12 @@ def forecast(file_path, target_column, last_index, validity_offset_days):
         'validity_offset_days': validity_offset_days
     }
     response = requests.post(url, files=files, data=data)
+    if response.status_code == 202:
+        job_url = f"http://127.0.0.1:5000/jobs/{response.json()['job_id']}"
+        with st.spinner('Training forecasting models...'):
+            while requests.get(job_url).json()['status'] in ('queued', 'running'):
+                time.sleep(poll_interval)
+        response = requests.get(f'{job_url}/result')
     if response.status_code == 200:
         json_response = response.json()
         
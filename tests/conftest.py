@@ -0,0 +1,48 @@
+# conftest.py
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The API modules import each other by name, as when running from src/api
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'api'))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def aggregation() -> pd.DataFrame:
+    """
+    A small monthly aggregation shaped like `agg_res.csv`: MW and RSI aggregates with a trend, a yearly
+    season and noise, and missing values at the start of some columns.
+    """
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2015-01-31', periods=72, freq='ME')
+    t = np.arange(len(index))
+    season = np.sin(2 * np.pi * t / 12)
+    data = pd.DataFrame({
+        'ΙΣΧΥΣ (MW)_count': rng.integers(1, 20, len(index)).astype(float),
+        'ΙΣΧΥΣ (MW)_sum': 100 + 5 * t + 30 * season + rng.normal(0, 10, len(index)),
+        'ΙΣΧΥΣ (MW)_mean': 10 + 2 * season + rng.normal(0, 1, len(index)),
+        'RSI_mean': 0.5 + 0.1 * season + rng.normal(0, 0.05, len(index)),
+        'RSI_max': 0.9 + rng.normal(0, 0.02, len(index)),
+    }, index=index)
+    data.iloc[:3, data.columns.get_loc('ΙΣΧΥΣ (MW)_mean')] = np.nan
+    data.iloc[:5, data.columns.get_loc('RSI_max')] = np.nan
+    return data
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """
+    The Flask API module, with its caches, registry and job queue in a temporary directory.
+    """
+    directory = tmp_path_factory.mktemp('api')
+    for name in ['CACHE_DIR', 'MODEL_DIR', 'JOB_DIR', 'SEARCH_DIR', 'DATASET_DIR', 'FEATURE_STORE_DIR', 'FEATURE_STATE_DIR']:
+        os.environ[f'RAE_{name}'] = str(directory / name.lower())
+    os.environ['RAE_LOG_LEVEL'] = 'ERROR'
+    os.environ.setdefault('RAE_TRAINING_WORKERS', '1')
+    import app
+    yield app
+    app.executor.shutdown()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from date_parser import parse_dates
+
+# Values in every shape found in the registries, and some that none of the exact formats accepts
+VALUES = [
+    '2021-03-04 10:11:12', '2021-03-04 10:11:12.5', '2021-03-04', '04/03/2021', '4/3/2021', '04.03.2021',
+    '2/13/2021', '13/13/2021', '31/02/2021', 'March 5, 2021', '2021/03/04', '', 'garbage', None, np.nan,
+    '44000', '44000.5', '12 Ιαν 2020', '5 Μαρτίου 2021', 'Ιανουάριος 2020', '04/03/2021',
+]
+
+
+def mixed(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values, errors='coerce', format='mixed', dayfirst=True)
+
+
+def test_matches_the_mixed_format_parser():
+    values = pd.Series(VALUES, index=np.arange(len(VALUES)) * 2, dtype=object, name='ΗΜΕΡΟΜΗΝΙΑ')
+    parsed, counts = parse_dates(values)
+
+    pd.testing.assert_series_equal(parsed, mixed(values))
+    assert counts['day_month_year'] == 3 and counts['iso_date'] == 1 and counts['day_month_year_dots'] == 1
+    assert counts['missing'] == 2
+    assert counts['coerced'] == int(parsed.isna().sum()) - 2
+    assert sum(counts[name] for name in counts if name not in ('excel_serial', 'coerced')) == len(values) - counts['coerced']
+
+
+def test_greek_month_names_are_coerced_as_by_the_mixed_parser():
+    values = pd.Series(['12 Ιαν 2020', '5 Μαρτίου 2021', 'Ιανουάριος 2020'], dtype=object)
+    parsed, counts = parse_dates(values)
+    assert parsed.isna().all() and mixed(values).isna().all()
+    assert counts['coerced'] == 3
+
+
+def test_excel_serials():
+    values = pd.Series(['44000', '44000.5', '01/01/2020'], dtype=object)
+    parsed, counts = parse_dates(values)
+    pd.testing.assert_series_equal(parsed, mixed(values))
+    assert counts['excel_serial'] == 2
+
+    parsed, _ = parse_dates(values, parse_excel_serials=True)
+    assert parsed.tolist() == [pd.Timestamp('2020-06-18'), pd.Timestamp('2020-06-18 12:00'), pd.Timestamp('2020-01-01')]
+
+
+@pytest.mark.parametrize('values', [
+    pd.Series(pd.date_range('2020-01-01', periods=3)),
+    pd.Series([1.5e18, np.nan, 1.6e18]),
+])
+def test_typed_columns_are_left_to_pandas(values):
+    parsed, counts = parse_dates(values)
+    pd.testing.assert_series_equal(parsed, mixed(values))
+    assert counts['other'] + counts['missing'] == len(values)
+
+
+def test_large_column_with_repeated_values():
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2010-01-01', periods=500).strftime('%d/%m/%Y').tolist()
+    values = pd.Series(rng.choice(days + ['2015-05-05', 'n/a'], 5000), dtype=object)
+    parsed, counts = parse_dates(values)
+    pd.testing.assert_series_equal(parsed, mixed(values))
+    assert counts['day_month_year'] + counts['iso_date'] + counts['coerced'] == len(values)
@@ -0,0 +1,89 @@
+import threading
+import pandas as pd
+import pytest
+
+from feature_plan import FeaturePlan
+from time_series_engineering import feature_plan, run_feature_engineering
+
+
+def add(*values, offset=0):
+    return sum(values) + offset
+
+
+def test_identical_declarations_share_a_node():
+    plan = FeaturePlan()
+    assert plan.add('a', add, ['x'], offset=1) == 'a'
+    assert plan.add('b', add, ['x'], offset=1) == 'a'
+    assert plan.add('c', add, ['x'], offset=2) == 'c'
+    assert plan.add('d', add, ['x', 'a']) == 'd'
+    assert list(plan.nodes) == ['a', 'c', 'd'] and plan.declarations == {'a': 2, 'c': 1, 'd': 1}
+    with pytest.raises(ValueError):
+        plan.add('a', add, ['x'], offset=3)
+
+
+def test_order_follows_dependencies_then_declarations():
+    plan = FeaturePlan()
+    plan.add('late', add, ['early'])
+    plan.add('early', add, ['x'])
+    plan.add('other', add, ['x'], offset=1)
+    plan.add('last', add, ['late', 'other'])
+    assert plan.order() == ['early', 'other', 'late', 'last']
+
+    plan.add('cycle_a', add, ['cycle_b'])
+    plan.add('cycle_b', add, ['cycle_a'])
+    with pytest.raises(ValueError):
+        plan.order()
+
+
+def test_run():
+    calls = []
+
+    def counted(*values, offset=0):
+        calls.append(offset)
+        return add(*values, offset=offset)
+
+    plan = FeaturePlan()
+    a = plan.add('a', counted, ['x'], offset=1)
+    plan.add('a_again', counted, ['x'], offset=1)
+    b = plan.add('b', counted, ['x', a], offset=10)
+    report = {}
+    outputs = plan.run({'x': 5}, max_workers=2, report=report)
+    assert (outputs['x'], outputs[a], outputs[b]) == (5, 6, 21)
+    assert sorted(calls) == [1, 10]
+    assert report[a]['declarations'] == 2 and report[b]['inputs'] == ['x', 'a']
+
+    with pytest.raises(ValueError):
+        plan.run({})
+
+
+def test_independent_nodes_run_concurrently():
+    barrier = threading.Barrier(2, timeout=10)
+
+    def meet(value):
+        # Only passes once the other node waits too
+        barrier.wait()
+        return value
+
+    plan = FeaturePlan()
+    plan.add('a', meet, ['x'])
+    plan.add('b', meet, ['y'])
+    assert plan.run({'x': 1, 'y': 2}, max_workers=2)['b'] == 2
+
+
+def test_feature_plan_declares_each_selection_once():
+    plan, blocks, tables = feature_plan(decomposition_periods=[3, 12])
+    assert len(blocks) == len(set(blocks)) and tables == []
+    # The selections of the MW lag sources and of the aggregates are shared with the families
+    assert plan.declarations['features_rsi'] == 2
+    assert set(plan.order()) == set(plan.nodes)
+    _, _, tables = feature_plan(autocorrelation='table')
+    assert tables == ['autocorr_mw', 'autocorr_rsi']
+
+
+def test_results_do_not_depend_on_the_threads(aggregation):
+    report = {}
+    final_result, _ = run_feature_engineering(aggregation, decomposition_periods=[3], max_workers=4, report=report)
+    sequential, _ = run_feature_engineering(aggregation, decomposition_periods=[3], max_workers=1)
+    pd.testing.assert_frame_equal(final_result, sequential)
+    assert set(report) == set(feature_plan(decomposition_periods=[3])[0].nodes)
+    assert report['time_features']['columns'] == 2 and report['time_features']['bytes'] > 0
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore, frame_digest
+
+
+def table(value: float, n_columns: int = 3) -> pd.DataFrame:
+    index = pd.date_range('2020-01-31', periods=5, freq='ME')
+    return pd.DataFrame({f'c{i}': np.arange(5.0) + value + i for i in range(n_columns)}, index=index)
+
+
+def test_round_trip(tmp_path):
+    store = FeatureStore(str(tmp_path), 'v1')
+    result, extended_result = table(0), table(10, n_columns=5)
+    store.write('M', 'all', 'h1', {'result': result, 'extended_result': extended_result})
+
+    pd.testing.assert_frame_equal(store.read('M', 'all', 'result'), result, check_freq=False)
+    pd.testing.assert_frame_equal(store.read('M', 'all', 'extended_result', columns=['c4', 'c1']), extended_result[['c4', 'c1']], check_freq=False)
+    assert store.columns('M', 'all', 'extended_result') == ['c0', 'c1', 'c2', 'c3', 'c4']
+    entry, = store.entries()
+    assert entry['tables'] == {'result': {'rows': 5, 'columns': 3}, 'extended_result': {'rows': 5, 'columns': 5}}
+    assert not entry['outdated']
+
+
+def test_status_and_stale_reads(tmp_path):
+    store = FeatureStore(str(tmp_path), 'v1')
+    assert store.status('M', 'all', 'h1') == 'missing'
+    store.write('M', 'all', 'h1', {'result': table(0)})
+    assert store.status('M', 'all', 'h1') == 'fresh'
+    assert store.status('M', 'all', 'h2') == 'stale'
+    assert store.read('M', 'all', 'result', input_hash='h2') is None
+    assert store.read('M', 'all', 'missing_table') is None
+    assert store.read('M', 'other slice', 'result') is None
+
+    # Another feature-config version neither reads nor replaces the partition
+    newer = FeatureStore(str(tmp_path), 'v2')
+    assert newer.status('M', 'all', 'h1') == 'missing'
+    newer.write('M', 'all', 'h1', {'result': table(1)})
+    assert [entry['outdated'] for entry in sorted(newer.entries(), key=lambda entry: entry['version'])] == [True, False]
+    assert store.read('M', 'all', 'result')['c0'].iloc[0] == 0
+
+
+def test_rewrites_keep_the_replaced_write_only(tmp_path):
+    store = FeatureStore(str(tmp_path), 'v1')
+    paths = []
+    for value in range(4):
+        store.write('M', 'all', f'h{value}', {'result': table(value)})
+        paths.append(store.entries()[0]['path'])
+        assert store.read('M', 'all', 'result', input_hash=f'h{value}')['c0'].iloc[0] == value
+
+    partition = os.path.join(str(tmp_path), *os.path.dirname(paths[-1]).split('/'))
+    assert sorted(os.listdir(partition)) == sorted(os.path.basename(path) for path in paths[-2:])
+
+
+def _write_partitions(directory: str, worker: int) -> None:
+    store = FeatureStore(directory, 'v1')
+    for i in range(5):
+        store.write('M', 'all', f'h{worker}-{i}', {'result': table(worker * 100 + i)})
+        store.write('M', f'slice {worker}', 'h', {'result': table(worker)})
+        assert store.read('M', 'all', 'result') is not None
+
+
+def test_concurrent_writers_keep_every_partition(tmp_path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_write_partitions, args=(str(tmp_path), worker)) for worker in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+
+    store = FeatureStore(str(tmp_path), 'v1')
+    assert sorted(entry['slice'] for entry in store.entries()) == ['all', 'slice 0', 'slice 1', 'slice 2']
+    entry = next(entry for entry in store.entries() if entry['slice'] == 'all')
+    worker, i = map(int, entry['input_hash'][1:].split('-'))
+    # The table read is the one recorded with the manifest's input hash
+    assert store.read('M', 'all', 'result', input_hash=entry['input_hash'])['c0'].iloc[0] == worker * 100 + i
+
+
+def test_frame_digest():
+    assert frame_digest(table(0)) == frame_digest(table(0))
+    assert frame_digest(table(0)) != frame_digest(table(1))
+    assert frame_digest(table(0)) != frame_digest(table(0).rename(columns={'c0': 'x'}))
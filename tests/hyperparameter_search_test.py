@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hyperparameter_search import SEARCH_SPACE, HyperparameterSearch, SuccessiveHalving, rung_budgets, sample_params
+from time_series_engineering import run_feature_engineering
+from training_executor import TrainingExecutor
+
+
+def run_sequentially(scheduler: SuccessiveHalving, scores: list) -> list:
+    # One worker: every job is reported before the next one is asked for
+    jobs = []
+    while True:
+        job = scheduler.next_job(idle=True)
+        if job is None:
+            return jobs
+        jobs.append(job)
+        scheduler.report(job[0], job[1], scores[job[0]])
+
+
+def test_rung_budgets():
+    assert rung_budgets(50, 1000, 3) == [50, 150, 450, 1000]
+    assert rung_budgets(100, 100, 3) == [100]
+    assert rung_budgets(200, 100, 3) == [100]
+
+
+def test_sample_params_stay_in_the_search_space():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        params = sample_params(rng)
+        for name, (kind, low, high) in SEARCH_SPACE.items():
+            assert low <= params[name] <= high
+            assert isinstance(params[name], int if kind.endswith('int') else float)
+
+
+def test_promotion_order():
+    scores = [5, 3, 8, 1, 9, 2, 7, 6, 4]
+    jobs = run_sequentially(SuccessiveHalving(n_trials=9, n_rungs=3, eta=3), scores)
+    # The best third of a rung is promoted as soon as it is known, before new trials start
+    assert jobs == [
+        (0, 0), (1, 0), (2, 0), (1, 1),
+        (3, 0), (3, 1),
+        (4, 0), (5, 0), (5, 1), (3, 2),
+        (6, 0), (7, 0), (8, 0),
+    ]
+
+
+def test_higher_rungs_are_promoted_first():
+    scheduler = SuccessiveHalving(n_trials=9, n_rungs=3, eta=3)
+    for trial in range(9):
+        assert scheduler.next_job(idle=False) == (trial, 0)
+    for trial in range(3):
+        scheduler.report(trial, 1, float(trial))
+    for trial in range(9):
+        scheduler.report(trial, 0, float(trial))
+    # Rung 1 already has the 3 results needed to promote its best one
+    assert scheduler.next_job(idle=False) == (0, 2)
+    assert scheduler.next_job(idle=False) == (0, 1)
+    assert scheduler.next_job(idle=False) == (1, 1)
+
+
+def test_best_trial_reaches_the_last_rung():
+    scheduler = SuccessiveHalving(n_trials=2, n_rungs=2, eta=3)
+    assert scheduler.next_job(idle=True) == (0, 0)
+    assert scheduler.next_job(idle=False) == (1, 0)
+    scheduler.report(0, 0, 2.0)
+    # Not while a trial is still running
+    assert scheduler.next_job(idle=False) is None
+    scheduler.report(1, 0, 1.0)
+    assert scheduler.next_job(idle=True) == (1, 1)
+    scheduler.report(1, 1, 0.5)
+    assert scheduler.next_job(idle=True) is None
+
+
+def test_search(tmp_path, aggregation):
+    _, extended_result = run_feature_engineering(aggregation, max_workers=1)
+    executor = TrainingExecutor(max_workers=1, num_threads=1)
+    search = HyperparameterSearch(str(tmp_path), executor)
+    try:
+        leaderboard = search.run(extended_result, 'ΙΣΧΥΣ (MW)_sum', pd.Timestamp('2020-06-30'), 180, n_trials=4, min_rounds=5, max_rounds=20, eta=2)
+        assert search.run(extended_result, 'ΙΣΧΥΣ (MW)_sum', pd.Timestamp('2020-06-30'), 180, n_trials=4, min_rounds=5, max_rounds=20, eta=2) == leaderboard
+        with pytest.raises(ValueError):
+            search.run(extended_result, 'unknown', pd.Timestamp('2020-06-30'), 180)
+    finally:
+        executor.shutdown()
+
+    assert leaderboard['status'] == 'done' and leaderboard['budgets'] == [5, 10, 20]
+    assert leaderboard['best'] == {key: leaderboard['trials'][0][key] for key in ['trial', 'params', 'score', 'rung', 'rounds', 'best_iteration']}
+    assert leaderboard['best']['rung'] == 2 and leaderboard['best']['rounds'] == 20
+    assert any(trial['status'] == 'completed' for trial in leaderboard['trials'])
+    assert all(trial['status'] in ('completed', 'pruned') for trial in leaderboard['trials'])
+    # Every trial ran on the first rung, then on consecutive rungs
+    for trial in leaderboard['trials']:
+        assert [entry['rung'] for entry in trial['history']] == list(range(trial['rung'] + 1))
+    assert search.entries()[0]['search_id'] == leaderboard['search_id']
@@ -0,0 +1,77 @@
+import re
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental_feature_engineering import IncrementalFeatureEngineering, run_incremental_feature_engineering
+from time_series_engineering import run_feature_engineering
+
+# Features of whole-history statistics, which an update does not revise for rows already emitted
+WHOLE_HISTORY = re.compile(r'autocorr|mean_monthly|seasonal|residual')
+
+
+def with_future_rows(data: pd.DataFrame, n_rows: int = 3) -> pd.DataFrame:
+    # The empty future dates appended by /aggregate
+    future = pd.date_range(data.index[-1], periods=n_rows + 1, freq='ME')[1:]
+    return pd.concat([data, pd.DataFrame(np.nan, index=future, columns=data.columns)])
+
+
+def assert_exact_columns_equal(rows: pd.DataFrame, expected: pd.DataFrame) -> None:
+    exact = [column for column in expected.columns if not WHOLE_HISTORY.search(column)]
+    assert list(rows.columns) == list(expected.columns)
+    assert rows.index.equals(expected.index)
+    np.testing.assert_allclose(rows[exact].to_numpy(dtype=float), expected[exact].to_numpy(dtype=float), rtol=1e-7, atol=1e-9)
+
+
+def test_updates_match_a_full_recompute(aggregation):
+    engineer = IncrementalFeatureEngineering()
+    _, extended_result = engineer.fit(with_future_rows(aggregation.iloc[:60]))
+    assert extended_result.index.equals(aggregation.index[:60])
+
+    for first, last in [(60, 61), (61, 65), (65, 72)]:
+        _, rows = engineer.update(with_future_rows(aggregation.iloc[first:last]))
+        _, full = run_feature_engineering(aggregation.iloc[:last], max_workers=1)
+        # The revised rows come first, recomputed, followed by the new ones
+        assert rows.index.equals(aggregation.index[first - engineer.revised_rows:last])
+        assert_exact_columns_equal(rows, full.loc[rows.index])
+
+
+def test_update_rejects_rows_already_seen(aggregation):
+    engineer = IncrementalFeatureEngineering()
+    engineer.fit(aggregation.iloc[:60])
+    with pytest.raises(ValueError):
+        engineer.update(aggregation.iloc[59:61])
+    with pytest.raises(ValueError):
+        IncrementalFeatureEngineering().update(aggregation.iloc[60:61])
+
+
+def test_persisted_table_matches_a_full_recompute(aggregation, tmp_path):
+    state_path, table_path = str(tmp_path / 'state.pkl'), str(tmp_path / 'table.csv')
+    run_incremental_feature_engineering(with_future_rows(aggregation.iloc[:60]), state_path, table_path)
+    for n_rows in range(61, len(aggregation) + 1):
+        run_incremental_feature_engineering(aggregation.iloc[n_rows - 1:n_rows], state_path, table_path)
+
+    table = pd.read_csv(table_path, index_col=0, parse_dates=True)
+    _, full = run_feature_engineering(aggregation, max_workers=1)
+    assert not table.index.duplicated().any()
+    assert_exact_columns_equal(table, full)
+
+
+def test_interrupted_call_is_undone_by_the_next_one(aggregation, tmp_path):
+    def build(directory, interrupted: bool) -> str:
+        state_path, table_path = str(directory / 'state.pkl'), str(directory / 'table.csv')
+        run_incremental_feature_engineering(aggregation.iloc[:68], state_path, table_path)
+        if interrupted:
+            # A call that wrote the table and failed before saving its state
+            shutil.copy(state_path, directory / 'previous.pkl')
+            run_incremental_feature_engineering(aggregation.iloc[68:70], state_path, table_path)
+            shutil.copy(directory / 'previous.pkl', state_path)
+        run_incremental_feature_engineering(aggregation.iloc[68:70], state_path, table_path)
+        run_incremental_feature_engineering(aggregation.iloc[70:], state_path, table_path)
+        with open(table_path) as f:
+            return f.read()
+
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    assert build(tmp_path / 'a', False) == build(tmp_path / 'b', True)
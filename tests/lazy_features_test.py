@@ -0,0 +1,77 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+from lazy_features import LazyFeatures
+from time_series_engineering import run_feature_engineering
+
+
+@pytest.mark.parametrize('autocorrelation', ['constant', 'expanding', 'rolling'])
+def test_features_match_the_feature_table(aggregation, autocorrelation):
+    _, extended_result = run_feature_engineering(aggregation, autocorrelation=autocorrelation, max_workers=1)
+    columns = [column for column in extended_result.columns if column not in aggregation.columns]
+    assert 'ΙΣΧΥΣ (MW)_sum_trend_mean_rolling_3_lagged_2' in columns
+
+    # The names as LightGBM stores them, with underscores for whitespace
+    lazy = LazyFeatures(['_'.join(column.split(' ')) for column in columns], aggregation.columns, autocorrelation)
+    assert lazy.features == columns
+    features = lazy.compute(aggregation, max_workers=2)
+    pd.testing.assert_frame_equal(features, extended_result[columns], check_freq=False, check_dtype=False, rtol=1e-7, atol=1e-9)
+
+
+def test_shared_nodes_are_declared_once(aggregation):
+    lazy = LazyFeatures(['ΙΣΧΥΣ_(MW)_sum_trend_mean_rolling_3_lagged_2', 'ΙΣΧΥΣ (MW)_sum_trend_std_rolling_3'], aggregation.columns)
+    assert lazy.sources == ['ΙΣΧΥΣ (MW)_sum']
+    # The source, its decomposition and trend, the rolling statistics, the mean, the lag and the std
+    assert len(lazy.plan.nodes) == 7
+    assert lazy.plan.declarations['ΙΣΧΥΣ (MW)_sum_trend'] == 2
+
+
+def test_bounded_history(aggregation):
+    lazy = LazyFeatures(['ΙΣΧΥΣ (MW)_sum_mean_rolling_3_lagged_2', 'RSI_mean_lagged_4', 'month'], aggregation.columns)
+    assert lazy.history == 4
+    expected = lazy.compute(aggregation).loc['2020-01-01':]
+
+    # The rows before the history of the first kept row are not used
+    data = aggregation.copy()
+    data.iloc[:aggregation.index.get_loc(pd.Timestamp('2020-01-31')) - 4] = 1e9
+    pd.testing.assert_frame_equal(lazy.compute(data, start_date='2020-01-01'), expected)
+    assert lazy.compute(data, start_date='2030-01-01').empty
+
+    assert LazyFeatures(['ΙΣΧΥΣ (MW)_sum_expanding_mean'], aggregation.columns).history is None
+    assert LazyFeatures(['ΙΣΧΥΣ (MW)_sum'], aggregation.columns).history == 0
+
+
+def test_unknown_features_and_missing_columns(aggregation):
+    with pytest.raises(ValueError):
+        LazyFeatures(['ΙΣΧΥΣ (MW)_sum_median_rolling_3'], aggregation.columns)
+    with pytest.raises(ValueError):
+        LazyFeatures(['unknown_lagged_2'], aggregation.columns)
+    with pytest.raises(ValueError):
+        LazyFeatures(['ΙΣΧΥΣ (MW)_sum'], aggregation.columns, autocorrelation='unknown')
+    lazy = LazyFeatures(['RSI_max_lagged_2'], aggregation.columns)
+    with pytest.raises(ValueError):
+        lazy.compute(aggregation.drop(columns='RSI_max'))
+
+
+def test_predict_from_the_aggregation(api, aggregation):
+    _, extended_result = run_feature_engineering(aggregation, max_workers=1)
+    client = api.app.test_client()
+    form = {'target_column': 'ΙΣΧΥΣ (MW)_sum', 'last_index': '2020-06-30', 'validity_offset_days': '180'}
+    response = client.post('/forecast', data=dict(form, file=(io.BytesIO(extended_result.to_csv().encode()), 'extended_result.csv')))
+    assert response.status_code == 200
+    model_id = response.json['model_id']
+
+    def predict(df, **extra):
+        form = {'model_id': model_id, 'model': 'model1', 'start_date': '2020-01-01', **extra}
+        return client.post('/predict', data=dict(form, file=(io.BytesIO(df.to_csv().encode()), 'data.csv')))
+
+    expected = predict(extended_result)
+    response = predict(aggregation, aggregation='true')
+    assert response.status_code == 200
+    assert response.json['dates'] == expected.json['dates']
+    np.testing.assert_allclose(response.json['predictions'], expected.json['predictions'], rtol=1e-6)
+
+    response = predict(aggregation.drop(columns='ΙΣΧΥΣ (MW)_sum'), aggregation='true')
+    assert response.status_code == 400
@@ -2,6 +2,11 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.preprocessing.registry_ingestion import RegistryIngestion
+from src.preprocessing.registry_consolidation import consolidate_snapshots, snapshot_date
 
 # import debugpy
 # debugpy.listen(5678)
@@ -43,49 +48,47 @@ def merge_dataframes(df1, df2):
 
     return merged_df
 
-def merge_dataframes_with_previous_files(file_paths, column_patterns):
+def merge_dataframes_with_previous_files(file_paths, column_patterns, cache_dir=None):
     """
     Merge the first 13 columns of DataFrames from multiple Excel files with two sheets each.
     The column names from the first DataFrame are kept.
 
+    All sheets are consolidated at once: records repeated across the monthly registers are kept once,
+    with the file they were taken from and the first and last register they appear in (see
+    `consolidate_snapshots`). The registers are ordered by the month in their file name, files without
+    one coming first.
+
     Parameters:
     file_paths (list): List of file paths to Excel files.
+    cache_dir (str, optional): Directory of the parsed sheet cache. If given, the workbooks are parsed in
+                               a process pool and unchanged workbooks are loaded from the cache.
 
     Returns:
     DataFrame: Merged DataFrame containing the first 13 columns of each DataFrame from all files.
     """
-    merged_df = None
-
-    # Iterate over each file path
-    for file_path in file_paths:
-        merged_df_temp = None
-        print(f"\nLoading file : {file_path}")
-        # Load Excel file into separate DataFrames
-        # Fetch only first sheet as it is RES 
-        df = pd.read_excel(file_path, header=1, sheet_name=[0], parse_dates=False)
+    # Load all Excel files before merging
+    # Fetch only first sheet as it is RES 
+    if cache_dir is not None:
+        ingestion = RegistryIngestion(cache_dir)
+        workbooks = ingestion.load(file_paths, sheet_names=[0], header=1, column_pattern='|'.join(column_patterns))
+        print(f"Workbooks loaded from cache: {ingestion.stats['hits']}, parsed: {ingestion.stats['misses']}")
+    else:
+        workbooks = [pd.read_excel(file_path, header=1, sheet_name=[0], parse_dates=False) for file_path in file_paths]
+
+    snapshots = []
+    for file_path, df in zip(file_paths, workbooks):
+        print(f"\nLoaded file : {file_path}")
         print(f"Number of sheets detected: {len(df.keys())}")
 
-        # Merge in sheet level
         for sheet_name, df_sheet in df.items():
             print(f"Number of rows detected: {len(df_sheet)}")
             # Filter according to pattern columns to keep
             df_sheet = df_sheet.filter(regex='|'.join(column_patterns))
-            df_sheet['file'] = file_path
             print(f"Number of columns detected in {sheet_name} : {len(df_sheet.columns)}")
-            if merged_df_temp is None:
-                # Merge the Sheet DataFrames
-                merged_df_temp = df_sheet
-            else:
-                merged_df_temp = merge_dataframes(merged_df_temp, df_sheet)
-
-        # Merge in file level
-        # If merged_df is None, assign it the merged DataFrame, else merge with the previous merged DataFrame
-        if merged_df is None:
-            merged_df = merged_df_temp
-        else:
-            merged_df = merge_dataframes(merged_df, merged_df_temp)
-        
-        print(f"Number of rows detected after merge: {len(merged_df)}")
+            snapshots.append((file_path, df_sheet))
+
+    merged_df = consolidate_snapshots(snapshots, snapshot_dates=[snapshot_date(file_path) for file_path, _ in snapshots])
+    print(f"Number of rows detected after merge: {len(merged_df)}")
 
     return merged_df
 
@@ -155,10 +158,12 @@ def main():
     file_paths = [os.path.join(directory, file) for file in os.listdir(directory) if file.endswith(".xlsx")]
     column_patterns = ['ΑΙΤΗΣΗ', 'ΜΗΤΡΩΟ', 'ΗΜΕΡΟΜΗΝΙΑ ΥΠΟΒΟΛΗΣ.*', 'ΕΤΑΙΡΕΙΑ', 'ΗΜΕΡ.*ΕΚΔ.*ΠΑΡΑΓ.*', 'ΗΜΕΡ.*ΛΗΞΗ.*ΠΑΡΑΓ.*', 'ΠΕΡΙΦΕΡΕΙΑ', 'ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ', 'ΔΗΜΟ.* ', 'ΔΗΜΟΤΙΚΗ ΕΝΟΤΗΤΑ', 'ΘΕΣΗ', '.*(MW)', 'ΤΕΧΝΟΛ.*'] 
 
-    # Sort file paths based on their names to process them in order
-    file_paths.sort()
+    # Sort file paths by the register month in their names to process them in order
+    file_paths.sort(key=lambda file_path: (snapshot_date(file_path) or pd.Timestamp.min, file_path))
 
-    merged_df = merge_dataframes_with_previous_files(file_paths, column_patterns)
+    # Parsed sheets are cached next to the registers, so unchanged months are not parsed again
+    cache_dir = os.path.join(current_directory, "../data/cache/registers")
+    merged_df = merge_dataframes_with_previous_files(file_paths, column_patterns, cache_dir=cache_dir)
 
 
 # Call the main function
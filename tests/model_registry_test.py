@@ -0,0 +1,88 @@
+import io
+import os
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import ModelRegistry, model_id
+from time_series_engineering import run_feature_engineering
+
+
+@pytest.fixture
+def model_string() -> str:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 3))
+    booster = lgb.train({'objective': 'regression', 'verbose': -1, 'min_data_in_leaf': 5}, lgb.Dataset(X, label=X[:, 0]), num_boost_round=3)
+    return booster.model_to_string()
+
+
+def test_model_id_depends_on_every_input():
+    ids = {
+        model_id('ΙΣΧΥΣ (MW)_sum', '2022-11-01', 360, 'v1', 'h1'),
+        model_id('ΙΣΧΥΣ (MW)_mean', '2022-11-01', 360, 'v1', 'h1'),
+        model_id('ΙΣΧΥΣ (MW)_sum', '2022-12-01', 360, 'v1', 'h1'),
+        model_id('ΙΣΧΥΣ (MW)_sum', '2022-11-01', 180, 'v1', 'h1'),
+        model_id('ΙΣΧΥΣ (MW)_sum', '2022-11-01', 360, 'v2', 'h1'),
+        model_id('ΙΣΧΥΣ (MW)_sum', '2022-11-01', 360, 'v1', 'h2'),
+    }
+    assert len(ids) == 6
+    assert model_id('ΙΣΧΥΣ (MW)_sum', '2022-11-01', 360, 'v1', 'h1') in ids
+
+
+def test_round_trip(tmp_path, model_string):
+    registry = ModelRegistry(str(tmp_path), max_loaded=1)
+    identifier = model_id('target', '2022-11-01', 360, 'v1', 'h1')
+    assert registry.metadata(identifier) is None and registry.load(identifier, 'model1') is None
+
+    registry.register({'model_id': identifier, 'target_column': 'target'}, {'model1': model_string, 'model2': model_string})
+    assert registry.metadata(identifier)['target_column'] == 'target'
+    assert registry.model_string(identifier, 'model2') == model_string
+    assert [entry['model_id'] for entry in registry.entries()] == [identifier]
+
+    X = np.random.default_rng(1).normal(size=(4, 3))
+    booster = registry.load(identifier, 'model1')
+    np.testing.assert_allclose(booster.predict(X), lgb.Booster(model_str=model_string).predict(X))
+    assert registry.load(identifier, 'model1') is booster
+    registry.load(identifier, 'model2')
+    assert registry.stats == {'hits': 1, 'loads': 2, 'evictions': 1}
+    assert registry.load(identifier, 'model3') is None
+
+
+@pytest.mark.parametrize('identifier', ['../outside', '..', 'abc', '0123456789ABCDEF', '0123456789abcdef/../x', '', None, 'f' * 65])
+def test_invalid_ids_are_rejected(tmp_path, model_string, identifier):
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    (tmp_path / 'metadata.json').write_text('{}')
+    (tmp_path / 'model1.txt').write_text(model_string)
+    assert registry.metadata(identifier) is None
+    assert registry.load(identifier, 'model1') is None
+    with pytest.raises(ValueError):
+        registry.register({'model_id': identifier}, {'model1': model_string})
+    assert os.listdir(tmp_path / 'models') == []
+
+
+def test_forecast_is_registered_and_scored(api, aggregation):
+    _, extended_result = run_feature_engineering(aggregation, max_workers=1)
+    body = extended_result.to_csv().encode()
+    client = api.app.test_client()
+
+    def forecast(**extra):
+        form = {'target_column': 'ΙΣΧΥΣ (MW)_sum', 'last_index': '2020-06-30', 'validity_offset_days': '180', **extra}
+        response = client.post('/forecast', data=dict(form, file=(io.BytesIO(body), 'extended_result.csv')))
+        assert response.status_code == 200
+        return response.json
+
+    trained = forecast()
+    assert trained['registered'] is False
+    registered = forecast(retrain='false', top_k='20')
+    assert registered['registered'] is True and registered['model_id'] == trained['model_id']
+    assert registered['model1']['rmse'] == trained['model1']['rmse']
+    assert forecast(retrain='true')['registered'] is False
+
+    response = client.post('/predict', data={'model_id': trained['model_id'], 'model': 'model2', 'start_date': '2020-01-01', 'file': (io.BytesIO(body), 'extended_result.csv')})
+    assert response.status_code == 200
+    assert response.json['dates'][0] == '2020-01-31' and len(response.json['predictions']) == 12
+
+    for identifier in ['0' * 24, '../../etc', '../' + trained['model_id']]:
+        response = client.post('/predict', data={'model_id': identifier, 'file': (io.BytesIO(body), 'extended_result.csv')})
+        assert response.status_code == 404
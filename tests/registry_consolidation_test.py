@@ -0,0 +1,91 @@
+import datetime
+import glob
+import os
+import pandas as pd
+import pytest
+
+from src.preprocessing.registry_consolidation import consolidate_snapshots, normalize_snapshot, snapshot_date
+
+
+@pytest.mark.parametrize('label, expected', [
+    ('data/ΜΗΤΡΩΟ-ΑΔΕΙΩΝ-ΕΡΓΑ-ΑΠΕ-ΜΑΡΤΙΟΣ-2024.xlsx', '2024-03-01'),
+    ('ΜΗΤΡΩΟ ΑΔΕΙΩΝ ΜΑΪΟΣ 2023.xlsx', '2023-05-01'),
+    ('μητρωο-αδειων-μαιος_2023.xlsx', '2023-05-01'),
+    # Latin letters typed instead of the Greek ones
+    ('ΜΗΤΡΩΟ-OKTΩΒΡΙΟΣ-2022.xlsx', '2022-10-01'),
+    ('ΜΗΤΡΩΟ-ΜΑIOΣ-2023.xlsx', '2023-05-01'),
+    ('ΜΗΤΡΩΟ-ΔΕΚΕΜΒΡΙΟΣ2021.xls', '2021-12-01'),
+    ('registry.xlsx', None),
+    ('ΜΗΤΡΩΟ-ΜΑΡΤΙΟΣ.xlsx', None),
+])
+def test_snapshot_date(label, expected):
+    assert snapshot_date(label) == (None if expected is None else pd.Timestamp(expected))
+
+
+def test_snapshot_date_of_the_registers_in_the_repository():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = glob.glob(os.path.join(root, 'data', 'licenses', '*ΜΗΤΡΩΟ*.xls*'))
+    dates = [snapshot_date(path) for path in paths]
+    assert None not in dates
+    assert len(set(dates)) == len(paths)
+
+
+def snapshot(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['ΑΡΙΘΜΟΣ', 'ΗΜΕΡΟΜΗΝΙΑ', 'ΙΣΧΥΣ (MW)'])
+
+
+def test_normalized_dates_and_text_match_across_snapshots():
+    typed = normalize_snapshot(snapshot([['Α-1', datetime.datetime(2020, 1, 2), 1.5]]))
+    text = normalize_snapshot(snapshot([[' Α-1 ', '2020-01-02 00:00:00', 1.5]]))
+    pd.testing.assert_frame_equal(typed, text)
+
+
+def test_matches_pairwise_merges():
+    snapshots = [
+        ('a.xlsx', snapshot([['Α-1', '2020-01-02', 1.5], ['Α-2', '2020-02-03', 2.0]])),
+        ('b.xlsx', snapshot([['Α-1', datetime.datetime(2020, 1, 2), 1.5], ['Α-3', '2020-03-04', 3.0], ['Α-3', '2020-03-04', 3.0]])),
+        ('c.xlsx', snapshot([['Α-2', '2020-02-03', 2.5], ['Α-3', '2020-03-04 00:00:00', 3.0]])),
+    ]
+    records = consolidate_snapshots(snapshots)
+
+    # The result of merging the snapshots two at a time, keeping each distinct record once
+    merged = normalize_snapshot(snapshots[0][1])
+    for _, df in snapshots[1:]:
+        merged = merged.merge(normalize_snapshot(df), how='outer')
+    key = ['ΑΡΙΘΜΟΣ', 'ΗΜΕΡΟΜΗΝΙΑ', 'ΙΣΧΥΣ (MW)']
+    expected = merged.drop_duplicates().sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(records[key].sort_values(key).reset_index(drop=True), expected)
+
+    provenance = records.set_index(['ΑΡΙΘΜΟΣ', 'ΙΣΧΥΣ (MW)'])[['file', 'first_seen', 'last_seen']].astype(str)
+    assert provenance.loc[('Α-1', 1.5)].tolist() == ['b.xlsx', 'a.xlsx', 'b.xlsx']
+    assert provenance.loc[('Α-2', 2.0)].tolist() == ['a.xlsx', 'a.xlsx', 'a.xlsx']
+    assert provenance.loc[('Α-2', 2.5)].tolist() == ['c.xlsx', 'c.xlsx', 'c.xlsx']
+    assert provenance.loc[('Α-3', 3.0)].tolist() == ['c.xlsx', 'b.xlsx', 'c.xlsx']
+
+
+def test_key_columns_keep_the_latest_values():
+    snapshots = [
+        ('a.xlsx', snapshot([['Α-1', '2020-01-02', 1.5]])),
+        ('b.xlsx', snapshot([['Α-1', '2020-01-02', 2.0]])),
+    ]
+    records = consolidate_snapshots(snapshots, key_columns=['ΑΡΙΘΜΟΣ'])
+    assert len(records) == 1
+    assert records.loc[0, 'ΙΣΧΥΣ (MW)'] == 2.0
+    assert (str(records.loc[0, 'first_seen']), str(records.loc[0, 'last_seen'])) == ('a.xlsx', 'b.xlsx')
+
+
+def test_snapshot_dates_order_the_snapshots():
+    snapshots = [
+        ('ΜΑΡΤΙΟΣ-2024.xlsx', snapshot([['Α-1', '2020-01-02', 3.0]])),
+        ('notes.xlsx', snapshot([['Α-1', '2020-01-02', 0.5]])),
+        ('ΙΑΝΟΥΑΡΙΟΣ-2024.xlsx', snapshot([['Α-1', '2020-01-02', 1.0]])),
+    ]
+    dates = [snapshot_date(label) for label, _ in snapshots]
+    records = consolidate_snapshots(snapshots, key_columns=['ΑΡΙΘΜΟΣ'], snapshot_dates=dates)
+    # Undated snapshots come first, then the register months in order
+    assert list(records['file'].cat.categories) == ['notes.xlsx', 'ΙΑΝΟΥΑΡΙΟΣ-2024.xlsx', 'ΜΑΡΤΙΟΣ-2024.xlsx']
+    assert records.loc[0, 'ΙΣΧΥΣ (MW)'] == 3.0
+    assert str(records.loc[0, 'first_seen']) == 'notes.xlsx'
+
+    with pytest.raises(ValueError):
+        consolidate_snapshots(snapshots, snapshot_dates=dates[:2])
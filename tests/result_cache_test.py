@@ -0,0 +1,74 @@
+import io
+import os
+import time
+
+from result_cache import ResultCache, code_version, evict_files, local_modules
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), 'v1')
+    key = cache.key('/forecast', b'a,b\n1,2\n', {'target_column': 'x'})
+    assert cache.get(key) is None
+    cache.set(key, {'rmse': 1.5})
+    assert cache.get(key) == {'rmse': 1.5}
+
+    # A new process only finds the entry on disk
+    restarted = ResultCache(str(tmp_path), 'v1')
+    assert restarted.get(key) == {'rmse': 1.5}
+    assert restarted.get(key) == {'rmse': 1.5}
+    assert (cache.stats['misses'], cache.stats['memory_hits']) == (1, 1)
+    assert (restarted.stats['disk_hits'], restarted.stats['memory_hits']) == (1, 1)
+
+
+def test_key_covers_endpoint_payload_params_and_version(tmp_path):
+    cache = ResultCache(str(tmp_path), 'v1')
+    key = cache.key('/forecast', b'payload', {'a': '1', 'b': ['2', '3']})
+    assert key == cache.key('/forecast', io.BytesIO(b'payload'), {'b': ['2', '3'], 'a': '1'})
+    assert key != cache.key('/aggregate', b'payload', {'a': '1', 'b': ['2', '3']})
+    assert key != cache.key('/forecast', b'payload!', {'a': '1', 'b': ['2', '3']})
+    assert key != cache.key('/forecast', b'payload', {'a': '1', 'b': ['3', '2']})
+    assert key != ResultCache(str(tmp_path), 'v2').key('/forecast', b'payload', {'a': '1', 'b': ['2', '3']})
+
+
+def test_code_change_invalidates_entries(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'app.py').write_text('import helper\nimport os\n')
+    (source / 'helper.py').write_text('from nested import value\n')
+    (source / 'nested.py').write_text('value = 1\n')
+    (source / 'unused.py').write_text('value = 2\n')
+    paths = local_modules([str(source / 'app.py')])
+    assert [os.path.basename(path) for path in paths] == ['app.py', 'helper.py', 'nested.py']
+
+    cache = ResultCache(str(tmp_path / 'cache'), code_version(paths))
+    key = cache.key('/forecast', b'payload', {})
+    cache.set(key, 'old result')
+
+    (source / 'unused.py').write_text('value = 3\n')
+    assert ResultCache(str(tmp_path / 'cache'), code_version(local_modules([str(source / 'app.py')]))).get(key) == 'old result'
+
+    (source / 'nested.py').write_text('value = 3\n')
+    edited = ResultCache(str(tmp_path / 'cache'), code_version(local_modules([str(source / 'app.py')])))
+    assert edited.get(edited.key('/forecast', b'payload', {})) is None
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = ResultCache(str(tmp_path), 'v1', max_memory_items=2)
+    for key in ['a', 'b', 'c']:
+        cache.set(key, key)
+    assert list(cache._memory) == ['b', 'c']
+    assert cache.get('a') == 'a'
+    assert cache.summary()['disk_items'] == 3
+
+
+def test_evict_files_removes_least_recently_used_groups(tmp_path):
+    now = time.time()
+    for i, names in enumerate([['old.train.bin', 'old.valid.bin'], ['recent.train.bin', 'recent.valid.bin']]):
+        for name in names:
+            (tmp_path / name).write_bytes(b'x' * 100)
+            os.utime(tmp_path / name, (now - 100 + i, now - 100 + i))
+    (tmp_path / 'other.txt').write_bytes(b'x' * 1000)
+
+    assert evict_files(str(tmp_path), 250, '.bin') == 2
+    assert sorted(os.listdir(tmp_path)) == ['other.txt', 'recent.train.bin', 'recent.valid.bin']
+    assert evict_files(str(tmp_path), 250, '.bin') == 0
@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from time_series_engineering import (
+    AutocorrelationEngine,
+    FeatureBlockBuilder,
+    LagMatrix,
+    ManualSeasonalDecomposition,
+    MultiWindowRollingEngine,
+    SeasonalDecompositionEngine,
+    TimeSeriesFeatureEngineering,
+    run_feature_engineering,
+)
+
+
+def test_feature_block_builder_is_one_block():
+    index = pd.date_range('2020-01-31', periods=4, freq='ME')
+    builder = FeatureBlockBuilder(index)
+    builder.add('a', [1, 2, 3, 4])
+    builder.add('b', pd.Series([5.0, 6.0, 7.0, 8.0], index=index))
+    builder.add('c', 0.5)
+
+    frame = builder.to_frame()
+    assert list(frame.columns) == ['a', 'b', 'c']
+    assert frame.index.equals(index)
+    assert frame._mgr.nblocks == 1
+    assert frame['c'].tolist() == [0.5] * 4
+    pd.testing.assert_series_equal(frame['b'], pd.Series([5.0, 6.0, 7.0, 8.0], index=index, name='b'))
+
+
+def test_feature_block_builder_without_columns():
+    index = pd.date_range('2020-01-31', periods=4, freq='ME')
+    frame = FeatureBlockBuilder(index).to_frame()
+    assert frame.empty and frame.index.equals(index)
+
+
+def test_seasonal_and_expanding_metrics_match_pandas(aggregation):
+    engineering = TimeSeriesFeatureEngineering(aggregation)
+    seasonal = engineering.calculate_seasonal_aggregations('RSI_')
+    expanding = engineering.calculate_expanding_metrics('RSI_')
+    assert seasonal._mgr.nblocks == expanding._mgr.nblocks == 1
+
+    for feature in ['RSI_mean', 'RSI_max']:
+        series = aggregation[feature]
+        pd.testing.assert_series_equal(seasonal[f'{feature}_mean_monthly'], series.groupby(series.index.month).transform('mean'), check_names=False)
+        pd.testing.assert_series_equal(expanding[f'{feature}_expanding_mean'], series.expanding().mean(), check_names=False)
+        pd.testing.assert_series_equal(expanding[f'{feature}_expanding_std'], series.expanding().std(), check_names=False)
+
+
+@pytest.mark.parametrize('autocorrelation', ['constant', 'table'])
+def test_run_feature_engineering_layout(aggregation, autocorrelation):
+    final_result, extended_result = run_feature_engineering(aggregation, autocorrelation=autocorrelation, max_workers=1)
+
+    assert final_result.index.equals(aggregation.index)
+    assert not final_result.columns.duplicated().any()
+    # The extended result is the aggregation, the decomposition of the MW sum and the features
+    assert list(extended_result.columns[:len(aggregation.columns)]) == list(aggregation.columns)
+    assert list(extended_result.columns[-len(final_result.columns):]) == list(final_result.columns)
+    assert ('ΙΣΧΥΣ (MW)_sum_autocorr_lag_2' in final_result.columns) == (autocorrelation == 'constant')
+    for column in ['ΙΣΧΥΣ (MW)_sum_trend', 'RSI_mean_ewm_3', 'RSI_max_lagged_12', 'month', 'year']:
+        assert column in extended_result.columns
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 7, 12])
+def test_rolling_statistics_match_pandas(aggregation, window):
+    block = aggregation.to_numpy(dtype=float)
+    # A constant stretch, whose std and skew pandas reports as exactly 0
+    block[20:35, 0] = 4.0
+    stats = MultiWindowRollingEngine(block).window_statistics(window)
+
+    rolling = pd.DataFrame(block, index=aggregation.index).rolling(window)
+    for name in ['mean', 'std', 'min', 'max', 'skew']:
+        np.testing.assert_allclose(stats[name], getattr(rolling, name)().to_numpy(), rtol=1e-7, atol=1e-9, err_msg=name)
+
+
+def test_rolling_window_longer_than_the_series():
+    stats = MultiWindowRollingEngine(np.arange(6.0).reshape(3, 2)).window_statistics(4)
+    assert all(np.isnan(values).all() for values in stats.values())
+
+
+def test_ewm_means_match_pandas_and_resume_from_state(aggregation):
+    block = aggregation.to_numpy(dtype=float)
+    block[10:13, 1] = np.nan
+    spans = [3, 6, 12]
+
+    means = MultiWindowRollingEngine(block).ewm_means(spans)
+    for s, span in enumerate(spans):
+        np.testing.assert_allclose(means[s], pd.DataFrame(block).ewm(span=span).mean().to_numpy(), rtol=1e-10)
+
+    head, state = MultiWindowRollingEngine(block[:40]).ewm_means(spans, return_state=True)
+    tail = MultiWindowRollingEngine(block[40:]).ewm_means(spans, state=state)
+    np.testing.assert_allclose(np.concatenate([head, tail], axis=1), means, rtol=1e-12)
+
+
+def test_rolling_metrics_columns(aggregation):
+    rolling = TimeSeriesFeatureEngineering(aggregation).calculate_rolling_metrics('RSI_', window_sizes=[3, 6])
+    assert list(rolling.columns[:6]) == [f'RSI_mean_{name}' for name in ['mean_rolling_3', 'std_rolling_3', 'min_rolling_3', 'max_rolling_3', 'skew_rolling_3', 'ewm_3']]
+    assert rolling.shape == (len(aggregation), 2 * 2 * 6)
+    pd.testing.assert_series_equal(rolling['RSI_max_mean_rolling_6'], aggregation['RSI_max'].rolling(6).mean(), check_names=False)
+
+
+def autocorrelation_block(aggregation: pd.DataFrame) -> np.ndarray:
+    block = aggregation.to_numpy(dtype=float)
+    # Gaps inside the series and a constant column, for which pandas returns NaN
+    block[[7, 30, 31], 1] = np.nan
+    return np.column_stack([block, np.full(len(block), 3.0)])
+
+
+# pandas divides by the zero variance of the constant column
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_acf_matches_pandas(aggregation):
+    block = autocorrelation_block(aggregation)
+    lags = [0, 1, 2, 12, 24, 70, 71, 100]
+    acf = AutocorrelationEngine(block).acf(lags)
+    expected = [[pd.Series(block[:, j]).autocorr(lag) if lag < len(block) else np.nan for j in range(block.shape[1])] for lag in lags]
+    np.testing.assert_allclose(acf, np.array(expected), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('window', [None, 24])
+def test_expanding_and_rolling_acf_match_pandas(aggregation, window):
+    block = autocorrelation_block(aggregation)[:, [1, 3, 5]]
+    lags = [1, 3, 12]
+    acf = AutocorrelationEngine(block).expanding_acf(lags, window=window)
+    for i in range(len(block)):
+        # The pairs (x[t], x[t - lag]) whose later value is up to row i, and in the last `window` rows
+        rows = slice(0 if window is None else i + 1 - window, i + 1)
+        for l, lag in enumerate(lags):
+            if window is not None and i < window - 1:
+                expected = [np.nan] * block.shape[1]
+            else:
+                expected = [pd.Series(block[:, j]).iloc[rows].corr(pd.Series(block[:, j]).shift(lag).iloc[rows]) for j in range(block.shape[1])]
+            np.testing.assert_allclose(acf[l, i], expected, rtol=1e-7, atol=1e-9, err_msg=f'row {i}, lag {lag}')
+
+
+@pytest.mark.parametrize('output', ['constant', 'table', 'expanding', 'rolling'])
+def test_autocorrelation_outputs(aggregation, output):
+    autocorrelation = TimeSeriesFeatureEngineering(aggregation).calculate_autocorrelation('RSI_', lags=[1, 12], output=output, window=24)
+    if output == 'table':
+        assert list(autocorrelation.index) == ['RSI_mean', 'RSI_max'] and list(autocorrelation.columns) == ['lag_1', 'lag_12']
+        assert autocorrelation.loc['RSI_mean', 'lag_12'] == pytest.approx(aggregation['RSI_mean'].autocorr(12))
+    else:
+        assert list(autocorrelation.columns) == ['RSI_mean_autocorr_lag_1', 'RSI_max_autocorr_lag_1', 'RSI_mean_autocorr_lag_12', 'RSI_max_autocorr_lag_12']
+        series = aggregation['RSI_mean']
+        rows = slice(-24 if output == 'rolling' else 0, None)
+        assert autocorrelation['RSI_mean_autocorr_lag_12'].iloc[-1] == pytest.approx(series.iloc[rows].corr(series.shift(12).iloc[rows]))
+    with pytest.raises(ValueError):
+        TimeSeriesFeatureEngineering(aggregation).calculate_autocorrelation('RSI_', output='unknown')
+
+
+@pytest.mark.parametrize('window', [1, 3, 4, 12, 80])
+def test_centered_moving_average_matches_pandas(aggregation, window):
+    average = SeasonalDecompositionEngine(aggregation.to_numpy(dtype=float), aggregation.index).moving_average(window)
+    np.testing.assert_allclose(average, aggregation.rolling(window, center=True).mean().to_numpy(), rtol=1e-10)
+
+
+def test_yearly_decomposition_matches_the_manual_decomposition(aggregation):
+    engine = SeasonalDecompositionEngine(aggregation.to_numpy(dtype=float), aggregation.index)
+    components = engine.decompose(12)
+    for j, feature in enumerate(aggregation.columns):
+        expected = ManualSeasonalDecomposition(aggregation[feature], 12).decompose()
+        for component in ['trend', 'seasonal', 'residual']:
+            np.testing.assert_allclose(components[component][:, j], expected[component].to_numpy(), rtol=1e-9, atol=1e-12, err_msg=f'{feature} {component}')
+
+
+@pytest.mark.parametrize('period', [3, 6])
+def test_shorter_periods_average_the_phases_of_the_period(aggregation, period):
+    # Rows are months, so the phase of a row is its month counted from year 0, modulo the period
+    aggregation = aggregation.iloc[1:]
+    decompositions = TimeSeriesFeatureEngineering(aggregation).calculate_seasonal_decompositions('(MW)', periods=[period])
+    series = aggregation['ΙΣΧΥΣ (MW)_sum']
+    detrended = series - series.rolling(period, center=True).mean()
+    phase = (aggregation.index.year * 12 + aggregation.index.month - 1) % period
+    seasonal = detrended.groupby(phase).transform('mean')
+    pd.testing.assert_series_equal(decompositions[f'ΙΣΧΥΣ (MW)_sum_seasonal_{period}'], seasonal, check_names=False)
+    pd.testing.assert_series_equal(decompositions[f'ΙΣΧΥΣ (MW)_sum_residual_{period}'], detrended - seasonal, check_names=False)
+    assert decompositions.shape[1] == 3 * aggregation.filter(like='(MW)').shape[1]
+
+
+def test_decomposition_of_a_feature(aggregation):
+    decomposition = TimeSeriesFeatureEngineering(aggregation).calculate_manual_seasonal_decomposition('ΙΣΧΥΣ (MW)_mean', 12)
+    expected = ManualSeasonalDecomposition(aggregation['ΙΣΧΥΣ (MW)_mean'], 12).decompose()
+    assert list(decomposition.columns) == ['ΙΣΧΥΣ (MW)_mean_trend', 'ΙΣΧΥΣ (MW)_mean_seasonal', 'ΙΣΧΥΣ (MW)_mean_residual']
+    for component in ['trend', 'seasonal', 'residual']:
+        pd.testing.assert_series_equal(decomposition[f'ΙΣΧΥΣ (MW)_mean_{component}'], expected[component], check_names=False)
+
+
+def test_lag_matrix_matches_shift(aggregation):
+    features = list(aggregation.columns[:3])
+    lags = [0, 1, 12, 100]
+    matrix = LagMatrix(aggregation[features].to_numpy(dtype=float), aggregation.index, features, lags)
+
+    expected = pd.concat({lag: aggregation[features].shift(lag) for lag in lags}, axis=1)
+    expected.columns = [f'{feature}_lagged_{lag}' for lag, feature in expected.columns]
+    assert matrix.columns == list(expected.columns) and matrix.shape == expected.shape
+    pd.testing.assert_frame_equal(matrix.to_frame(), expected)
+    pd.testing.assert_frame_equal(matrix.to_frame(expected.columns[::-1]), expected[expected.columns[::-1]])
+    np.testing.assert_array_equal(matrix.column('ΙΣΧΥΣ (MW)_sum_lagged_12'), expected['ΙΣΧΥΣ (MW)_sum_lagged_12'])
+
+
+def test_lag_matrix_views_share_one_buffer(aggregation):
+    values = aggregation.to_numpy(dtype=float)
+    matrix = LagMatrix(values, aggregation.index, list(aggregation.columns), [2, 6])
+    lagged = matrix.lag(6)
+    assert np.shares_memory(lagged, matrix.buffer) and np.shares_memory(matrix.lag(2), matrix.buffer)
+    assert not np.shares_memory(lagged, values)
+    with pytest.raises(ValueError):
+        lagged[0, 0] = 1.0
+
+    # Filled into a float32 array, e.g. the features handed to LightGBM, leaving other columns untouched
+    columns = ['other', 'RSI_max_lagged_2', 'ΙΣΧΥΣ (MW)_sum_lagged_6']
+    out = np.full((len(values), 3), -1.0, dtype=np.float32)
+    matrix.fill(out, columns)
+    assert (out[:, 0] == -1).all()
+    np.testing.assert_array_equal(out[:, 1], aggregation['RSI_max'].shift(2).to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(out[:, 2], aggregation['ΙΣΧΥΣ (MW)_sum'].shift(6).to_numpy(dtype=np.float32))
+
+
+def test_lagged_variables_without_materializing(aggregation):
+    engineering = TimeSeriesFeatureEngineering(aggregation)
+    matrix = engineering.create_lagged_variables('RSI_', lags=[1, 2], materialize=False)
+    assert isinstance(matrix, LagMatrix)
+    pd.testing.assert_frame_equal(matrix.to_frame(), engineering.create_lagged_variables('RSI_', lags=[1, 2]))
+
+    lag_matrices = {}
+    final_result, _ = run_feature_engineering(aggregation, lag_matrices=lag_matrices, max_workers=1)
+    materialized, _ = run_feature_engineering(aggregation, max_workers=1)
+    lagged = pd.concat([lag_matrices['mw'].to_frame(), lag_matrices['rsi'].to_frame()], axis=1)
+    assert not any('_lagged_' in column for column in final_result.columns)
+    pd.testing.assert_frame_equal(pd.concat([final_result, lagged], axis=1)[materialized.columns], materialized)
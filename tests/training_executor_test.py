@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+import pytest
+
+import training_executor
+from forecasting_model import train_and_forecast
+from time_series_engineering import run_feature_engineering
+from training_executor import TrainingExecutor, shared_input, worker_input
+
+
+def test_pool_size_does_not_exceed_the_cpus():
+    cpu_count = os.cpu_count() or 1
+    executor = TrainingExecutor()
+    assert executor.max_workers == min(4, cpu_count)
+    assert executor.max_workers * executor.num_threads <= cpu_count or executor.num_threads == 1
+    assert TrainingExecutor(num_threads=1).max_workers == cpu_count
+    assert TrainingExecutor(max_workers=2, num_threads=3).num_threads == 3
+
+
+def test_worker_inputs_are_loaded_once_and_evicted_oldest_first(monkeypatch):
+    monkeypatch.setattr(training_executor, '_worker_inputs', training_executor.OrderedDict())
+    loads = []
+
+    def loader(value):
+        loads.append(value)
+        return value * 2
+
+    assert worker_input('a', loader, 1) == 2
+    assert worker_input('b', loader, 2) == 4
+    assert worker_input('a', loader, 1) == 2
+    assert worker_input('c', loader, 3) == 6
+    # 'b' was the least recently used of the two inputs kept
+    assert worker_input('b', loader, 2) == 4
+    assert loads == [1, 2, 3, 2]
+
+
+def test_shared_value_is_read_from_a_file_removed_on_exit():
+    with TrainingExecutor(max_workers=1).shared({'rows': [1, 2, 3]}) as path:
+        assert shared_input(path) == {'rows': [1, 2, 3]}
+    assert not os.path.exists(path)
+
+
+def test_results_cancel_pending_futures_on_failure():
+    failed, pending = Future(), Future()
+    failed.set_exception(RuntimeError('training failed'))
+    with pytest.raises(RuntimeError):
+        TrainingExecutor.results([failed, pending])
+    assert pending.cancelled()
+
+
+def test_map_matches_sequential_trainings(aggregation):
+    _, extended_result = run_feature_engineering(aggregation, max_workers=1)
+    jobs = [
+        {'target_column': 'ΙΣΧΥΣ (MW)_sum', 'last_index': pd.Timestamp('2020-06-30'), 'validity_offset_days': 180},
+        {'target_column': 'ΙΣΧΥΣ (MW)_mean', 'last_index': pd.Timestamp('2020-06-30'), 'validity_offset_days': 180, 'top_k': 10},
+    ]
+    executor = TrainingExecutor(max_workers=1, num_threads=1)
+    try:
+        results = executor.map(extended_result, jobs)
+    finally:
+        executor.shutdown()
+
+    for job, (result_model1, result_model2, forecast_dates, timings) in zip(jobs, results):
+        expected = train_and_forecast(extended_result, job['target_column'], job['last_index'], job['validity_offset_days'], job.get('top_k', 20), num_threads=1)
+        for result, expected_result in [(result_model1, expected[0]), (result_model2, expected[1])]:
+            np.testing.assert_allclose(result[1], expected_result[1])
+            assert result[2:6] == pytest.approx(expected_result[2:6])
+        np.testing.assert_array_equal(forecast_dates, expected[2])
+        assert timings['total']['wall'] >= timings['train_model1']['wall']